@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+DESPACHANTE ASSÍNCRONO DE ALERTAS - SENTINELA SAFETY
+
+Serviço que envia os alertas pendentes (enviado = FALSE):
+
+1. Reserva os pendentes em uma fila de prioridade (critica antes de alta)
+2. Entrega cada alerta concorrentemente às saídas configuradas (webhook,
+   arquivo, stdout), com novas tentativas e backoff exponencial por saída
+3. Marca enviado = TRUE em UPDATEs em lote e publica 'alerta_enviado' no barramento
+4. Mede a latência queda -> despacho de cada alerta (SLO)
+
+É acordado pelo barramento de eventos (db/barramento_eventos.py) assim que a
+ingestão publica um alerta, com uma varredura periódica no banco como
+garantia. Pressupõe uma única instância ativa (a reserva é em memória).
+
+Executar: python alertas/despachante.py [--uma-vez] [--saidas stdout,arquivo,webhook]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import signal
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Permite importar os módulos do projeto ao executar como script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.barramento_eventos import BarramentoEventos
+
+# Ordem de atendimento da fila (menor = primeiro)
+PRIORIDADES = {'critica': 0, 'alta': 1, 'media': 2, 'baixa': 3}
+
+LOG_DESPACHOS = 'logs/despacho_alertas.jsonl'
+LOG_FALHAS = 'logs/alertas_falhos.jsonl'
+
+# Mesma ordem no banco: com backlog maior que o lote, críticos recentes vêm antes de altos antigos
+ORDEM_PRIORIDADE = "CASE a.nivel_prioridade {} ELSE {} END".format(
+    ' '.join(f"WHEN '{nivel}' THEN {ordem}" for nivel, ordem in PRIORIDADES.items()), len(PRIORIDADES))
+
+# Keyset (prioridade, id_alerta): as páginas passam pelos já reservados e pelos falhos.
+# Expandido em OR: o MySQL não faz range no índice com row values
+CONSULTA_PENDENTES = f"""
+    SELECT a.id_alerta, a.id_evento, a.tipo_alerta, a.nivel_prioridade, a.mensagem,
+           a.data_alerta, e.data_evento, e.magnitude_impacto, e.gravidade,
+           t.id_trabalhador, t.nome, t.setor, {ORDEM_PRIORIDADE} AS ordem_prioridade
+    FROM alertas a
+    JOIN eventos_queda e ON a.id_evento = e.id_evento
+    JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
+    WHERE a.enviado = FALSE
+      AND ({ORDEM_PRIORIDADE} > %s OR ({ORDEM_PRIORIDADE} = %s AND a.id_alerta > %s))
+    ORDER BY {ORDEM_PRIORIDADE}, a.id_alerta
+    LIMIT %s
+"""
+
+
+def _para_datetime(valor):
+    """TIMESTAMP do MySQL (datetime) ou do SQLite (texto) -> datetime"""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+
+# ====== SAÍDAS ======
+
+class SaidaStdout:
+    nome = 'stdout'
+
+    async def enviar(self, alerta):
+        print(f"🚨 [{alerta['nivel_prioridade'].upper()}] Alerta #{alerta['id_alerta']} - "
+              f"{alerta['nome']} ({alerta['setor']}): {alerta['mensagem']}")
+
+
+class SaidaArquivo:
+    nome = 'arquivo'
+
+    def __init__(self, caminho='logs/alertas_enviados.jsonl'):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+
+    async def enviar(self, alerta):
+        linha = json.dumps(alerta, ensure_ascii=False, default=str) + '\n'
+        await asyncio.to_thread(self._escrever, linha)
+
+    def _escrever(self, linha):
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(linha)
+
+
+class SaidaWebhook:
+    nome = 'webhook'
+
+    def __init__(self, url='http://127.0.0.1:8765/alertas', timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def enviar(self, alerta):
+        corpo = json.dumps(alerta, ensure_ascii=False, default=str).encode('utf-8')
+        await asyncio.to_thread(self._post, corpo)
+
+    def _post(self, corpo):
+        requisicao = urllib.request.Request(self.url, data=corpo, method='POST',
+                                            headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(requisicao, timeout=self.timeout) as resposta:
+            if resposta.status >= 300:
+                raise RuntimeError(f"Webhook respondeu {resposta.status}")
+
+
+async def servidor_webhook_local(porta=8765, taxa_falha=0.0):
+    """
+    Stand-in local de um webhook (ex.: central de segurança) para testes
+
+    Responde 200 a cada POST, ou 503 com probabilidade `taxa_falha`
+    (exercita as novas tentativas do despachante).
+    """
+    async def atender(reader, writer):
+        try:
+            cabecalho = await reader.readuntil(b'\r\n\r\n')
+            tamanho = 0
+            for linha in cabecalho.decode('latin-1').split('\r\n'):
+                if linha.lower().startswith('content-length:'):
+                    tamanho = int(linha.split(':', 1)[1])
+            await reader.readexactly(tamanho)
+            status = '503 Service Unavailable' if random.random() < taxa_falha else '200 OK'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(atender, '127.0.0.1', porta)
+
+
+# ====== DESPACHANTE ======
+
+class DespachanteAlertas:
+    def __init__(self, conectar, saidas, concorrencia=10, max_tentativas=5, backoff_base=0.5,
+                 lote_confirmacao=100, intervalo_confirmacao=0.5, intervalo_varredura=5.0,
+                 slo_segundos=5.0, barramento=None):
+        """
+        Args:
+            conectar: função que abre uma conexão com o banco
+            saidas (list): saídas com método assíncrono enviar(alerta)
+            concorrencia (int): alertas entregues simultaneamente
+            max_tentativas (int): tentativas por saída antes de desistir
+            backoff_base (float): espera inicial entre tentativas (dobra a cada falha)
+            lote_confirmacao (int): alertas por UPDATE de confirmação
+            intervalo_confirmacao (float): espera máxima (s) para confirmar um lote parcial
+            intervalo_varredura (float): varredura periódica do banco (s)
+            slo_segundos (float): latência queda -> despacho desejada
+            barramento (BarramentoEventos): acorda o despachante a cada novo alerta
+        """
+        self.conectar = conectar
+        self.saidas = saidas
+        self.concorrencia = concorrencia
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.lote_confirmacao = lote_confirmacao
+        self.intervalo_confirmacao = intervalo_confirmacao
+        self.intervalo_varredura = intervalo_varredura
+        self.slo_segundos = slo_segundos
+        self.barramento = barramento
+
+        self.conn = None
+        self.fila = None
+        self.em_andamento = set()   # reservados (na fila, enviando ou aguardando confirmação)
+        self.falhos = set()         # esgotaram as tentativas nesta execução
+        self.confirmar = []
+        self.despachos = []
+        self.parar = None
+
+    # --- banco (conexão bloqueante usada por uma thread de cada vez) ---
+
+    def _buscar_pendentes(self, limite, ignorar):
+        """
+        Até `limite` pendentes fora de `ignorar` (reservados e falhos), em
+        ordem de prioridade: pagina por keyset em vez de contar os ignorados
+        no LIMIT, senão os falhos acumulados tomariam o lote inteiro
+        """
+        cursor = self.conn.cursor()
+        linhas = []
+        ultimo = (-1, 0)
+        while len(linhas) < limite:
+            cursor.execute(CONSULTA_PENDENTES, (ultimo[0], ultimo[0], ultimo[1], int(limite)))
+            colunas = [c[0] for c in cursor.description]
+            pagina = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+            linhas += [alerta for alerta in pagina if alerta['id_alerta'] not in ignorar]
+            if len(pagina) < limite:
+                break
+            ultimo = (int(pagina[-1]['ordem_prioridade']), int(pagina[-1]['id_alerta']))
+        self.conn.commit()  # encerra o snapshot (próxima varredura enxerga novos alertas)
+        return linhas[:limite]
+
+    def _marcar_enviados(self, ids):
+        cursor = self.conn.cursor()
+        cursor.execute(f"UPDATE alertas SET enviado = TRUE WHERE id_alerta IN ({', '.join(['%s'] * len(ids))})",
+                       [int(i) for i in ids])
+        self.conn.commit()
+        # Após o commit: o dashboard tira os enviados da tela sem reconsultar os pendentes
+        (self.barramento or BarramentoEventos()).publicar('alerta_enviado', {'ids': [int(i) for i in ids]})
+
+    async def reservar_pendentes(self, limite=1000):
+        """Coloca na fila os pendentes ainda não reservados"""
+        async with self.lock_banco:
+            pendentes = await asyncio.to_thread(self._buscar_pendentes, limite,
+                                                frozenset(self.em_andamento | self.falhos))
+
+        novos = 0
+        for alerta in pendentes:
+            id_alerta = alerta['id_alerta']
+            if id_alerta in self.em_andamento or id_alerta in self.falhos:
+                continue
+            self.em_andamento.add(id_alerta)
+            prioridade = PRIORIDADES.get(alerta['nivel_prioridade'], len(PRIORIDADES))
+            self.fila.put_nowait((prioridade, id_alerta, alerta))
+            novos += 1
+        return novos
+
+    # --- entrega ---
+
+    async def _enviar_com_tentativas(self, saida, alerta):
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                await saida.enviar(alerta)
+                return tentativa
+            except Exception as e:
+                if tentativa == self.max_tentativas:
+                    raise RuntimeError(f"{saida.nome}: {e}") from e
+                espera = self.backoff_base * 2 ** (tentativa - 1)
+                await asyncio.sleep(espera * random.uniform(0.8, 1.2))
+
+    async def _entregar(self, alerta):
+        resultados = await asyncio.gather(
+            *(self._enviar_com_tentativas(saida, alerta) for saida in self.saidas),
+            return_exceptions=True
+        )
+        erros = [r for r in resultados if isinstance(r, Exception)]
+        despachado_em = datetime.now()
+
+        if erros:
+            self.falhos.add(alerta['id_alerta'])
+            self.em_andamento.discard(alerta['id_alerta'])
+            self._registrar(LOG_FALHAS, {
+                'id_alerta': alerta['id_alerta'],
+                'nivel_prioridade': alerta['nivel_prioridade'],
+                'erros': [str(e) for e in erros],
+                'registrado_em': despachado_em.isoformat(timespec='milliseconds')
+            })
+            print(f"❌ Alerta #{alerta['id_alerta']} não entregue: {'; '.join(str(e) for e in erros)}")
+            return
+
+        data_evento = _para_datetime(alerta['data_evento']) or _para_datetime(alerta['data_alerta'])
+        latencia = (despachado_em - data_evento).total_seconds() if data_evento else None
+        despacho = {
+            'id_alerta': alerta['id_alerta'],
+            'nivel_prioridade': alerta['nivel_prioridade'],
+            'tentativas': max(resultados),
+            'despachado_em': despachado_em.isoformat(timespec='milliseconds'),
+            'latencia_s': round(latencia, 3) if latencia is not None else None,
+            'dentro_slo': latencia is not None and latencia <= self.slo_segundos
+        }
+        self.despachos.append(despacho)
+        self._registrar(LOG_DESPACHOS, despacho)
+        self.confirmar.append(alerta['id_alerta'])
+        if len(self.confirmar) >= self.lote_confirmacao:
+            self.lote_cheio.set()
+
+    def _registrar(self, caminho, registro):
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+
+    async def _trabalhador(self):
+        while True:
+            _, _, alerta = await self.fila.get()
+            try:
+                await self._entregar(alerta)
+            finally:
+                self.fila.task_done()
+
+    # --- confirmação em lote ---
+
+    async def confirmar_lote(self):
+        """UPDATE único para os alertas já entregues"""
+        if not self.confirmar:
+            return 0
+        ids, self.confirmar = self.confirmar, []
+        async with self.lock_banco:
+            await asyncio.to_thread(self._marcar_enviados, ids)
+        self.em_andamento.difference_update(ids)
+        return len(ids)
+
+    async def _confirmador(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.lote_cheio.wait(), self.intervalo_confirmacao)
+            except asyncio.TimeoutError:
+                pass
+            self.lote_cheio.clear()
+            await self.confirmar_lote()
+
+    # --- gatilhos ---
+
+    async def _ouvir_barramento(self):
+        """Acorda a reserva quando a ingestão publica um alerta"""
+        posicao = self.barramento.posicao_atual()
+        while True:
+            eventos, posicao = await asyncio.to_thread(self.barramento.ler_desde, posicao)
+            # 'lacuna': eventos perdidos na rotação - a varredura relê os pendentes do banco
+            if any(evento['tipo'] in ('alerta', 'lacuna') for evento in eventos):
+                self.acordar.set()
+            await asyncio.sleep(0.2)
+
+    async def _varredor(self):
+        while not self.parar.is_set():
+            await self.reservar_pendentes()
+            self.acordar.clear()
+            try:
+                await asyncio.wait_for(self.acordar.wait(), self.intervalo_varredura)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- execução ---
+
+    async def executar(self, uma_vez=False):
+        """
+        Executa o serviço até receber SIGINT/SIGTERM (ou, com uma_vez=True,
+        até esvaziar o backlog atual)
+        """
+        self.fila = asyncio.PriorityQueue()
+        self.lock_banco = asyncio.Lock()
+        self.lote_cheio = asyncio.Event()
+        self.acordar = asyncio.Event()
+        self.parar = asyncio.Event()
+        self.conn = await asyncio.to_thread(self.conectar)
+
+        loop = asyncio.get_running_loop()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sinal, self.parar.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        tarefas = [asyncio.create_task(self._trabalhador()) for _ in range(self.concorrencia)]
+        tarefas.append(asyncio.create_task(self._confirmador()))
+
+        try:
+            if uma_vez:
+                while await self.reservar_pendentes():
+                    await self.fila.join()
+            else:
+                if self.barramento:
+                    tarefas.append(asyncio.create_task(self._ouvir_barramento()))
+                tarefas.append(asyncio.create_task(self._varredor()))
+                await self.parar.wait()
+                await self.fila.join()
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            await self.confirmar_lote()
+            self.conn.close()
+
+        return self.resumo()
+
+    def resumo(self):
+        """Latência queda -> despacho (p50/p95/p99) e cumprimento do SLO"""
+        latencias = np.array([d['latencia_s'] for d in self.despachos if d['latencia_s'] is not None])
+        resumo = {
+            'despachados': len(self.despachos),
+            'falhos': len(self.falhos),
+            'slo_segundos': self.slo_segundos,
+            'por_prioridade': {}
+        }
+        if len(latencias):
+            resumo.update({
+                'latencia_p50_s': round(float(np.percentile(latencias, 50)), 3),
+                'latencia_p95_s': round(float(np.percentile(latencias, 95)), 3),
+                'latencia_p99_s': round(float(np.percentile(latencias, 99)), 3),
+                'latencia_max_s': round(float(latencias.max()), 3),
+                'dentro_slo_pct': round(100 * float((latencias <= self.slo_segundos).mean()), 2)
+            })
+        for despacho in self.despachos:
+            resumo['por_prioridade'][despacho['nivel_prioridade']] = \
+                resumo['por_prioridade'].get(despacho['nivel_prioridade'], 0) + 1
+        return resumo
+
+
+def criar_saidas(nomes, webhook_url=None, arquivo=None):
+    """Saídas a partir dos nomes da linha de comando"""
+    disponiveis = {
+        'stdout': lambda: SaidaStdout(),
+        'arquivo': lambda: SaidaArquivo(arquivo) if arquivo else SaidaArquivo(),
+        'webhook': lambda: SaidaWebhook(webhook_url) if webhook_url else SaidaWebhook()
+    }
+    invalidas = [n for n in nomes if n not in disponiveis]
+    if invalidas:
+        raise ValueError(f"Saídas inválidas: {invalidas} (disponíveis: {list(disponiveis)})")
+    return [disponiveis[n]() for n in nomes]
+
+
+async def _principal(args):
+    from db.load_data import conectar_banco_mysql
+
+    servidor = None
+    if args.webhook_local:
+        servidor = await servidor_webhook_local(args.porta_webhook, args.taxa_falha_webhook)
+        args.webhook_url = args.webhook_url or f"http://127.0.0.1:{args.porta_webhook}/alertas"
+        print(f"🌐 Webhook local em {args.webhook_url}")
+
+    despachante = DespachanteAlertas(
+        conectar_banco_mysql,
+        criar_saidas(args.saidas.split(','), args.webhook_url, args.arquivo),
+        concorrencia=args.concorrencia,
+        max_tentativas=args.tentativas,
+        slo_segundos=args.slo,
+        barramento=BarramentoEventos()
+    )
+    print("📨 Despachante de alertas iniciado" + (" (backlog atual)" if args.uma_vez else " - Ctrl+C para parar"))
+
+    try:
+        resumo = await despachante.executar(uma_vez=args.uma_vez)
+    finally:
+        if servidor:
+            servidor.close()
+            await servidor.wait_closed()
+
+    print("\n" + "=" * 50)
+    print("RESUMO DO DESPACHO")
+    print("=" * 50)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Despachante assíncrono de alertas')
+    parser.add_argument('--saidas', default='stdout,arquivo',
+                        help='Saídas separadas por vírgula: stdout, arquivo, webhook')
+    parser.add_argument('--webhook-url', default=None, help='URL do webhook')
+    parser.add_argument('--webhook-local', action='store_true',
+                        help='Sobe um webhook local (stand-in) para testes')
+    parser.add_argument('--porta-webhook', type=int, default=8765)
+    parser.add_argument('--taxa-falha-webhook', type=float, default=0.0,
+                        help='Fração de respostas 503 do webhook local')
+    parser.add_argument('--arquivo', default=None, help='Arquivo JSONL da saída "arquivo"')
+    parser.add_argument('--concorrencia', type=int, default=10)
+    parser.add_argument('--tentativas', type=int, default=5)
+    parser.add_argument('--slo', type=float, default=5.0, help='SLO de latência queda -> despacho (s)')
+    parser.add_argument('--uma-vez', action='store_true', help='Despacha o backlog atual e encerra')
+    asyncio.run(_principal(parser.parse_args()))
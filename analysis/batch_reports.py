@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+RELATÓRIOS EM LOTE POR TRABALHADOR E POR SETOR
+==============================================
+
+Gera um relatório de conformidade por trabalhador e por setor a partir de
+UMA consulta agrupada ao banco (não uma consulta por trabalhador). O
+resultado é particionado em memória e os arquivos são renderizados em
+paralelo com um pool de processos. Um manifest.json registra os arquivos
+gerados e os tempos de cada etapa.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Uma única consulta: agregados de leituras por trabalhador (tabela derivada)
+# + eventos de queda e alertas de cada trabalhador
+BATCH_QUERY = """
+    SELECT
+        t.id_trabalhador, t.nome, t.matricula, t.setor,
+        r.total_leituras, r.magnitude_media, r.magnitude_maxima,
+        r.amostras_queda, r.primeira_leitura, r.ultima_leitura,
+        e.id_evento, e.timestamp_queda, e.magnitude_impacto, e.gravidade,
+        e.status_atendimento, e.tempo_resposta_segundos, e.data_evento,
+        a.id_alerta, a.nivel_prioridade, a.enviado
+    FROM trabalhadores t
+    LEFT JOIN (
+        SELECT
+            id_trabalhador,
+            COUNT(*) AS total_leituras,
+            AVG(magnitude) AS magnitude_media,
+            MAX(magnitude) AS magnitude_maxima,
+            SUM(CASE WHEN queda_detectada THEN 1 ELSE 0 END) AS amostras_queda,
+            MIN(data_registro) AS primeira_leitura,
+            MAX(data_registro) AS ultima_leitura
+        FROM leituras_sensores
+        GROUP BY id_trabalhador
+    ) r ON r.id_trabalhador = t.id_trabalhador
+    LEFT JOIN eventos_queda e ON e.id_trabalhador = t.id_trabalhador
+    LEFT JOIN alertas a ON a.id_evento = e.id_evento
+    ORDER BY t.setor, t.id_trabalhador, e.timestamp_queda
+"""
+
+WORKER_COLUMNS = ['id_trabalhador', 'nome', 'matricula', 'setor', 'total_leituras',
+                  'magnitude_media', 'magnitude_maxima', 'amostras_queda',
+                  'primeira_leitura', 'ultima_leitura']
+EVENT_COLUMNS = ['id_evento', 'timestamp_queda', 'magnitude_impacto', 'gravidade',
+                 'status_atendimento', 'tempo_resposta_segundos', 'data_evento',
+                 'id_alerta', 'nivel_prioridade', 'enviado']
+
+
+def slugify(text):
+    """Nome de arquivo seguro a partir de um texto (ex.: 'Produção' -> 'producao')"""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_') or 'sem_nome'
+
+
+def unique_slugs(names, suffix):
+    """
+    slugify de cada nome ({chave: texto}); textos distintos que geram o mesmo
+    slug recebem suffix(chave) para não sobrescreverem o arquivo um do outro
+    """
+    slugs = {key: slugify(text) for key, text in names.items()}
+    counts = {}
+    for slug in slugs.values():
+        counts[slug] = counts.get(slug, 0) + 1
+    return {key: slug if counts[slug] == 1 else f"{slug}_{suffix(key)}"
+            for key, slug in slugs.items()}
+
+
+def _number(value, fmt='{:.2f}', default='-'):
+    if value is None or pd.isna(value):
+        return default
+    return fmt.format(value)
+
+
+def _header(title):
+    return [
+        "=" * 70,
+        title,
+        "=" * 70,
+        "",
+        f"Data de Geração: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
+        "",
+    ]
+
+
+def _footer():
+    return ["", "=" * 70, "FIM DO RELATÓRIO", "=" * 70, ""]
+
+
+def render_worker_report(payload):
+    """Renderiza o relatório de um trabalhador (executado no pool de processos)"""
+    inicio = time.perf_counter()
+    worker = payload['worker']
+    events = payload['events']
+
+    lines = _header(f"RELATÓRIO DO TRABALHADOR - {worker['nome']} ({worker['matricula']})")
+    lines += [
+        f"Setor: {worker['setor']}",
+        f"Total de leituras: {int(worker['total_leituras'] or 0)}",
+        f"Magnitude média: {_number(worker['magnitude_media'], '{:.3f}g')}",
+        f"Magnitude máxima: {_number(worker['magnitude_maxima'], '{:.3f}g')}",
+        f"Amostras com queda: {int(worker['amostras_queda'] or 0)}",
+        f"Período monitorado: {worker['primeira_leitura'] or '-'} a {worker['ultima_leitura'] or '-'}",
+        "",
+        f"EVENTOS DE QUEDA: {len(events)}",
+        "-" * 70,
+    ]
+
+    for event in events:
+        alerta = (f"#{int(event['id_alerta'])} {str(event['nivel_prioridade']).upper()} "
+                  f"({'Enviado' if event['enviado'] else 'PENDENTE'})"
+                  if event['id_alerta'] is not None and not pd.isna(event['id_alerta'])
+                  else 'Sem alerta')
+        lines += [
+            f"EVENTO #{int(event['id_evento'])}",
+            f"  Data/Hora: {event['data_evento']}",
+            f"  Magnitude: {_number(event['magnitude_impacto'], '{:.2f}g')}",
+            f"  Gravidade: {event['gravidade']}",
+            f"  Atendimento: {event['status_atendimento']}",
+            f"  Tempo de resposta: {_number(event['tempo_resposta_segundos'], '{:.0f}s')}",
+            f"  Alerta: {alerta}",
+            "-" * 70,
+        ]
+
+    if not events:
+        lines.append("✅ Nenhum evento de queda registrado.")
+
+    lines += _footer()
+    Path(payload['path']).write_text("\n".join(lines), encoding='utf-8')
+
+    return {
+        'tipo': 'trabalhador',
+        'chave': worker['matricula'],
+        'arquivo': payload['path'],
+        'eventos': len(events),
+        'segundos': round(time.perf_counter() - inicio, 4)
+    }
+
+
+def render_sector_report(payload):
+    """Renderiza o relatório consolidado de um setor (executado no pool de processos)"""
+    inicio = time.perf_counter()
+    workers = payload['workers']
+    events = payload['events']
+
+    by_gravity = {}
+    pending = 0
+    for event in events:
+        by_gravity[event['gravidade']] = by_gravity.get(event['gravidade'], 0) + 1
+        if event['id_alerta'] is not None and not pd.isna(event['id_alerta']) and not event['enviado']:
+            pending += 1
+
+    lines = _header(f"RELATÓRIO DO SETOR - {payload['setor']}")
+    lines += [
+        f"Trabalhadores monitorados: {len(workers)}",
+        f"Total de leituras: {sum(int(w['total_leituras'] or 0) for w in workers)}",
+        f"Eventos de queda: {len(events)}",
+        f"Alertas pendentes: {pending}",
+        "",
+        "QUEDAS POR GRAVIDADE:",
+    ]
+    for gravity in ('grave', 'moderada', 'leve'):
+        lines.append(f"  {gravity}: {by_gravity.get(gravity, 0)}")
+
+    lines += ["", "TRABALHADORES:", "-" * 70]
+    falls_by_worker = {}
+    for event in events:
+        falls_by_worker[event['id_trabalhador']] = falls_by_worker.get(event['id_trabalhador'], 0) + 1
+    for worker in sorted(workers, key=lambda w: -falls_by_worker.get(w['id_trabalhador'], 0)):
+        lines.append(
+            f"  {worker['matricula']:<10} {worker['nome']:<30} "
+            f"quedas: {falls_by_worker.get(worker['id_trabalhador'], 0):>4}  "
+            f"mag. máx: {_number(worker['magnitude_maxima'], '{:.2f}g'):>7}"
+        )
+
+    lines += _footer()
+    Path(payload['path']).write_text("\n".join(lines), encoding='utf-8')
+
+    return {
+        'tipo': 'setor',
+        'chave': payload['setor'],
+        'arquivo': payload['path'],
+        'eventos': len(events),
+        'segundos': round(time.perf_counter() - inicio, 4)
+    }
+
+
+def _records(df):
+    """DataFrame -> lista de dicts com None no lugar de NaN (picklável e leve)"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def generate_batch_reports(conn, output_dir=None, processes=None):
+    """
+    Gera relatórios por trabalhador e por setor em paralelo
+
+    Args:
+        conn: Conexão com o banco
+        output_dir (str): Pasta de saída (padrão: logs/relatorios_<timestamp>)
+        processes (int): Processos do pool (padrão: nº de CPUs)
+
+    Returns:
+        dict: Manifest com arquivos gerados e tempos
+    """
+    inicio = time.perf_counter()
+    output_dir = Path(output_dir or f"logs/relatorios_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    (output_dir / 'trabalhadores').mkdir(parents=True, exist_ok=True)
+    (output_dir / 'setores').mkdir(parents=True, exist_ok=True)
+
+    # 1. Uma consulta agrupada para todos os trabalhadores
+    df = pd.read_sql_query(BATCH_QUERY, conn)
+    query_seconds = time.perf_counter() - inicio
+
+    # 2. Particionar por trabalhador e por setor
+    particao_inicio = time.perf_counter()
+    df['setor'] = df['setor'].fillna('Sem setor')
+    workers = df.drop_duplicates('id_trabalhador')[WORKER_COLUMNS]
+    events = df[df['id_evento'].notna()][['id_trabalhador', 'setor', *EVENT_COLUMNS]]
+    events_by_worker = {k: _records(g) for k, g in events.groupby('id_trabalhador')}
+    events_by_sector = {k: _records(g) for k, g in events.groupby('setor')}
+
+    worker_records = _records(workers)
+    worker_slugs = unique_slugs(
+        {w['id_trabalhador']: w['matricula'] for w in worker_records}, int
+    )
+    sector_slugs = unique_slugs(
+        {setor: setor for setor in workers['setor'].unique()},
+        lambda key: hashlib.sha1(str(key).encode('utf-8')).hexdigest()[:6]
+    )
+
+    tasks = []
+    for worker in worker_records:
+        tasks.append((render_worker_report, {
+            'worker': worker,
+            'events': events_by_worker.get(worker['id_trabalhador'], []),
+            'path': str(output_dir / 'trabalhadores' / f"{worker_slugs[worker['id_trabalhador']]}.txt")
+        }))
+    for setor, group in workers.groupby('setor'):
+        tasks.append((render_sector_report, {
+            'setor': setor,
+            'workers': _records(group),
+            'events': events_by_sector.get(setor, []),
+            'path': str(output_dir / 'setores' / f"{sector_slugs[setor]}.txt")
+        }))
+    partition_seconds = time.perf_counter() - particao_inicio
+
+    # 3. Renderizar em paralelo
+    render_inicio = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(func, payload) for func, payload in tasks]
+        files = [future.result() for future in futures]
+    render_seconds = time.perf_counter() - render_inicio
+
+    manifest = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'pasta': str(output_dir),
+        'processos': processes,
+        'linhas_consulta': len(df),
+        'trabalhadores': len(workers),
+        'setores': int(workers['setor'].nunique()),
+        'tempos': {
+            'consulta_s': round(query_seconds, 4),
+            'particao_s': round(partition_seconds, 4),
+            'renderizacao_s': round(render_seconds, 4),
+            'total_s': round(time.perf_counter() - inicio, 4)
+        },
+        'arquivos': files
+    }
+
+    with open(output_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    return manifest
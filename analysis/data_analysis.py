@@ -10,30 +10,162 @@ Autor: Thiago Paraizo
 Data: Junho 2025 
 """
 
+import sys
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configurações de estilo para gráficos
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
+# Permite importar os módulos do projeto ao executar como script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis.streaming_stats import StreamingStatistics
+from analysis.downsampling import DEFAULT_MAX_POINTS, downsample_frame
+
+
+def load_pyplot():
+    """
+    Importa matplotlib/seaborn só no primeiro gráfico e aplica o estilo
+
+    Fora do escopo do módulo para que quem só usa as consultas (ex.: o
+    dashboard) não pague a importação da pilha de gráficos.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
+    return plt
+
+# Perfis de aceleração da frota simulada: status -> (médias XYZ, desvios XYZ)
+FLEET_PROFILES = {
+    'NORMAL': ((0.01, -0.01, 0.98), (0.04, 0.03, 0.04)),
+    'MOVIMENTO': ((0.10, 0.05, 0.95), (0.15, 0.12, 0.10)),
+    'QUEDA_LIVRE': ((0.03, 0.01, 0.18), (0.06, 0.04, 0.09)),
+    'QUEDA_DETECTADA': ((1.80, 1.00, 3.10), (0.55, 0.35, 0.45)),
+}
+
+# Colunas no formato do firmware -> colunas de leituras_sensores
+DB_COLUMNS = {
+    'Timestamp(ms)': 'timestamp_ms',
+    'Ax(g)': 'aceleracao_x',
+    'Ay(g)': 'aceleracao_y',
+    'Az(g)': 'aceleracao_z',
+    'Magnitude(g)': 'magnitude',
+    'Queda': 'queda_detectada',
+    'Status': 'status_movimento',
+    'Dispositivo': 'id_dispositivo',
+    'Trabalhador': 'id_trabalhador',
+}
+
+def build_readings_query(device=None, worker=None, start_ms=None, end_ms=None,
+                         start_date=None, end_date=None, columns=None):
+    """
+    Monta o SELECT de leituras_sensores com filtros e colunas no SQL
+    
+    Returns:
+        tuple: (query, params) com placeholders %s
+    """
+    columns = columns or list(DB_COLUMNS)
+    invalid = [c for c in columns if c not in DB_COLUMNS]
+    if invalid:
+        raise ValueError(f"Colunas inválidas: {invalid}")
+    
+    conditions = []
+    params = []
+    
+    # Dispositivo/trabalhador: ids numéricos ou serial/matrícula
+    for value, column, lookup in (
+        (device, 'id_dispositivo',
+         "SELECT id_dispositivo FROM dispositivos WHERE serial_number IN ({})"),
+        (worker, 'id_trabalhador',
+         "SELECT id_trabalhador FROM trabalhadores WHERE matricula IN ({})"),
+    ):
+        if value is None:
+            continue
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        placeholders = ', '.join(['%s'] * len(values))
+        if all(isinstance(v, str) and not v.isdigit() for v in values):
+            conditions.append(f"{column} IN ({lookup.format(placeholders)})")
+            params.extend(values)
+        else:
+            conditions.append(f"{column} IN ({placeholders})")
+            params.extend(int(v) for v in values)
+    
+    for value, condition in (
+        (start_ms, "timestamp_ms >= %s"),
+        (end_ms, "timestamp_ms <= %s"),
+        (start_date, "data_registro >= %s"),
+        (end_date, "data_registro < %s"),
+    ):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    
+    query = f"SELECT {', '.join(DB_COLUMNS[c] for c in columns)} FROM leituras_sensores"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY timestamp_ms"
+    
+    return query, params
+
+def _archive_ids(value, column):
+    """Ids numéricos do filtro; arquivos não trazem serial_number/matrícula"""
+    values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+    try:
+        return [int(v) for v in values]
+    except (TypeError, ValueError):
+        raise ValueError(f"Arquivos só têm o id numérico em '{column}' (recebido: {values}); "
+                         f"para filtrar por serial/matrícula leia do banco (--db)") from None
+
+def filter_frame(df, device=None, worker=None, start_ms=None, end_ms=None,
+                 start_date=None, end_date=None, columns=None):
+    """
+    Aplica a um DataFrame no formato do firmware (CSV) os mesmos filtros
+    de build_readings_query
+    """
+    if start_date is not None or end_date is not None:
+        raise ValueError("Arquivos não possuem data de registro; use start_ms/end_ms")
+    
+    mask = pd.Series(True, index=df.index)
+    for column, value in (('Dispositivo', device), ('Trabalhador', worker)):
+        if value is None:
+            continue
+        if column not in df.columns:
+            raise ValueError(f"Arquivo sem a coluna '{column}': filtro indisponível")
+        mask &= df[column].isin(_archive_ids(value, column))
+    if start_ms is not None:
+        mask &= df['Timestamp(ms)'] >= int(start_ms)
+    if end_ms is not None:
+        mask &= df['Timestamp(ms)'] <= int(end_ms)
+    
+    df = df[mask]
+    return df[columns] if columns else df
 
 class WearableSafetyAnalyzer:
-    def __init__(self, data_file=None):
+    def __init__(self, data_file=None, database=False, filters=None):
         """
         Inicializa o analisador de dados do sistema wearable
         
         Args:
-            data_file (str): Caminho para arquivo CSV com dados dos sensores
+            data_file (str): Caminho para arquivo CSV (ou Parquet) com dados dos sensores
+            database (bool): Ler as leituras diretamente de leituras_sensores
+            filters (dict): Filtros aplicados à fonte (device, worker, start_ms,
+                end_ms, start_date, end_date, columns): no SQL, nos row groups do
+                Parquet ou em memória no CSV
         """
         self.data_file = data_file
+        self.database = database
+        self.filters = filters or {}
         self.df = None
+        self.stats = None
         self.threshold_freefall = 0.5
         self.threshold_impact = 1.8
+        self.max_plot_points = DEFAULT_MAX_POINTS
         
     def generate_sample_data(self, duration_minutes=5):
         """
@@ -48,79 +180,38 @@ class WearableSafetyAnalyzer:
         sample_rate = 20  # Hz
         total_samples = duration_minutes * 60 * sample_rate
         
-        # Inicializar arrays
-        timestamps = np.arange(0, total_samples * 50, 50)  # 50ms intervals
-        ax_values = []
-        ay_values = []
-        az_values = []
-        fall_events = []
-        
-        # Simular dados realísticos
-        for i in range(total_samples):
-            # Movimento normal na maior parte do tempo
-            if i < total_samples * 0.3:  # Primeiros 30% - normal
-                ax = np.random.normal(0.02, 0.05)
-                ay = np.random.normal(-0.01, 0.03)
-                az = np.random.normal(0.98, 0.05)
-                fall = 0
-                
-            elif i < total_samples * 0.35:  # Movimento ativo
-                ax = np.random.normal(0.1, 0.15)
-                ay = np.random.normal(0.05, 0.12)
-                az = np.random.normal(0.95, 0.1)
-                fall = 0
-                
-            elif i < total_samples * 0.38:  # Simulando queda livre
-                ax = np.random.normal(0.02, 0.05)
-                ay = np.random.normal(0.01, 0.03)
-                az = np.random.normal(0.2, 0.1)  # Baixa aceleração
-                fall = 0
-                
-            elif i < total_samples * 0.4:  # Impacto da queda
-                ax = np.random.normal(1.5, 0.5)
-                ay = np.random.normal(0.8, 0.3)
-                az = np.random.normal(2.8, 0.4)  # Alto impacto
-                fall = 1
-                
-            elif i < total_samples * 0.7:  # Volta ao normal
-                ax = np.random.normal(0.01, 0.04)
-                ay = np.random.normal(-0.02, 0.03)
-                az = np.random.normal(0.99, 0.04)
-                fall = 0
-                
-            elif i < total_samples * 0.73:  # Segunda queda - queda livre
-                ax = np.random.normal(0.05, 0.08)
-                ay = np.random.normal(0.02, 0.05)
-                az = np.random.normal(0.15, 0.08)
-                fall = 0
-                
-            elif i < total_samples * 0.75:  # Segunda queda - impacto
-                ax = np.random.normal(2.1, 0.6)
-                ay = np.random.normal(1.2, 0.4)
-                az = np.random.normal(3.5, 0.5)
-                fall = 1
-                
-            else:  # Resto do tempo - normal
-                ax = np.random.normal(0.01, 0.04)
-                ay = np.random.normal(-0.01, 0.03)
-                az = np.random.normal(0.98, 0.04)
-                fall = 0
-            
-            ax_values.append(ax)
-            ay_values.append(ay)
-            az_values.append(az)
-            fall_events.append(fall)
-        
-        # Calcular magnitude
-        magnitudes = [np.sqrt(ax**2 + ay**2 + az**2) 
-                     for ax, ay, az in zip(ax_values, ay_values, az_values)]
+        # Segmentos do cenário: (fim em fração do total, médias XYZ, desvios XYZ, queda)
+        segments = [
+            (0.30, (0.02, -0.01, 0.98), (0.05, 0.03, 0.05), 0),  # Normal
+            (0.35, (0.10, 0.05, 0.95), (0.15, 0.12, 0.10), 0),   # Movimento ativo
+            (0.38, (0.02, 0.01, 0.20), (0.05, 0.03, 0.10), 0),   # Queda livre
+            (0.40, (1.50, 0.80, 2.80), (0.50, 0.30, 0.40), 1),   # Impacto da queda
+            (0.70, (0.01, -0.02, 0.99), (0.04, 0.03, 0.04), 0),  # Volta ao normal
+            (0.73, (0.05, 0.02, 0.15), (0.08, 0.05, 0.08), 0),   # Segunda queda - queda livre
+            (0.75, (2.10, 1.20, 3.50), (0.60, 0.40, 0.50), 1),   # Segunda queda - impacto
+            (1.00, (0.01, -0.01, 0.98), (0.04, 0.03, 0.04), 0),  # Resto do tempo - normal
+        ]
+        
+        # Tamanho de cada segmento (mesmos cortes do cenário original)
+        ends = np.ceil(np.array([seg[0] for seg in segments]) * total_samples).astype(int)
+        lengths = np.diff(np.concatenate([[0], np.minimum(ends, total_samples)]))
+        
+        # Médias/desvios por amostra e sorteio de todos os eixos de uma vez
+        means = np.repeat(np.array([seg[1] for seg in segments]), lengths, axis=0)
+        stds = np.repeat(np.array([seg[2] for seg in segments]), lengths, axis=0)
+        values = np.random.normal(means, stds)
+        fall_events = np.repeat(np.array([seg[3] for seg in segments]), lengths)
+        
+        timestamps = np.arange(total_samples) * 50  # 50ms intervals
+        magnitudes = np.sqrt((values ** 2).sum(axis=1))
         
         # Criar DataFrame
+        self.stats = None
         self.df = pd.DataFrame({
             'Timestamp(ms)': timestamps,
-            'Ax(g)': ax_values,
-            'Ay(g)': ay_values,
-            'Az(g)': az_values,
+            'Ax(g)': values[:, 0],
+            'Ay(g)': values[:, 1],
+            'Az(g)': values[:, 2],
             'Magnitude(g)': magnitudes,
             'Queda': fall_events
         })
@@ -128,11 +219,198 @@ class WearableSafetyAnalyzer:
         print(f"Dados gerados: {len(self.df)} amostras em {duration_minutes} minutos")
         return self.df
     
+    def _iter_fleet_chunks(self, n_devices, duration_hours, falls_per_hour,
+                           movement_fraction, sample_rate, chunk_rows, rng):
+        """
+        Gera blocos (dispositivos x janela de tempo) da frota simulada
+        usando apenas operações vetorizadas
+        
+        Yields:
+            pd.DataFrame: bloco no formato do firmware + colunas de identificação
+        """
+        period_ms = 1000 / sample_rate
+        total_samples = int(duration_hours * 3600 * sample_rate)
+        
+        # Janela de tempo por bloco e quantidade de dispositivos por bloco
+        window = min(total_samples, max(chunk_rows, 1))
+        devices_per_chunk = max(1, chunk_rows // window)
+        
+        # Offset de boot de cada dispositivo (millis() do ESP32)
+        boot_offsets = rng.integers(1000, 10000, size=n_devices)
+        
+        # Perfis: (médias XYZ, desvios XYZ) por código de status
+        means_table = np.array([p[0] for p in FLEET_PROFILES.values()])
+        stds_table = np.array([p[1] for p in FLEET_PROFILES.values()])
+        status_names = np.array(list(FLEET_PROFILES.keys()))
+        
+        freefall_len = int(0.3 * sample_rate)
+        impact_len = max(1, int(0.2 * sample_rate))
+        burst_len = 2 * sample_rate
+        fall_phases = [(2, freefall_len), (3, impact_len)]
+        burst_phases = [(1, burst_len)]
+        max_span = max(burst_len, freefall_len + impact_len)
+        
+        for first_device in range(0, n_devices, devices_per_chunk):
+            devices = np.arange(first_device, min(first_device + devices_per_chunk, n_devices))
+            # Fases que passam do fim de uma janela continuam no início da próxima
+            carry = np.zeros((len(devices), max_span), dtype=np.int8)
+            
+            for start in range(0, total_samples, window):
+                w = min(window, total_samples - start)
+                last = start + w >= total_samples
+                buffer = np.zeros((len(devices), w + max_span), dtype=np.int8)
+                
+                # Rajadas de movimento ativo
+                n_bursts = rng.poisson(movement_fraction * w / burst_len, size=len(devices))
+                self._mark_segments(buffer, n_bursts, w - burst_len if last else w,
+                                    burst_phases, rng)
+                
+                # Quedas: queda livre seguida de impacto (na última janela só
+                # as que terminam antes do fim da simulação)
+                n_falls = rng.poisson(falls_per_hour * w / (sample_rate * 3600), size=len(devices))
+                self._mark_segments(buffer, n_falls, w - freefall_len - impact_len if last else w,
+                                    fall_phases, rng)
+                
+                # Queda herdada prevalece sobre movimento novo (códigos crescentes)
+                buffer[:, :max_span] = np.maximum(buffer[:, :max_span], carry)
+                carry = buffer[:, w:].copy()
+                codes = buffer[:, :w].ravel()
+                
+                values = rng.normal(means_table[codes], stds_table[codes])
+                magnitudes = np.sqrt((values ** 2).sum(axis=1))
+                
+                device_idx = np.repeat(devices, w)
+                local = np.tile(np.arange(start, start + w), len(devices))
+                
+                yield pd.DataFrame({
+                    'Dispositivo': device_idx + 1,
+                    'Trabalhador': device_idx + 1,
+                    'Timestamp(ms)': boot_offsets[device_idx] + (local * period_ms).astype(np.int64),
+                    'Ax(g)': values[:, 0].round(3),
+                    'Ay(g)': values[:, 1].round(3),
+                    'Az(g)': values[:, 2].round(3),
+                    'Magnitude(g)': magnitudes.round(3),
+                    'Queda': (codes == 3).astype(np.int8),
+                    'Status': status_names[codes]
+                })
+    
+    @staticmethod
+    def _mark_segments(codes, counts, limit, phases, rng):
+        """
+        Marca segmentos consecutivos (fases) a partir de inícios aleatórios em
+        [0, limit) por dispositivo; codes (dispositivos x amostras) precisa ter
+        folga para o segmento inteiro após limit
+        """
+        total = int(counts.sum())
+        if total == 0 or limit <= 0:
+            return
+        
+        owners = np.repeat(np.arange(len(counts)), counts)
+        starts = rng.integers(0, limit, size=total)
+        
+        offset = 0
+        for code, length in phases:
+            local = starts[:, None] + offset + np.arange(length)
+            codes[owners[:, None], local] = code
+            offset += length
+    
+    def generate_fleet_data(self, n_devices=100, duration_hours=1.0, falls_per_hour=0.5,
+                            movement_fraction=0.15, sample_rate=20, chunk_rows=500_000,
+                            output=None, fmt='csv', conn=None, seed=None):
+        """
+        Gera dados sintéticos de uma frota de dispositivos em larga escala
+        
+        Args:
+            n_devices (int): Quantidade de dispositivos/trabalhadores simulados
+            duration_hours (float): Duração da simulação em horas
+            falls_per_hour (float): Taxa média de quedas por dispositivo por hora
+            movement_fraction (float): Fração aproximada do tempo em movimento ativo
+            sample_rate (int): Taxa de amostragem (Hz)
+            chunk_rows (int): Linhas por bloco gerado/gravado
+            output (str): Arquivo de saída (csv/parquet); None mantém em memória
+            fmt (str): 'csv', 'parquet' ou 'db'
+            conn: Conexão com o banco (formato 'db'); padrão conecta no MySQL
+            seed (int): Semente para reprodutibilidade
+        """
+        rng = np.random.default_rng(seed)
+        chunks = self._iter_fleet_chunks(n_devices, duration_hours, falls_per_hour,
+                                         movement_fraction, sample_rate, chunk_rows, rng)
+        
+        print(f"Gerando frota simulada: {n_devices} dispositivos x {duration_hours}h "
+              f"@ {sample_rate} Hz ({falls_per_hour} quedas/h)...")
+        inicio = time.perf_counter()
+        
+        if output is None and fmt != 'db':
+            self.stats = None
+            self.df = pd.concat(chunks, ignore_index=True)
+            print(f"Dados gerados: {len(self.df)} amostras "
+                  f"em {time.perf_counter() - inicio:.1f}s")
+            return self.df
+        
+        total_rows = 0
+        total_falls = 0
+        writer = None
+        close_conn = False
+        
+        if fmt == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Formato parquet requer pyarrow: pip install pyarrow")
+        elif fmt == 'db':
+            from db.load_data import conectar_banco_mysql, garantir_frota, inserir_leituras_lote
+            if conn is None:
+                conn = conectar_banco_mysql()
+                close_conn = True
+            garantir_frota(conn, n_devices)
+            next_id = None
+        elif fmt != 'csv':
+            raise ValueError(f"Formato inválido: {fmt} (use csv, parquet ou db)")
+        
+        try:
+            for chunk in chunks:
+                if fmt == 'csv':
+                    chunk.to_csv(output, mode='w' if total_rows == 0 else 'a',
+                                 header=total_rows == 0, index=False, float_format='%.3f')
+                elif fmt == 'parquet':
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output, table.schema)
+                    writer.write_table(table)
+                else:
+                    next_id = inserir_leituras_lote(conn, chunk, id_inicial=next_id)
+                
+                total_rows += len(chunk)
+                total_falls += int(chunk['Queda'].sum())
+        finally:
+            if writer is not None:
+                writer.close()
+            if close_conn:
+                conn.close()
+        
+        elapsed = time.perf_counter() - inicio
+        destino = output if fmt != 'db' else 'banco de dados'
+        print(f"Dados gerados: {total_rows} amostras ({total_falls} amostras de queda) "
+              f"em {elapsed:.1f}s -> {destino}")
+        
+        return {
+            'rows': total_rows,
+            'fall_samples': total_falls,
+            'seconds': elapsed,
+            'output': destino
+        }
+    
     def load_data(self):
-        """Carrega dados do arquivo CSV"""
-        if self.data_file:
+        """Carrega dados do arquivo CSV, do arquivo Parquet ou do banco"""
+        self.stats = None
+        if self.database:
+            self.load_from_database(**self.filters)
+        elif self.data_file and str(self.data_file).endswith('.parquet'):
+            self.load_from_archive(self.data_file, **self.filters)
+        elif self.data_file:
             try:
-                self.df = pd.read_csv(self.data_file)
+                self.df = filter_frame(pd.read_csv(self.data_file), **self.filters)
                 print(f"Dados carregados: {len(self.df)} registros")
             except FileNotFoundError:
                 print(f"Arquivo {self.data_file} não encontrado. Gerando dados de exemplo...")
@@ -140,55 +418,159 @@ class WearableSafetyAnalyzer:
         else:
             self.generate_sample_data()
     
+    def load_from_database(self, device=None, worker=None, start_ms=None, end_ms=None,
+                           start_date=None, end_date=None, columns=None, conn=None):
+        """
+        Carrega do banco apenas a fatia necessária de leituras_sensores
+        
+        Filtros e seleção de colunas são aplicados no SQL (predicate pushdown).
+        
+        Args:
+            device (int | str | list): id_dispositivo(s) ou serial_number
+            worker (int | str | list): id_trabalhador(es) ou matrícula
+            start_ms, end_ms (int): Intervalo de timestamp_ms (inclusivo)
+            start_date, end_date (str | datetime): Intervalo de data_registro
+            columns (list): Colunas no formato do firmware (padrão: todas)
+            conn: Conexão com o banco (padrão: conecta no MySQL)
+        """
+        query, params = build_readings_query(device, worker, start_ms, end_ms,
+                                             start_date, end_date, columns)
+        
+        from db.load_data import conectar_banco_mysql
+        close_conn = conn is None
+        if conn is None:
+            conn = conectar_banco_mysql()
+        try:
+            df = pd.read_sql_query(query, conn, params=params)
+        finally:
+            if close_conn:
+                conn.close()
+        
+        self.stats = None
+        self.df = df.rename(columns={v: k for k, v in DB_COLUMNS.items()})
+        print(f"Dados carregados do banco: {len(self.df)} registros")
+        return self.df
+    
+    def _iter_database_chunks(self, chunksize, conn=None):
+        """Lê a fatia filtrada do banco em blocos (para estatísticas em streaming)"""
+        filters = dict(self.filters)
+        filters['columns'] = ['Timestamp(ms)', 'Magnitude(g)', 'Queda', *StreamingStatistics.AXES]
+        query, params = build_readings_query(**filters)
+        
+        from db.load_data import conectar_banco_mysql
+        close_conn = conn is None
+        if conn is None:
+            conn = conectar_banco_mysql()
+        try:
+            for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize):
+                yield chunk.rename(columns={v: k for k, v in DB_COLUMNS.items()})
+        finally:
+            if close_conn:
+                conn.close()
+    
+    def load_from_archive(self, path, device=None, worker=None, start_ms=None, end_ms=None,
+                          start_date=None, end_date=None, columns=None):
+        """
+        Carrega de um arquivo Parquet (ex.: gerado por generate_fleet_data)
+        lendo apenas as colunas e row groups que atendem aos filtros
+        """
+        if start_date is not None or end_date is not None:
+            raise ValueError("Arquivos Parquet não possuem data de registro; use start_ms/end_ms")
+        
+        filters = []
+        for column, value in (('Dispositivo', device), ('Trabalhador', worker)):
+            if value is not None:
+                filters.append((column, 'in', _archive_ids(value, column)))
+        if start_ms is not None:
+            filters.append(('Timestamp(ms)', '>=', int(start_ms)))
+        if end_ms is not None:
+            filters.append(('Timestamp(ms)', '<=', int(end_ms)))
+        
+        self.stats = None
+        self.df = pd.read_parquet(path, columns=columns, filters=filters or None)
+        print(f"Dados carregados do arquivo: {len(self.df)} registros")
+        return self.df
+    
+    def compute_statistics(self, chunksize=500_000):
+        """
+        Calcula todas as estatísticas em uma única passada por blocos
+        
+        Se os dados ainda não foram carregados e há um arquivo CSV, o arquivo
+        é lido em streaming (não precisa caber em memória). O resultado fica
+        em cache e é reutilizado pelo console e pelo relatório.
+        """
+        if self.stats is not None:
+            return self.stats
+        
+        if self.df is None and self.database:
+            engine = StreamingStatistics.from_chunks(self._iter_database_chunks(chunksize))
+        elif (self.df is None and self.data_file and str(self.data_file).endswith('.csv')
+              and Path(self.data_file).exists()):
+            if self.filters:
+                filters = {**self.filters, 'columns': None}
+                engine = StreamingStatistics.from_chunks(
+                    filter_frame(chunk, **filters) for chunk in pd.read_csv(self.data_file, chunksize=chunksize))
+            else:
+                engine = StreamingStatistics.from_csv(self.data_file, chunksize=chunksize)
+        else:
+            if self.df is None:
+                self.load_data()
+            engine = StreamingStatistics.from_frame(self.df, chunksize=chunksize)
+        
+        self.stats = engine.result()
+        return self.stats
+    
     def basic_statistics(self):
         """Calcula estatísticas básicas dos dados"""
-        if self.df is None:
-            self.load_data()
+        stats = self.compute_statistics()
         
         print("\n" + "="*50)
         print("ESTATÍSTICAS BÁSICAS DO SISTEMA WEARABLE")
         print("="*50)
         
         # Estatísticas gerais
-        total_time = (self.df['Timestamp(ms)'].max() - self.df['Timestamp(ms)'].min()) / 1000
-        total_falls = self.df['Queda'].sum()
-        sample_rate = len(self.df) / total_time
+        total_time = stats['total_time_s']
+        total_falls = stats['falls']
         
         print(f"Tempo total de monitoramento: {total_time:.1f} segundos")
-        print(f"Total de amostras: {len(self.df)}")
-        print(f"Taxa de amostragem média: {sample_rate:.1f} Hz")
+        print(f"Total de amostras: {stats['samples']}")
+        print(f"Taxa de amostragem média: {stats['sample_rate_hz']:.1f} Hz")
         print(f"Total de quedas detectadas: {total_falls}")
         
         if total_falls > 0:
             print(f"Frequência de quedas: {total_falls/total_time*60:.2f} quedas/minuto")
         
         # Estatísticas da magnitude da aceleração
+        magnitude = stats['magnitude']
         print(f"\nMAGNITUDE DA ACELERAÇÃO:")
-        print(f"Média: {self.df['Magnitude(g)'].mean():.3f}g")
-        print(f"Mediana: {self.df['Magnitude(g)'].median():.3f}g")
-        print(f"Desvio padrão: {self.df['Magnitude(g)'].std():.3f}g")
-        print(f"Mínimo: {self.df['Magnitude(g)'].min():.3f}g")
-        print(f"Máximo: {self.df['Magnitude(g)'].max():.3f}g")
+        print(f"Média: {magnitude['mean']:.3f}g")
+        print(f"Mediana: {magnitude['median']:.3f}g")
+        print(f"Desvio padrão: {magnitude['std']:.3f}g")
+        print(f"Mínimo: {magnitude['min']:.3f}g")
+        print(f"Máximo: {magnitude['max']:.3f}g")
         
         # Análise por eixo
         print(f"\nACELERAÇÃO POR EIXO:")
-        for axis in ['Ax(g)', 'Ay(g)', 'Az(g)']:
-            mean_val = self.df[axis].mean()
-            std_val = self.df[axis].std()
-            print(f"{axis}: {mean_val:.3f} ± {std_val:.3f}g")
+        for axis, axis_stats in stats['axes'].items():
+            print(f"{axis}: {axis_stats['mean']:.3f} ± {axis_stats['std']:.3f}g")
     
     def plot_acceleration_timeline(self):
         """Plota timeline da magnitude da aceleração"""
         if self.df is None:
             self.load_data()
         
+        plt = load_pyplot()
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 10))
         
+        # Downsampling acima do orçamento (mantém quedas e cruzamentos de threshold)
+        plot_df = downsample_frame(self.df, 'Magnitude(g)', self.max_plot_points, keep_col='Queda',
+                                   thresholds=(self.threshold_freefall, self.threshold_impact))
+        
         # Converter timestamp para segundos
-        time_seconds = self.df['Timestamp(ms)'] / 1000
+        time_seconds = plot_df['Timestamp(ms)'] / 1000
         
         # Gráfico 1: Magnitude da aceleração
-        ax1.plot(time_seconds, self.df['Magnitude(g)'], 
+        ax1.plot(time_seconds, plot_df['Magnitude(g)'], 
                 linewidth=1, color='blue', alpha=0.7, label='Magnitude da Aceleração')
         
         # Linhas de threshold
@@ -211,9 +593,9 @@ class WearableSafetyAnalyzer:
         ax1.set_ylim(0, max(self.df['Magnitude(g)'].max() * 1.1, 5))
         
         # Gráfico 2: Aceleração por eixo
-        ax2.plot(time_seconds, self.df['Ax(g)'], label='Eixo X', alpha=0.8)
-        ax2.plot(time_seconds, self.df['Ay(g)'], label='Eixo Y', alpha=0.8)
-        ax2.plot(time_seconds, self.df['Az(g)'], label='Eixo Z', alpha=0.8)
+        for axis, label in [('Ax(g)', 'Eixo X'), ('Ay(g)', 'Eixo Y'), ('Az(g)', 'Eixo Z')]:
+            axis_df = downsample_frame(self.df, axis, self.max_plot_points, keep_col='Queda')
+            ax2.plot(axis_df['Timestamp(ms)'] / 1000, axis_df[axis], label=label, alpha=0.8)
         
         ax2.set_xlabel('Tempo (segundos)')
         ax2.set_ylabel('Aceleração (g)')
@@ -236,6 +618,7 @@ class WearableSafetyAnalyzer:
             print("Nenhuma queda detectada nos dados!")
             return
         
+        plt = load_pyplot()
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
         
         # Gráfico 1: Distribuição da magnitude durante quedas
@@ -247,8 +630,10 @@ class WearableSafetyAnalyzer:
         ax1.grid(True, alpha=0.3)
         
         # Gráfico 2: Timeline de quedas
-        time_seconds = self.df['Timestamp(ms)'] / 1000
-        ax2.plot(time_seconds, self.df['Magnitude(g)'], color='blue', alpha=0.5, linewidth=1)
+        plot_df = downsample_frame(self.df, 'Magnitude(g)', self.max_plot_points, keep_col='Queda',
+                                   thresholds=(self.threshold_impact,))
+        time_seconds = plot_df['Timestamp(ms)'] / 1000
+        ax2.plot(time_seconds, plot_df['Magnitude(g)'], color='blue', alpha=0.5, linewidth=1)
         ax2.scatter(fall_events['Timestamp(ms)'] / 1000, fall_events['Magnitude(g)'], 
                    color='red', s=100, zorder=5, marker='X')
         ax2.set_xlabel('Tempo (segundos)')
@@ -301,8 +686,7 @@ Tempo de resposta: <250ms"""
     
     def export_summary_report(self, filename='wearable_safety_report.txt'):
         """Exporta relatório resumido do sistema"""
-        if self.df is None:
-            self.load_data()
+        stats = self.compute_statistics()
         
         with open(filename, 'w', encoding='utf-8') as f:
             f.write("RELATÓRIO DO SISTEMA WEARABLE DE SEGURANÇA\n")
@@ -310,22 +694,21 @@ Tempo de resposta: <250ms"""
             f.write(f"Data de Geração: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
             
             # Dados gerais
-            total_time = (self.df['Timestamp(ms)'].max() - self.df['Timestamp(ms)'].min()) / 1000
-            total_falls = self.df['Queda'].sum()
-            sample_rate = len(self.df) / total_time
+            total_falls = stats['falls']
             
             f.write("DADOS GERAIS:\n")
-            f.write(f"- Tempo de monitoramento: {total_time:.1f} segundos\n")
-            f.write(f"- Total de amostras: {len(self.df)}\n")
-            f.write(f"- Taxa de amostragem: {sample_rate:.1f} Hz\n")
+            f.write(f"- Tempo de monitoramento: {stats['total_time_s']:.1f} segundos\n")
+            f.write(f"- Total de amostras: {stats['samples']}\n")
+            f.write(f"- Taxa de amostragem: {stats['sample_rate_hz']:.1f} Hz\n")
             f.write(f"- Quedas detectadas: {total_falls}\n\n")
             
             # Estatísticas da aceleração
             f.write("ANÁLISE DA ACELERAÇÃO:\n")
-            f.write(f"- Magnitude média: {self.df['Magnitude(g)'].mean():.3f}g\n")
-            f.write(f"- Desvio padrão: {self.df['Magnitude(g)'].std():.3f}g\n")
-            f.write(f"- Valor máximo: {self.df['Magnitude(g)'].max():.3f}g\n")
-            f.write(f"- Valor mínimo: {self.df['Magnitude(g)'].min():.3f}g\n\n")
+            magnitude = stats['magnitude']
+            f.write(f"- Magnitude média: {magnitude['mean']:.3f}g\n")
+            f.write(f"- Desvio padrão: {magnitude['std']:.3f}g\n")
+            f.write(f"- Valor máximo: {magnitude['max']:.3f}g\n")
+            f.write(f"- Valor mínimo: {magnitude['min']:.3f}g\n\n")
             
             # Configurações do sistema
             f.write("CONFIGURAÇÕES DO SISTEMA:\n")
@@ -335,10 +718,10 @@ Tempo de resposta: <250ms"""
             
             # Análise de performance
             if total_falls > 0:
-                fall_data = self.df[self.df['Queda'] == 1]
+                fall_magnitude = stats['fall_magnitude']
                 f.write("ANÁLISE DE PERFORMANCE:\n")
-                f.write(f"- Magnitude média nas quedas: {fall_data['Magnitude(g)'].mean():.2f}g\n")
-                f.write(f"- Maior impacto registrado: {fall_data['Magnitude(g)'].max():.2f}g\n")
+                f.write(f"- Magnitude média nas quedas: {fall_magnitude['mean']:.2f}g\n")
+                f.write(f"- Maior impacto registrado: {fall_magnitude['max']:.2f}g\n")
                 f.write(f"- Taxa de detecção: 100%\n")
                 f.write(f"- Falsos positivos estimados: <2%\n\n")
             
@@ -351,11 +734,64 @@ Tempo de resposta: <250ms"""
 
 def main():
     """Função principal para executar análise completa"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Análise de dados - Sistema Wearable')
+    parser.add_argument('--frota', type=int, default=None,
+                       help='Gerar frota simulada com N dispositivos e sair')
+    parser.add_argument('--horas', type=float, default=1.0,
+                       help='Duração da simulação da frota (horas)')
+    parser.add_argument('--quedas-por-hora', type=float, default=0.5,
+                       help='Taxa de quedas por dispositivo por hora')
+    parser.add_argument('--formato', choices=['csv', 'parquet', 'db'], default='csv',
+                       help='Destino dos dados da frota')
+    parser.add_argument('--saida', default='data/frota_simulada.csv',
+                       help='Arquivo de saída da frota (csv/parquet)')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Semente aleatória')
+    parser.add_argument('--arquivo', default=None,
+                       help='CSV ou Parquet a analisar (padrão: dados de exemplo)')
+    parser.add_argument('--db', action='store_true',
+                       help='Analisar leituras armazenadas no banco')
+    parser.add_argument('--dispositivo', default=None,
+                       help='Filtrar por id ou serial do dispositivo')
+    parser.add_argument('--trabalhador', default=None,
+                       help='Filtrar por id ou matrícula do trabalhador')
+    parser.add_argument('--inicio-ms', type=int, default=None,
+                       help='timestamp_ms inicial')
+    parser.add_argument('--fim-ms', type=int, default=None,
+                       help='timestamp_ms final')
+    parser.add_argument('--inicio', default=None,
+                       help='Data/hora inicial de registro (ex.: 2025-10-04)')
+    parser.add_argument('--fim', default=None,
+                       help='Data/hora final de registro (exclusiva)')
+    args = parser.parse_args()
+    
+    if args.frota:
+        WearableSafetyAnalyzer().generate_fleet_data(
+            n_devices=args.frota,
+            duration_hours=args.horas,
+            falls_per_hour=args.quedas_por_hora,
+            output=args.saida,
+            fmt=args.formato,
+            seed=args.seed
+        )
+        return
+    
     print("SISTEMA DE ANÁLISE - WEARABLE DE SEGURANÇA")
     print("=" * 50)
     
     # Inicializar analisador
-    analyzer = WearableSafetyAnalyzer()
+    filters = {
+        'device': args.dispositivo,
+        'worker': args.trabalhador,
+        'start_ms': args.inicio_ms,
+        'end_ms': args.fim_ms,
+    }
+    if args.db:
+        filters.update(start_date=args.inicio, end_date=args.fim)
+    analyzer = WearableSafetyAnalyzer(data_file=args.arquivo, database=args.db,
+                                      filters={k: v for k, v in filters.items() if v is not None})
     
     # Carregar ou gerar dados
     analyzer.load_data()
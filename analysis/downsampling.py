@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+DOWNSAMPLING DE SÉRIES LONGAS - SISTEMA WEARABLE DE SEGURANÇA
+=============================================================
+
+Reduz timelines de aceleração para um orçamento de pontos preservando o
+formato do sinal (mínimo e máximo de cada bucket), sem nunca descartar
+marcadores de queda nem cruzamentos de threshold.
+
+Usado pelos gráficos da análise (matplotlib) e pelo dashboard (Plotly).
+"""
+
+import numpy as np
+
+# Orçamento padrão de pontos por série desenhada
+DEFAULT_MAX_POINTS = 5000
+
+# Acima deste número de pontos brutos o dashboard usa traces WebGL (Scattergl)
+WEBGL_THRESHOLD = 10_000
+
+
+def threshold_crossings(y, thresholds):
+    """Índices das amostras dos dois lados de cada cruzamento de threshold"""
+    y = np.asarray(y, dtype=float)
+    indices = []
+    for threshold in thresholds:
+        above = y > threshold
+        change = np.flatnonzero(above[1:] != above[:-1])
+        indices.extend([change, change + 1])
+    if not indices:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(indices)
+
+
+def downsample_indices(y, max_points=DEFAULT_MAX_POINTS, keep=None, thresholds=()):
+    """
+    Seleciona índices para desenhar uma série com até ~max_points pontos
+
+    Args:
+        y (array): Valores da série (ordenada no tempo)
+        max_points (int): Orçamento de pontos (min/max por bucket)
+        keep (array bool): Máscara de pontos que nunca podem ser descartados
+        thresholds (iterable): Thresholds cujos cruzamentos devem ser mantidos
+
+    Returns:
+        np.ndarray: Índices ordenados dos pontos mantidos
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+
+    # Cada bucket contribui com seu mínimo e seu máximo
+    n_buckets = max(max_points // 2, 1)
+    bucket = (np.arange(n) * n_buckets) // n
+    order = np.lexsort((y, bucket))
+    sorted_buckets = bucket[order]
+    ids = np.arange(n_buckets)
+    first = order[np.searchsorted(sorted_buckets, ids, side='left')]
+    last = order[np.searchsorted(sorted_buckets, ids, side='right') - 1]
+
+    parts = [first, last, [0, n - 1], threshold_crossings(y, thresholds)]
+    if keep is not None:
+        parts.append(np.flatnonzero(np.asarray(keep, dtype=bool)))
+
+    return np.unique(np.concatenate(parts).astype(np.int64))
+
+
+def downsample_frame(df, y_col, max_points=DEFAULT_MAX_POINTS, keep_col=None, thresholds=()):
+    """Aplica downsample_indices a um DataFrame ordenado no tempo"""
+    if len(df) <= max_points:
+        return df
+    keep = df[keep_col].to_numpy() == 1 if keep_col else None
+    idx = downsample_indices(df[y_col].to_numpy(), max_points, keep=keep, thresholds=thresholds)
+    return df.iloc[idx]
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+ESTATÍSTICAS EM STREAMING - SISTEMA WEARABLE DE SEGURANÇA
+=========================================================
+
+Motor de estatísticas de passada única sobre blocos (chunks) de leituras no
+formato do firmware. Permite calcular todas as métricas do relatório sem
+carregar o arquivo inteiro em memória.
+
+- Média/variância: Welford, combinando blocos pelo método de Chan
+- Mínimo/máximo exatos
+- Mediana: sketch de histograma de largura fixa (erro <= largura/2)
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class RunningStats:
+    """Média, desvio padrão, mínimo e máximo acumulados bloco a bloco"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """Incorpora um bloco de valores (Welford/Chan)"""
+        arr = np.asarray(values, dtype=float)
+        arr = arr[~np.isnan(arr)]
+        n = len(arr)
+        if n == 0:
+            return
+
+        mean_b = arr.mean()
+        m2_b = ((arr - mean_b) ** 2).sum()
+        total = self.count + n
+        delta = mean_b - self.mean
+
+        self.mean += delta * n / total
+        self.m2 += m2_b + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, arr.min())
+        self.max = max(self.max, arr.max())
+
+    @property
+    def std(self):
+        """Desvio padrão amostral (ddof=1, igual ao pandas)"""
+        if self.count < 2:
+            return float('nan')
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def as_dict(self):
+        if self.count == 0:
+            return {'count': 0, 'mean': float('nan'), 'std': float('nan'),
+                    'min': float('nan'), 'max': float('nan')}
+        return {'count': self.count, 'mean': self.mean, 'std': self.std,
+                'min': float(self.min), 'max': float(self.max)}
+
+
+class HistogramSketch:
+    """Sketch de quantis com histograma de largura fixa"""
+
+    def __init__(self, low=0.0, high=32.0, bin_width=0.001):
+        self.low = low
+        self.bin_width = bin_width
+        self.n_bins = int(math.ceil((high - low) / bin_width))
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+
+    def update(self, values):
+        arr = np.asarray(values, dtype=float)
+        arr = arr[~np.isnan(arr)]
+        if len(arr) == 0:
+            return
+        bins = np.clip(((arr - self.low) / self.bin_width).astype(np.int64), 0, self.n_bins - 1)
+        self.counts += np.bincount(bins, minlength=self.n_bins)
+
+    def quantile(self, q):
+        total = self.counts.sum()
+        if total == 0:
+            return float('nan')
+        cumulative = np.cumsum(self.counts)
+        idx = int(np.searchsorted(cumulative, q * total, side='left'))
+        return self.low + (idx + 0.5) * self.bin_width
+
+
+class StreamingStatistics:
+    """Estatísticas do sistema wearable calculadas em uma única passada"""
+
+    AXES = ('Ax(g)', 'Ay(g)', 'Az(g)')
+
+    def __init__(self):
+        self.samples = 0
+        self.falls = 0
+        self.t_min = math.inf
+        self.t_max = -math.inf
+        self.magnitude = RunningStats()
+        self.magnitude_sketch = HistogramSketch()
+        self.fall_magnitude = RunningStats()
+        self.axes = {axis: RunningStats() for axis in self.AXES}
+
+    def update(self, chunk):
+        """Incorpora um bloco (DataFrame no formato do firmware)"""
+        if len(chunk) == 0:
+            return
+
+        timestamps = chunk['Timestamp(ms)'].to_numpy()
+        magnitudes = chunk['Magnitude(g)'].to_numpy(dtype=float)
+        falls = chunk['Queda'].to_numpy() == 1
+
+        self.samples += len(chunk)
+        self.falls += int(falls.sum())
+        self.t_min = min(self.t_min, timestamps.min())
+        self.t_max = max(self.t_max, timestamps.max())
+
+        self.magnitude.update(magnitudes)
+        self.magnitude_sketch.update(magnitudes)
+        self.fall_magnitude.update(magnitudes[falls])
+
+        for axis in self.AXES:
+            if axis in chunk:
+                self.axes[axis].update(chunk[axis].to_numpy(dtype=float))
+
+    def result(self):
+        """Retorna todas as métricas em um dicionário"""
+        total_time = (self.t_max - self.t_min) / 1000 if self.samples else 0.0
+        magnitude = self.magnitude.as_dict()
+        magnitude['median'] = self.magnitude_sketch.quantile(0.5)
+
+        return {
+            'total_time_s': float(total_time),
+            'samples': self.samples,
+            'sample_rate_hz': self.samples / total_time if total_time > 0 else float('nan'),
+            'falls': self.falls,
+            'magnitude': magnitude,
+            'axes': {axis: stats.as_dict() for axis, stats in self.axes.items()},
+            'fall_magnitude': self.fall_magnitude.as_dict()
+        }
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        engine = cls()
+        for chunk in chunks:
+            engine.update(chunk)
+        return engine
+
+    @classmethod
+    def from_frame(cls, df, chunksize=500_000):
+        return cls.from_chunks(df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+
+    @classmethod
+    def from_csv(cls, path, chunksize=500_000):
+        columns = ['Timestamp(ms)', 'Magnitude(g)', 'Queda', *cls.AXES]
+        return cls.from_chunks(pd.read_csv(path, usecols=columns, chunksize=chunksize))
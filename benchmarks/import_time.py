@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK DE TEMPO DE IMPORTAÇÃO (STARTUP)
+
+Mede, com `python -X importtime`, quanto custa importar cada ponto de
+entrada do projeto e confere dois limites:
+
+- orçamento de tempo (ms) da importação completa do ponto de entrada
+- módulos proibidos: pilhas pesadas (matplotlib, seaborn, scikit-learn,
+  streamlit) que só podem ser carregadas pelo passo que as usa
+
+Cada medição roda em um processo novo; o valor reportado é a mediana das
+repetições (a primeira costuma ser mais lenta por cache de disco frio).
+
+Executar: python benchmarks/import_time.py [--repeticoes 5] [--top 10] [--json saida.json]
+Sai com código 1 se algum orçamento for estourado ou módulo proibido carregado.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+PESADOS = ['matplotlib', 'seaborn', 'sklearn', 'streamlit']
+
+# Ponto de entrada -> (código executado, orçamento em ms, módulos proibidos)
+# Os orçamentos de ml/analysis são dominados pela importação do pandas (~0,4 s).
+PONTOS_ENTRADA = {
+    'pipeline': ('import pipeline', 150, PESADOS + ['pandas']),
+    'pipeline.verificar_dependencias()': (
+        'import pipeline; pipeline.PipelineIntegrado().verificar_dependencias()', 200, PESADOS + ['pandas']
+    ),
+    'ml.train_model': ('import ml.train_model', 900, PESADOS),
+    'analysis.data_analysis': ('import analysis.data_analysis', 900, PESADOS),
+    'db.rollups': ('import db.rollups', 900, PESADOS),
+}
+
+LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def medir(codigo):
+    """
+    Executa o código em um processo novo com -X importtime
+
+    Returns:
+        tuple: (total_ms, [(modulo, proprio_us, cumulativo_us, nivel)])
+    """
+    ambiente = dict(os.environ, PYTHONPATH=str(RAIZ))
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=RAIZ, env=ambiente, capture_output=True, text=True
+    )
+    if processo.returncode != 0:
+        erro = processo.stderr.strip().splitlines()
+        raise RuntimeError(erro[-1] if erro else f"código de saída {processo.returncode}")
+
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        casamento = LINHA_IMPORTTIME.match(linha)
+        if casamento:
+            proprio, cumulativo, recuo, modulo = casamento.groups()
+            modulos.append((modulo, int(proprio), int(cumulativo), (len(recuo) - 1) // 2))
+
+    # Total = soma dos imports de nível 0 (os disparados diretamente pelo código)
+    total_us = sum(cumulativo for _, _, cumulativo, nivel in modulos if nivel == 0)
+    return total_us / 1000, modulos
+
+
+def por_pacote(modulos, top):
+    """Tempo próprio somado por pacote de primeiro nível (ms), maiores primeiro"""
+    totais = {}
+    for modulo, proprio, _, _ in modulos:
+        pacote = modulo.split('.')[0]
+        totais[pacote] = totais.get(pacote, 0) + proprio
+    maiores = sorted(totais.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(pacote, round(us / 1000, 1)) for pacote, us in maiores]
+
+
+def executar(repeticoes=5, top=10):
+    """Mede todos os pontos de entrada e retorna o resultado por ponto"""
+    resultados = {}
+
+    for nome, (codigo, orcamento_ms, proibidos) in PONTOS_ENTRADA.items():
+        try:
+            medicoes = [medir(codigo) for _ in range(repeticoes)]
+        except RuntimeError as e:
+            resultados[nome] = {'erro': str(e), 'ok': False}
+            continue
+
+        tempos = [total for total, _ in medicoes]
+        _, modulos = medicoes[-1]
+        carregados = {modulo.split('.')[0] for modulo, _, _, _ in modulos}
+        indevidos = sorted(carregados & set(proibidos))
+        mediana = statistics.median(tempos)
+
+        resultados[nome] = {
+            'mediana_ms': round(mediana, 1),
+            'minimo_ms': round(min(tempos), 1),
+            'orcamento_ms': orcamento_ms,
+            'modulos': len(modulos),
+            'proibidos_carregados': indevidos,
+            'maiores_pacotes_ms': por_pacote(modulos, top),
+            'ok': mediana <= orcamento_ms and not indevidos
+        }
+
+    return resultados
+
+
+def imprimir(resultados):
+    print("="*70)
+    print("⏱️ TEMPO DE IMPORTAÇÃO DOS PONTOS DE ENTRADA")
+    print("="*70)
+
+    for nome, resultado in resultados.items():
+        if 'erro' in resultado:
+            print(f"\n❌ {nome}: falhou ao importar ({resultado['erro']})")
+            continue
+
+        icone = '✅' if resultado['ok'] else '❌'
+        print(f"\n{icone} {nome}: {resultado['mediana_ms']:.1f} ms "
+              f"(mín. {resultado['minimo_ms']:.1f} ms, orçamento {resultado['orcamento_ms']} ms, "
+              f"{resultado['modulos']} módulos)")
+        if resultado['proibidos_carregados']:
+            print(f"   ⚠️ Módulos pesados carregados: {', '.join(resultado['proibidos_carregados'])}")
+        for pacote, ms in resultado['maiores_pacotes_ms']:
+            print(f"   {ms:8.1f} ms  {pacote}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de tempo de importação')
+    parser.add_argument('--repeticoes', type=int, default=5,
+                        help='Processos medidos por ponto de entrada (mediana)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Pacotes mais caros listados por ponto de entrada')
+    parser.add_argument('--json', default=None,
+                        help='Salvar o resultado neste arquivo JSON')
+    args = parser.parse_args()
+
+    resultados = executar(args.repeticoes, args.top)
+    imprimir(resultados)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em: {args.json}")
+
+    estourados = [nome for nome, resultado in resultados.items() if not resultado['ok']]
+    if estourados:
+        print(f"\n❌ Fora do orçamento: {', '.join(estourados)}")
+        sys.exit(1)
+    print("\n✅ Todos os pontos de entrada dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
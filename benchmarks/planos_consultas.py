@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+REGRESSÃO DE PLANOS DAS CONSULTAS QUENTES
+
+Executa as consultas quentes do projeto (dashboard, despachante, relatório
+do pipeline, views, linha do tempo, rollups) contra um banco semeado, grava
+o SQL que cada uma realmente emite e confere o EXPLAIN de cada SELECT:
+
+- falha se alguma tabela for lida por varredura completa (SQLite: "SCAN x"
+  sem índice; MySQL: type = ALL), fora das exceções declaradas
+- avisa (sem falhar) quando o banco precisa ordenar em tabela temporária
+
+Por padrão usa um SQLite temporário (conectar_banco_sqlite, com os índices
+parciais) semeado com uma frota sintética, eventos e alertas, e ANALYZE
+para o planejador enxergar a distribuição real (poucos alertas pendentes,
+muitas leituras). Frotas bem menores que o padrão deixam as tabelas tão
+pequenas que o planejador prefere varrê-las, e o resultado deixa de
+representar produção. Com --mysql, confere os planos no banco MySQL configurado
+(já populado), sem semear.
+
+Executar: python benchmarks/planos_consultas.py [--dispositivos 20] [--minutos 5] [--json saida.json]
+Sai com código 1 se alguma consulta regredir para varredura completa.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from alertas.despachante import CONSULTA_PENDENTES
+from analysis.data_analysis import WearableSafetyAnalyzer
+from dashboard.consultas import (
+    buscar_leituras_novas, buscar_eventos_novos, buscar_alertas_novos, kpis_periodo, distribuicao_status,
+    contar_eventos, buscar_pagina_eventos, quedas_por_gravidade, resumo_tempo_resposta, resumo_frota,
+    atividade_trabalhador, eventos_trabalhador, leituras_trabalhador
+)
+from db.incidentes import AgrupadorIncidentes
+from db.linha_do_tempo import linha_do_tempo_banco
+from db.load_data import (
+    conectar_banco_mysql, conectar_banco_sqlite, garantir_frota, inserir_leituras_lote, registrar_incidentes
+)
+from db.rollups import atualizar_rollups
+from pipeline import CONSULTA_RELATORIO_ALERTAS, CONSULTA_TOTAL_ALERTAS
+
+# dashboard/app.py importa o Streamlit: a série de magnitude é repetida aqui
+CONSULTA_SERIE_MAGNITUDE = """
+    SELECT timestamp_ms, magnitude, queda_detectada
+    FROM leituras_sensores
+    ORDER BY timestamp_ms DESC
+    LIMIT %s
+"""
+
+VARREDURA_SQLITE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
+SUBCONSULTA_SQLITE = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)')
+
+
+class _CursorRegistrador:
+    def __init__(self, cursor, consultas):
+        self._cursor = cursor
+        self._consultas = consultas
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self._consultas.append((sql, list(params or [])))
+        return self._cursor.execute(sql, params)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoRegistradora:
+    """Repassa tudo à conexão real e guarda cada SELECT executado (SQL, parâmetros)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.consultas = []
+
+    def cursor(self, *args, **kwargs):
+        return _CursorRegistrador(self._conn.cursor(*args, **kwargs), self.consultas)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+
+def consultas_quentes(conn):
+    """
+    Consulta quente -> (função que a executa, tabelas/aliases que podem ser varridos)
+
+    As varreduras permitidas são leituras inteiras por definição:
+    - kpis_periodo: o rollup por minuto é pequeno e a janela semeada cobre
+      todo ele (com meses de histórico a busca usa a chave (minuto, status))
+    - relatório completo de alertas: todo alerta gravado é 'critica' ou
+      'alta' (registrar_incidentes); o incremental é o que roda a cada ciclo
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(data_registro) FROM leituras_sensores")
+    agora = pd.to_datetime(cursor.fetchone()[0]).to_pydatetime()
+    dia = (agora - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    hora = (agora - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("SELECT timestamp_queda, id_evento FROM eventos_queda ORDER BY id_evento LIMIT 1")
+    evento = cursor.fetchone() or (0, 0)
+
+    def consulta(sql, params=()):
+        return lambda c: pd.read_sql_query(sql, c, params=list(params))
+
+    return {
+        'dashboard.serie_magnitude': (consulta(CONSULTA_SERIE_MAGNITUDE, [1000]), []),
+        'dashboard.leituras_novas': (lambda c: buscar_leituras_novas(c, 0), []),
+        'dashboard.eventos_novos': (lambda c: buscar_eventos_novos(c, 0), []),
+        'dashboard.alertas_novos': (lambda c: buscar_alertas_novos(c, 0), []),
+        'dashboard.kpis_periodo': (lambda c: kpis_periodo(c, dia, hora), ['rollup_leituras_minuto']),
+        'dashboard.distribuicao_status': (lambda c: distribuicao_status(c, dia), []),
+        'dashboard.contar_eventos': (lambda c: contar_eventos(c, 'grave', 'pendente'), []),
+        'dashboard.pagina_eventos': (lambda c: buscar_pagina_eventos(c), []),
+        'dashboard.pagina_eventos_keyset': (
+            lambda c: buscar_pagina_eventos(c, gravidade='grave', cursor=(int(evento[0]), int(evento[1]))), []),
+        'dashboard.quedas_por_gravidade': (lambda c: quedas_por_gravidade(c, status='pendente'), []),
+        'dashboard.resumo_tempo_resposta': (lambda c: resumo_tempo_resposta(c), []),
+        'dashboard.resumo_frota': (lambda c: resumo_frota(c, dia), []),
+        'dashboard.atividade_trabalhador': (lambda c: atividade_trabalhador(c, 1, dia), []),
+        'dashboard.eventos_trabalhador': (lambda c: eventos_trabalhador(c, 1), []),
+        'dashboard.leituras_trabalhador': (lambda c: leituras_trabalhador(c, 1), []),
+        'despachante.pendentes': (consulta(CONSULTA_PENDENTES, [-1, -1, 0, 1000]), []),
+        'pipeline.total_alertas': (consulta(CONSULTA_TOTAL_ALERTAS), []),
+        'pipeline.relatorio_alertas': (
+            consulta(CONSULTA_RELATORIO_ALERTAS.format(filtro='', ordem='a.data_alerta DESC')), ['a', 'alertas']),
+        'pipeline.relatorio_alertas_incremental': (
+            consulta(CONSULTA_RELATORIO_ALERTAS.format(filtro='AND a.id_alerta > %s', ordem='a.id_alerta'), [0]), []),
+        'views.vw_leituras_criticas': (consulta("SELECT * FROM vw_leituras_criticas LIMIT 100"), []),
+        'views.vw_alertas_pendentes': (consulta("SELECT * FROM vw_alertas_pendentes"), []),
+        'linha_do_tempo.frota': (lambda c: list(islice(linha_do_tempo_banco(c, [1, 2, 3]), 100)), []),
+        'rollups.atualizar': (lambda c: atualizar_rollups(c), []),
+    }
+
+
+# ====== PLANOS ======
+
+def plano_sqlite(conn, sql, params):
+    """Linhas do EXPLAIN QUERY PLAN -> (detalhes, varreduras completas, ordenações temporárias)"""
+    cursor = conn.cursor()
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    detalhes = [row[3] for row in cursor.fetchall()]
+
+    subconsultas = {m.group(1) for m in map(SUBCONSULTA_SQLITE.match, detalhes) if m}
+    varreduras = []
+    for detalhe in detalhes:
+        casamento = VARREDURA_SQLITE.match(detalhe)
+        if casamento:
+            nome = casamento.group(2) or casamento.group(1)
+            if nome not in subconsultas and casamento.group(1) not in subconsultas:
+                varreduras.append(nome)
+    temporarias = [d for d in detalhes if d.startswith('USE TEMP B-TREE')]
+    return detalhes, varreduras, temporarias
+
+
+def plano_mysql(conn, sql, params):
+    """Linhas do EXPLAIN (MySQL) -> (detalhes, varreduras completas, ordenações temporárias)"""
+    cursor = conn.cursor()
+    cursor.execute("EXPLAIN " + sql, params)
+    colunas = [c[0] for c in cursor.description]
+    linhas = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+    detalhes = [f"{l['table']}: {l['type']} {l['key'] or ''} {l['Extra'] or ''}".strip() for l in linhas]
+    varreduras = [l['table'] for l in linhas
+                  if l['type'] == 'ALL' and l['table'] and not str(l['table']).startswith('<')]
+    temporarias = [d for d in detalhes if 'filesort' in d or 'temporary' in d]
+    return detalhes, varreduras, temporarias
+
+
+def conferir(conn, planejar):
+    """Executa cada consulta quente e confere o plano de cada SELECT emitido"""
+    resultados = {}
+    for nome, (executar, permitidas) in consultas_quentes(conn).items():
+        registradora = ConexaoRegistradora(conn)
+        with contextlib.redirect_stdout(io.StringIO()):
+            executar(registradora)
+
+        planos = []
+        for sql, params in registradora.consultas:
+            detalhes, varreduras, temporarias = planejar(conn, sql, params)
+            planos.append({
+                'sql': ' '.join(sql.split()),
+                'plano': detalhes,
+                'varreduras': [v for v in varreduras if v not in permitidas],
+                'ordenacoes_temporarias': temporarias
+            })
+        conn.rollback()  # rollups escrevem; o banco semeado fica como estava
+
+        resultados[nome] = {
+            'consultas': planos,
+            'ok': bool(planos) and not any(p['varreduras'] for p in planos)
+        }
+    return resultados
+
+
+# ====== BANCO SEMEADO ======
+
+def semear(conn, dispositivos=20, minutos=5.0, quedas_por_hora=30.0, semente=42):
+    """
+    Frota sintética com incidentes e alertas em proporções de produção:
+    a maioria dos alertas já enviada e dos eventos finalizada
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        frota = WearableSafetyAnalyzer().generate_fleet_data(
+            n_devices=dispositivos, duration_hours=minutos / 60, falls_per_hour=quedas_por_hora, seed=semente)
+        garantir_frota(conn, dispositivos)
+        proximo_id = inserir_leituras_lote(conn, frota)
+
+    agrupador = AgrupadorIncidentes()
+    incidentes = []
+    for id_leitura, dispositivo, trabalhador, timestamp_ms, magnitude, queda in zip(
+            range(proximo_id - len(frota), proximo_id), frota['Dispositivo'], frota['Trabalhador'],
+            frota['Timestamp(ms)'], frota['Magnitude(g)'], frota['Queda']):
+        if queda:
+            incidentes += agrupador.adicionar(int(dispositivo), int(trabalhador), int(timestamp_ms),
+                                              float(magnitude), id_leitura)
+        else:
+            incidentes += agrupador.avancar(int(dispositivo), int(timestamp_ms))
+    incidentes += agrupador.finalizar()
+
+    cursor = conn.cursor()
+    registrar_incidentes(cursor, incidentes, id_evento=1)
+    cursor.execute("UPDATE alertas SET enviado = TRUE WHERE id_alerta % 10 <> 0")
+    cursor.execute("UPDATE eventos_queda SET status_atendimento = 'finalizado' WHERE id_evento % 10 <> 0")
+    conn.commit()
+    cursor.execute("ANALYZE")
+    conn.commit()
+    return {'leituras': len(frota), 'eventos': len(incidentes)}
+
+
+def imprimir(resultados):
+    print("="*70)
+    print("🔎 PLANOS DAS CONSULTAS QUENTES")
+    print("="*70)
+    for nome, resultado in resultados.items():
+        icone = '✅' if resultado['ok'] else '❌'
+        print(f"\n{icone} {nome} ({len(resultado['consultas'])} SELECTs)")
+        for plano in resultado['consultas']:
+            for detalhe in plano['plano']:
+                print(f"   {detalhe}")
+            if plano['varreduras']:
+                print(f"   ⚠️ Varredura completa: {', '.join(plano['varreduras'])}")
+                print(f"      {plano['sql'][:150]}")
+            for ordenacao in plano['ordenacoes_temporarias']:
+                print(f"   ℹ️ Ordenação temporária: {ordenacao}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regressão de planos das consultas quentes')
+    parser.add_argument('--dispositivos', type=int, default=20, help='Dispositivos da frota semeada')
+    parser.add_argument('--minutos', type=float, default=5.0, help='Duração simulada por dispositivo')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--mysql', action='store_true',
+                        help='Conferir no MySQL configurado (já populado) em vez do SQLite semeado')
+    parser.add_argument('--json', default=None, help='Salvar os planos neste arquivo JSON')
+    args = parser.parse_args()
+
+    if args.mysql:
+        conn = conectar_banco_mysql()
+        try:
+            resultados = conferir(conn, plano_mysql)
+        finally:
+            conn.close()
+    else:
+        with tempfile.TemporaryDirectory(prefix='sentinela_planos_') as pasta:
+            conn = conectar_banco_sqlite(os.path.join(pasta, 'planos.db'))
+            try:
+                semeado = semear(conn, args.dispositivos, args.minutos, semente=args.semente)
+                print(f"🌱 Banco semeado: {semeado['leituras']:,} leituras, {semeado['eventos']:,} eventos")
+                resultados = conferir(conn, plano_sqlite)
+            finally:
+                conn.close()
+
+    imprimir(resultados)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'gerado_em': datetime.now().isoformat(timespec='seconds'), 'consultas': resultados},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em: {args.json}")
+
+    regrediram = [nome for nome, resultado in resultados.items() if not resultado['ok']]
+    if regrediram:
+        print(f"\n❌ Varredura completa em: {', '.join(regrediram)}")
+        sys.exit(1)
+    print("\n✅ Nenhuma consulta quente com varredura completa")
+
+
+if __name__ == "__main__":
+    main()
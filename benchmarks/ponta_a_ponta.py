@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK PONTA A PONTA COM FROTA SINTÉTICA
+
+Responde "quantos dispositivos a 20 Hz o sistema aguenta?" medindo, em um
+banco SQLite local (db.load_data.conectar_banco_sqlite, sem MySQL e sem
+rede):
+
+- ingestão: carregar_dados_csv (CSV de um dispositivo + incidentes) e
+  inserir_leituras_lote (lote, com rollups) da frota N dispositivos x duração
+- consultas: consultas_analise e as consultas do dashboard
+  (carregar_dados_db = atualizar_estado, KPIs, histórico, frota)
+- ML: treino (FallDetectionML) e pontuação em lote (criar_features_lote +
+  pontuar_lote), mais a latência de uma leitura
+
+Tudo roda em uma pasta temporária (banco e modelos), sem tocar em ml/ nem
+em sentinela.db. O resultado é um JSON estável (chaves ordenadas, mesma
+estrutura a cada versão) que pode ser comparado com uma execução anterior.
+
+Executar:
+    python benchmarks/ponta_a_ponta.py --dispositivos 20 --minutos 5 --saida logs/benchmark.json
+    python benchmarks/ponta_a_ponta.py --baseline logs/benchmark.json   # sai com 1 se regredir
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from analysis.data_analysis import WearableSafetyAnalyzer
+from db.load_data import (
+    conectar_banco_sqlite, carregar_dados_csv, consultas_analise, garantir_frota, inserir_leituras_lote
+)
+from db.rollups import atualizar_rollups
+from dashboard.consultas import (
+    novo_estado, atualizar_estado, kpis_periodo, distribuicao_status, contar_eventos,
+    buscar_pagina_eventos, quedas_por_gravidade, resumo_tempo_resposta, resumo_frota
+)
+from ml.train_model import FallDetectionML, criar_features_lote, pontuar_lote
+
+VERSAO_FORMATO = 2  # 2: etapas puladas em 'pulados'
+
+# Métricas comparadas com a baseline: chave -> maior é melhor?
+# (p95 fica só no relatório: com poucas repetições é ruidoso demais para reprovar)
+SENTIDO_METRICAS = {'linhas_por_s': True, 'p50_ms': False}
+
+
+@contextlib.contextmanager
+def silencioso():
+    """Descarta os prints das funções medidas"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def vazao(linhas, segundos):
+    return {'linhas': int(linhas), 'segundos': round(segundos, 4),
+            'linhas_por_s': round(linhas / segundos, 1) if segundos > 0 else None}
+
+
+def latencias(funcao, repeticoes):
+    """Executa `funcao` repetidas vezes e resume as latências (ms)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'repeticoes': repeticoes,
+        'min_ms': round(tempos[0], 3),
+        'p50_ms': round(statistics.median(tempos), 3),
+        'p95_ms': round(tempos[min(len(tempos) - 1, int(0.95 * len(tempos)))], 3)
+    }
+
+
+def gerar_frota(dispositivos, minutos, taxa_hz, quedas_por_hora, semente):
+    """Frota sintética no formato do firmware (colunas Dispositivo/Trabalhador/Status)"""
+    with silencioso():
+        analisador = WearableSafetyAnalyzer()
+        return analisador.generate_fleet_data(n_devices=dispositivos, duration_hours=minutos / 60,
+                                              falls_per_hour=quedas_por_hora, sample_rate=taxa_hz,
+                                              seed=semente)
+
+
+def medir_ingestao(conectar, frota, linhas_csv):
+    resultados = {}
+    conn = conectar()
+    try:
+        # Caminho CSV de um dispositivo, com agrupamento de incidentes (chave mantida
+        # como 'csv_linha_a_linha' para comparar com execuções anteriores)
+        primeiro = frota[frota['Dispositivo'] == 1].head(linhas_csv)
+        csv_path = 'dispositivo_1.csv'
+        primeiro.drop(columns=['Dispositivo', 'Trabalhador']).to_csv(csv_path, index=False)
+        inicio = time.perf_counter()
+        with silencioso():
+            inseridas = carregar_dados_csv(conn, csv_path)
+        resultados['ingestao.csv_linha_a_linha'] = vazao(inseridas, time.perf_counter() - inicio)
+
+        # Caminho em lote (executemany + rollups incrementais)
+        garantir_frota(conn, int(frota['Dispositivo'].max()))
+        inicio = time.perf_counter()
+        inserir_leituras_lote(conn, frota)
+        resultados['ingestao.lote'] = vazao(len(frota), time.perf_counter() - inicio)
+
+        resultados['ingestao.rollups_sem_novidades'] = latencias(lambda: atualizar_rollups(conn), 5)
+    finally:
+        conn.close()
+    return resultados
+
+
+def medir_consultas(conectar, repeticoes):
+    conn = conectar()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(data_registro) FROM leituras_sensores")
+        agora = pd.to_datetime(cursor.fetchone()[0]).to_pydatetime()
+        dia = (agora - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+        hora = (agora - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+
+        def dados_db_frio():
+            atualizar_estado(conn, novo_estado())
+
+        estado = atualizar_estado(conn, novo_estado())
+
+        consultas = {
+            'consultas.consultas_analise': lambda: consultas_analise(conn),
+            'consultas.dashboard.carregar_dados_db_frio': dados_db_frio,
+            'consultas.dashboard.carregar_dados_db_incremental': lambda: atualizar_estado(conn, estado),
+            'consultas.dashboard.kpis_periodo': lambda: kpis_periodo(conn, dia, hora),
+            'consultas.dashboard.distribuicao_status': lambda: distribuicao_status(conn, dia),
+            'consultas.dashboard.contar_eventos': lambda: contar_eventos(conn),
+            'consultas.dashboard.pagina_eventos': lambda: buscar_pagina_eventos(conn),
+            'consultas.dashboard.quedas_por_gravidade': lambda: quedas_por_gravidade(conn),
+            'consultas.dashboard.resumo_tempo_resposta': lambda: resumo_tempo_resposta(conn),
+            'consultas.dashboard.resumo_frota': lambda: resumo_frota(conn, dia),
+        }
+        resultados = {}
+        for nome, funcao in consultas.items():
+            with silencioso():
+                resultados[nome] = latencias(funcao, repeticoes)
+    finally:
+        conn.close()
+    return resultados
+
+
+def medir_ml(conectar, repeticoes):
+    """Returns: (resultados, motivo) - motivo preenchido quando a etapa é pulada"""
+    resultados = {}
+    Path('ml').mkdir(exist_ok=True)
+
+    # Frota pequena pode não ter quedas: o classificador precisa das duas classes
+    conn = conectar()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(DISTINCT queda_detectada) FROM leituras_sensores")
+        classes = int(cursor.fetchone()[0])
+    finally:
+        conn.close()
+    if classes < 2:
+        return resultados, (f"treino requer leituras com e sem queda "
+                            f"({classes} classe(s) na frota gerada)")
+
+    ml = FallDetectionML(conectar=conectar)
+    inicio = time.perf_counter()
+    with silencioso():
+        ml.treinar_modelo()
+    linhas_treino = sum(len(parte) for parte in ml.dados_divididos[:2])
+    resultados['ml.treino'] = vazao(linhas_treino, time.perf_counter() - inicio)
+
+    conn = conectar()
+    try:
+        df = pd.read_sql_query("""
+            SELECT id_dispositivo, aceleracao_x, aceleracao_y, aceleracao_z, magnitude
+            FROM leituras_sensores
+            ORDER BY id_dispositivo, id_leitura
+        """, conn)
+    finally:
+        conn.close()
+
+    inicio = time.perf_counter()
+    lote = criar_features_lote(df, coluna_grupo='id_dispositivo')
+    pontuar_lote(ml.model, ml.scaler, lote)
+    resultados['ml.pontuacao_lote'] = vazao(len(df), time.perf_counter() - inicio)
+
+    uma = lote.head(1)
+    resultados['ml.latencia_uma_leitura'] = latencias(lambda: pontuar_lote(ml.model, ml.scaler, uma), repeticoes)
+    return resultados, None
+
+
+def ambiente():
+    import sqlite3
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'scikit_learn': sklearn.__version__,
+        'sqlite': sqlite3.sqlite_version
+    }
+
+
+def executar(dispositivos=20, minutos=5.0, taxa_hz=20, quedas_por_hora=6.0, linhas_csv=5000,
+             repeticoes=20, semente=42):
+    """Executa a suíte em uma pasta temporária e retorna o resultado (dict)"""
+    configuracao = {'dispositivos': dispositivos, 'minutos': minutos, 'taxa_hz': taxa_hz,
+                    'quedas_por_hora': quedas_por_hora, 'linhas_csv': linhas_csv,
+                    'repeticoes': repeticoes, 'semente': semente}
+    resultados = {}
+    pulados = {}
+    diretorio_original = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix='sentinela_bench_') as pasta:
+        os.chdir(pasta)
+        try:
+            caminho_banco = os.path.join(pasta, 'bench.db')
+            conectar = lambda: conectar_banco_sqlite(caminho_banco)
+            conectar().close()  # cria o schema
+
+            print(f"🏭 Gerando frota: {dispositivos} dispositivos x {minutos:g} min @ {taxa_hz} Hz...")
+            frota = gerar_frota(dispositivos, minutos, taxa_hz, quedas_por_hora, semente)
+
+            print(f"📥 Ingestão ({len(frota):,} leituras)...")
+            resultados.update(medir_ingestao(conectar, frota, linhas_csv))
+            print("🔎 Consultas...")
+            resultados.update(medir_consultas(conectar, repeticoes))
+            print("🤖 Treino e pontuação...")
+            resultados_ml, motivo = medir_ml(conectar, repeticoes)
+            resultados.update(resultados_ml)
+            if motivo:
+                pulados['ml'] = motivo
+                print(f"   ⚠️ ML pulado: {motivo}")
+        finally:
+            os.chdir(diretorio_original)
+
+    # Capacidade: dispositivos à taxa configurada sustentados por ingestão em lote e pontuação
+    taxas = {etapa: resultados[etapa]['linhas_por_s'] / taxa_hz
+             for etapa in ('ingestao.lote', 'ml.pontuacao_lote') if etapa in resultados}
+    gargalo = min(taxas, key=taxas.get)
+    capacidade = {
+        'dispositivos_por_etapa': {etapa: int(valor) for etapa, valor in taxas.items()},
+        'dispositivos_sustentados': int(taxas[gargalo]),
+        'gargalo': gargalo,
+        'taxa_hz': taxa_hz
+    }
+
+    return {
+        'versao_formato': VERSAO_FORMATO,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'configuracao': configuracao,
+        'ambiente': ambiente(),
+        'resultados': resultados,
+        'pulados': pulados,
+        'capacidade': capacidade
+    }
+
+
+def comparar(atual, baseline, tolerancia):
+    """
+    Compara as métricas de vazão e latência com a baseline
+
+    Returns:
+        list: (métrica, valor atual, baseline, variação relativa, regrediu)
+    """
+    comparacoes = []
+    for nome, metricas in sorted(atual['resultados'].items()):
+        anteriores = baseline.get('resultados', {}).get(nome, {})
+        for chave, maior_melhor in SENTIDO_METRICAS.items():
+            if metricas.get(chave) is None or not anteriores.get(chave):
+                continue
+            variacao = metricas[chave] / anteriores[chave] - 1
+            regrediu = variacao < -tolerancia if maior_melhor else variacao > tolerancia
+            comparacoes.append((f"{nome}.{chave}", metricas[chave], anteriores[chave], variacao, regrediu))
+    return comparacoes
+
+
+def imprimir(resultado, comparacoes=None):
+    print("\n" + "="*70)
+    print("📊 BENCHMARK PONTA A PONTA")
+    print("="*70)
+    for nome, metricas in sorted(resultado['resultados'].items()):
+        if 'linhas_por_s' in metricas:
+            print(f"   {nome:<50} {metricas['linhas_por_s']:>14,.0f} linhas/s")
+        else:
+            print(f"   {nome:<50} p50 {metricas['p50_ms']:>9.2f} ms | p95 {metricas['p95_ms']:>9.2f} ms")
+
+    for etapa, motivo in sorted(resultado.get('pulados', {}).items()):
+        print(f"   ⚠️ {etapa} pulado: {motivo}")
+
+    capacidade = resultado['capacidade']
+    print(f"\n🎯 Capacidade: ~{capacidade['dispositivos_sustentados']:,} dispositivos a "
+          f"{capacidade['taxa_hz']} Hz (gargalo: {capacidade['gargalo']})")
+
+    if comparacoes:
+        print("\n📈 Comparação com a baseline:")
+        for metrica, valor, anterior, variacao, regrediu in comparacoes:
+            icone = '❌' if regrediu else '✓'
+            print(f"   {icone} {metrica:<60} {anterior:>12,.2f} -> {valor:>12,.2f} ({variacao:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ponta a ponta com frota sintética')
+    parser.add_argument('--dispositivos', type=int, default=20, help='Dispositivos simulados')
+    parser.add_argument('--minutos', type=float, default=5.0, help='Duração simulada por dispositivo')
+    parser.add_argument('--taxa', type=int, default=20, help='Taxa de amostragem (Hz)')
+    parser.add_argument('--quedas-por-hora', type=float, default=6.0,
+                        help='Quedas por dispositivo por hora')
+    parser.add_argument('--linhas-csv', type=int, default=5000,
+                        help='Leituras do caminho CSV (carregar_dados_csv)')
+    parser.add_argument('--repeticoes', type=int, default=20, help='Repetições por consulta')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default=None, help='Salvar o resultado neste arquivo JSON')
+    parser.add_argument('--baseline', default=None, help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='Piora relativa aceita antes de acusar regressão (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    resultado = executar(args.dispositivos, args.minutos, args.taxa, args.quedas_por_hora,
+                         args.linhas_csv, args.repeticoes, args.semente)
+
+    comparacoes = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('configuracao') != resultado['configuracao']:
+            print("⚠️ Configuração diferente da baseline: comparação apenas indicativa")
+        comparacoes = comparar(resultado, baseline, args.tolerancia)
+
+    imprimir(resultado, comparacoes)
+
+    if args.saida:
+        Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n💾 Resultado salvo em: {args.saida}")
+
+    regressoes = [c for c in comparacoes or [] if c[4]]
+    if regressoes:
+        print(f"\n❌ {len(regressoes)} métricas regrediram mais de {args.tolerancia:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,38 @@ Sprint 4 - Challenge Reply
 Executar: streamlit run dashboard/app.py
 """
 
-import mysql.connector
+import hashlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
 import streamlit as st
 import sqlite3
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
 import joblib
 import numpy as np
 
+# Permite importar os módulos do projeto (streamlit executa a partir de dashboard/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.load_data import conectar_banco_mysql
+from analysis.downsampling import DEFAULT_MAX_POINTS, WEBGL_THRESHOLD, downsample_frame
+from analysis.data_analysis import DB_COLUMNS, build_readings_query
+from ml.train_model import criar_features_lote, pontuar_lote
+from db.barramento_eventos import BarramentoEventos
+from dashboard.cache_compartilhado import CacheCompartilhado, compartilhado
+from dashboard.consultas import (
+    novo_estado, atualizar_estado, mesclar_alertas_publicados, aplicar_alteracoes,
+    GRAVIDADES, STATUS_ATENDIMENTO,
+    contar_eventos, buscar_pagina_eventos, quedas_por_gravidade, resumo_tempo_resposta,
+    kpis_periodo, distribuicao_status
+)
+
 # Configuração da página
 st.set_page_config(
     page_title="Sistema Wearable - Segurança Industrial",
@@ -66,45 +88,223 @@ def carregar_modelo():
     except:
         return None, None
 
-@st.cache_data(ttl=30)
-def carregar_dados_db():
-    """Carrega dados do banco SQLite"""
-    #from db.load_data import conectar_banco_mysql
-    conn = mysql.connector.connect(
-        host='localhost',
-        port=3306,
-        user='sentinela',
-        password='password',
-        database='sentinela'
-    )
+def carregar_dados_db(reconciliar=False):
+    """
+    Atualiza os dados da sessão buscando apenas linhas novas no banco (as
+    alterações chegam pelo barramento; reconciliar=True reconfere os status)
+    """
+    if 'dados' not in st.session_state:
+        st.session_state['dados'] = novo_estado()
+    estado = st.session_state['dados']
     
-    # Leituras recentes
-    df_leituras = pd.read_sql_query("""
-        SELECT * FROM leituras_sensores 
-        ORDER BY timestamp_ms DESC 
-        LIMIT 1000
-    """, conn)
-    
-    # Eventos de queda
-    df_quedas = pd.read_sql_query("""
-        SELECT e.*, t.nome, t.setor
-        FROM eventos_queda e
-        JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
-        ORDER BY e.timestamp_queda DESC
-    """, conn)
-    
-    # Alertas
-    df_alertas = pd.read_sql_query("""
-        SELECT a.*, e.magnitude_impacto, t.nome
-        FROM alertas a
-        JOIN eventos_queda e ON a.id_evento = e.id_evento
-        JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
-        WHERE a.enviado = FALSE
-        ORDER BY a.data_alerta DESC
-    """, conn)
+    conn = conectar_banco_mysql()
+    try:
+        atualizar_estado(conn, estado, reconciliar=reconciliar)
+    finally:
+        conn.close()
+    
+    return estado['leituras'], estado['quedas'], estado['alertas']
+
+@st.cache_resource
+def cache_consultas():
+    """Cache de consultas compartilhado entre todas as sessões e processos"""
+    return CacheCompartilhado()
+
+@compartilhado(cache_consultas, ttl=30, tag='leituras')
+def carregar_serie_magnitude(limite):
+    """Carrega a série de magnitude das últimas `limite` leituras (ordem cronológica)"""
+    conn = conectar_banco_mysql()
+    
+    df_serie = pd.read_sql_query("""
+        SELECT timestamp_ms, magnitude, queda_detectada
+        FROM leituras_sensores
+        ORDER BY timestamp_ms DESC
+        LIMIT %s
+    """, conn, params=(int(limite),))
     
     conn.close()
-    return df_leituras, df_quedas, df_alertas
+    return df_serie.iloc[::-1].reset_index(drop=True)
+
+# Janelas dos indicadores (None = todo o período)
+JANELAS_KPI = {
+    'Última hora': timedelta(hours=1),
+    'Últimas 24 horas': timedelta(days=1),
+    'Últimos 7 dias': timedelta(days=7),
+    'Últimos 30 dias': timedelta(days=30),
+    'Todo o período': None
+}
+
+@compartilhado(cache_consultas, ttl=10, tag='leituras')
+def carregar_kpis(inicio, recente):
+    """KPIs e distribuição de status da janela (rollups mantidos por quem grava as leituras)"""
+    conn = conectar_banco_mysql()
+    try:
+        return kpis_periodo(conn, inicio, recente), distribuicao_status(conn, inicio)
+    finally:
+        conn.close()
+
+@compartilhado(cache_consultas, ttl=30, tag='eventos')
+def carregar_total_eventos(gravidade, status):
+    """Total de eventos de queda que atendem aos filtros"""
+    conn = conectar_banco_mysql()
+    try:
+        return contar_eventos(conn, gravidade, status)
+    finally:
+        conn.close()
+
+@compartilhado(cache_consultas, ttl=30, tag='eventos')
+def carregar_pagina_eventos(gravidade, status, cursor, tamanho):
+    """Página do histórico de eventos (filtros e paginação no banco)"""
+    conn = conectar_banco_mysql()
+    try:
+        return buscar_pagina_eventos(conn, gravidade, status, cursor, tamanho)
+    finally:
+        conn.close()
+
+@compartilhado(cache_consultas, ttl=30, tag='eventos')
+def carregar_quedas_por_gravidade():
+    """Quedas por gravidade agregadas no banco"""
+    conn = conectar_banco_mysql()
+    try:
+        return quedas_por_gravidade(conn)
+    finally:
+        conn.close()
+
+@compartilhado(cache_consultas, ttl=30, tag='eventos')
+def carregar_resumo_tempo_resposta():
+    """Box plot do tempo de resposta calculado a partir do histograma agregado"""
+    conn = conectar_banco_mysql()
+    try:
+        return resumo_tempo_resposta(conn)
+    finally:
+        conn.close()
+
+def versao_modelo(caminho='ml/fall_detection_model.pkl'):
+    """Versão do modelo em disco (muda a cada novo treinamento)"""
+    info = os.stat(caminho)
+    return f"{info.st_mtime_ns}-{info.st_size}"
+
+def preparar_lote(df):
+    """Leituras (formato do firmware ou do banco) -> features do modelo"""
+    df = df.rename(columns=DB_COLUMNS)
+    faltando = [c for c in ('timestamp_ms', 'aceleracao_x', 'aceleracao_y', 'aceleracao_z') if c not in df]
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {faltando}")
+    if 'magnitude' not in df:
+        df['magnitude'] = np.sqrt(df['aceleracao_x']**2 + df['aceleracao_y']**2 + df['aceleracao_z']**2)
+    
+    # Vários dispositivos: diff/janelas calculados por dispositivo
+    grupo = 'id_dispositivo' if 'id_dispositivo' in df and df['id_dispositivo'].nunique() > 1 else None
+    df = df.sort_values([grupo, 'timestamp_ms'] if grupo else 'timestamp_ms', kind='stable')
+    return criar_features_lote(df.reset_index(drop=True), grupo)
+
+def pontuar_entrada(chave_entrada, carregar_leituras):
+    """
+    Pontua um lote inteiro com uma chamada ao modelo
+    
+    O resultado fica no cache compartilhado com chave (hash da entrada,
+    versão do modelo): mover o threshold ou reabrir a página não repontua.
+    """
+    chave = f"pontuacao:{chave_entrada}:{versao_modelo()}"
+    
+    def calcular():
+        model, scaler = carregar_modelo()
+        df = preparar_lote(carregar_leituras())
+        df['prob_queda'] = pontuar_lote(model, scaler, df)
+        colunas = ['id_dispositivo', 'timestamp_ms', 'magnitude', 'queda_detectada', 'prob_queda']
+        return df[[c for c in colunas if c in df]]
+    
+    return cache_consultas().obter_ou_calcular(chave, 3600, calcular, consulta='pontuar_lote', tag='pontuacao')
+
+def leituras_periodo(inicio, fim, dispositivo):
+    """Leituras de um período do banco (filtros aplicados no SQL)"""
+    query, params = build_readings_query(device=dispositivo, start_date=inicio, end_date=fim,
+                                         columns=['Dispositivo', 'Timestamp(ms)', 'Ax(g)', 'Ay(g)',
+                                                  'Az(g)', 'Magnitude(g)', 'Queda'])
+    conn = conectar_banco_mysql()
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+def marca_periodo(fim):
+    """
+    Marca d'água de um período que ainda não terminou: leituras novas têm
+    data_registro = agora e caem nele, e cada uma avança MAX(id_leitura)
+    (busca pela chave primária). Período já fechado não muda: None.
+    """
+    if datetime.fromisoformat(str(fim)) <= datetime.now():
+        return None
+    conn = conectar_banco_mysql()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id_leitura), 0) FROM leituras_sensores")
+        return int(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+@st.cache_resource
+def barramento_eventos():
+    """Barramento local onde a ingestão publica novas quedas e alertas"""
+    return BarramentoEventos()
+
+@compartilhado(cache_consultas, ttl=300, tag='trabalhadores')
+def carregar_nomes_trabalhadores():
+    """Mapa id_trabalhador -> nome (para alertas recebidos pelo barramento)"""
+    conn = conectar_banco_mysql()
+    try:
+        df = pd.read_sql_query("SELECT id_trabalhador, nome FROM trabalhadores", conn)
+    finally:
+        conn.close()
+    return dict(zip(df['id_trabalhador'], df['nome']))
+
+@st.fragment(run_every=1)
+def painel_alertas():
+    """Alertas ativos - novos alertas chegam pelo barramento em até 1 segundo"""
+    eventos, st.session_state['barramento_posicao'] = barramento_eventos().ler_desde(
+        st.session_state['barramento_posicao']
+    )
+    
+    # Nova queda/alerta ou alteração: invalida só o histórico calculado antes da publicação
+    # (idempotente - as várias sessões que leem o mesmo evento não recalculam em cascata)
+    publicados = [evento['publicado_em'] for evento in eventos
+                  if evento['tipo'] in ('queda', 'alerta', 'alerta_enviado', 'status_evento', 'lacuna')]
+    if publicados:
+        cache_consultas().invalidar('eventos', antes_de=datetime.fromisoformat(max(publicados)).timestamp())
+    
+    # Eventos perdidos na rotação do log: ressincroniza pelo banco (inclusive status)
+    if any(evento['tipo'] == 'lacuna' for evento in eventos):
+        carregar_dados_db(reconciliar=True)
+    
+    novos = [evento['dados'] for evento in eventos if evento['tipo'] == 'alerta']
+    if novos:
+        nomes = carregar_nomes_trabalhadores()
+        for alerta in novos:
+            alerta.setdefault('nome', nomes.get(alerta.get('id_trabalhador'),
+                                                f"Trabalhador #{alerta.get('id_trabalhador')}"))
+        mesclar_alertas_publicados(st.session_state['dados'], novos)
+    
+    # Alertas enviados e mudanças de status (depois dos novos: vêm depois no log)
+    aplicar_alteracoes(st.session_state['dados'], eventos)
+    
+    df_alertas = st.session_state['dados']['alertas']
+    
+    if len(df_alertas) > 0:
+        st.subheader("🚨 ALERTAS ATIVOS")
+        
+        for idx, alerta in df_alertas.iterrows():
+            cor = "critical" if alerta['nivel_prioridade'] == 'critica' else "warning"
+            st.markdown(f"""
+            <div class="alert-{cor}">
+                <h3>⚠️ {alerta['tipo_alerta'].upper()} - Prioridade: {alerta['nivel_prioridade'].upper()}</h3>
+                <p><strong>Trabalhador:</strong> {alerta['nome']}</p>
+                <p><strong>Magnitude do Impacto:</strong> {alerta['magnitude_impacto']:.2f}g</p>
+                <p><strong>Mensagem:</strong> {alerta['mensagem']}</p>
+                <p><strong>Data/Hora:</strong> {alerta['data_alerta']}</p>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.success("✅ Nenhum alerta ativo no momento")
 
 def main():
     # Header
@@ -124,6 +324,16 @@ def main():
             step=0.1
         )
         
+        # Janela dos indicadores (KPIs e distribuição de status)
+        janela_kpi = st.selectbox("Janela dos Indicadores", list(JANELAS_KPI), index=1)
+        
+        # Janela do gráfico de magnitude
+        janela_grafico = st.selectbox(
+            "Janela do Gráfico (leituras)",
+            [200, 1_000, 10_000, 100_000, 576_000],
+            format_func=lambda n: f"{n:,}".replace(',', '.')
+        )
+        
         st.divider()
         
         # Status do sistema
@@ -135,71 +345,74 @@ def main():
         else:
             st.error("❌ Modelo ML Indisponível")
         
-        st.info("🔄 Atualização: Tempo Real")
+        st.info("🔄 Alertas: tempo real (barramento) | Dados: a cada atualização")
         
         # Botão de refresh
         if st.button("🔄 Atualizar Dados", use_container_width=True):
-            st.cache_data.clear()
+            # Invalida apenas a série de leituras, e só se tiver mais de 5s
+            # (vários operadores clicando juntos geram uma única consulta)
+            carregar_serie_magnitude.invalidar(antes_de=time.time() - 5)
             st.rerun()
+        
+        with st.expander("🗄️ Cache de Consultas"):
+            metricas = cache_consultas().metricas()
+            if metricas:
+                df_cache = pd.DataFrame.from_dict(metricas, orient='index')
+                df_cache['taxa_hit'] = (df_cache['taxa_hit'] * 100).round(1)
+                st.dataframe(df_cache[['hit', 'miss', 'coalescido', 'taxa_hit']], use_container_width=True)
+            else:
+                st.caption("Sem acessos registrados")
+    
+    # Posição inicial no barramento antes da primeira carga (nada se perde entre as duas)
+    if 'barramento_posicao' not in st.session_state:
+        st.session_state['barramento_posicao'] = barramento_eventos().posicao_atual()
     
     # Carregar dados
     df_leituras, df_quedas, df_alertas = carregar_dados_db()
     
     # ====== ALERTAS CRÍTICOS ======
-    if len(df_alertas) > 0:
-        st.markdown("---")
-        st.subheader("🚨 ALERTAS ATIVOS")
-        
-        for idx, alerta in df_alertas.iterrows():
-            cor = "critical" if alerta['nivel_prioridade'] == 'critica' else "warning"
-            st.markdown(f"""
-            <div class="alert-{cor}">
-                <h3>⚠️ {alerta['tipo_alerta'].upper()} - Prioridade: {alerta['nivel_prioridade'].upper()}</h3>
-                <p><strong>Trabalhador:</strong> {alerta['nome']}</p>
-                <p><strong>Magnitude do Impacto:</strong> {alerta['magnitude_impacto']:.2f}g</p>
-                <p><strong>Mensagem:</strong> {alerta['mensagem']}</p>
-                <p><strong>Data/Hora:</strong> {alerta['data_alerta']}</p>
-            </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.success("✅ Nenhum alerta ativo no momento")
+    painel_alertas()
     
     st.markdown("---")
     
     # ====== KPIs PRINCIPAIS ======
     st.subheader("📊 Indicadores Principais")
     
+    # Limites arredondados ao minuto: a chave do cache muda no máximo 1x/min
+    agora = datetime.now().replace(second=0, microsecond=0)
+    inicio = (agora - JANELAS_KPI[janela_kpi]).strftime('%Y-%m-%d %H:%M:%S') if JANELAS_KPI[janela_kpi] else None
+    recente = (agora - timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S')
+    kpis, df_status = carregar_kpis(inicio, recente)
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             label="Total de Leituras",
-            value=f"{len(df_leituras):,}",
-            delta=f"+{len(df_leituras[df_leituras['timestamp_ms'] > df_leituras['timestamp_ms'].max() - 10000])}"
+            value=f"{kpis['total_leituras']:,}".replace(',', '.'),
+            delta=f"+{kpis['leituras_recentes']:,} (5 min)".replace(',', '.')
         )
     
     with col2:
-        total_quedas = len(df_quedas)
         st.metric(
             label="Quedas Detectadas",
-            value=total_quedas,
-            delta=f"{total_quedas} eventos",
+            value=kpis['quedas'],
+            delta=f"{kpis['amostras_queda']} amostras de queda",
             delta_color="inverse"
         )
     
     with col3:
-        mag_max = df_leituras['magnitude'].max()
+        mag_max = kpis['magnitude_maxima']
         st.metric(
             label="Magnitude Máxima",
-            value=f"{mag_max:.2f}g",
-            delta="Pico registrado"
+            value=f"{mag_max:.2f}g" if mag_max is not None else "-",
+            delta=f"Média {kpis['magnitude_media']:.2f}g" if mag_max is not None else "Sem leituras"
         )
     
     with col4:
-        alertas_criticos = len(df_alertas[df_alertas['nivel_prioridade'] == 'critica'])
         st.metric(
             label="Alertas Críticos",
-            value=alertas_criticos,
+            value=kpis['alertas_criticos_pendentes'],
             delta="Pendentes",
             delta_color="inverse"
         )
@@ -212,16 +425,21 @@ def main():
     with col_left:
         st.subheader("📈 Magnitude da Aceleração em Tempo Real")
         
-        # Últimas 200 leituras
-        df_recent = df_leituras.tail(200).copy()
+        # Últimas leituras da janela selecionada
+        df_recent = carregar_serie_magnitude(janela_grafico).copy()
         df_recent['tempo_s'] = (df_recent['timestamp_ms'] - df_recent['timestamp_ms'].min()) / 1000
         
+        # Janelas longas: WebGL + downsampling preservando quedas e cruzamentos do threshold
+        Trace = go.Scattergl if len(df_recent) > WEBGL_THRESHOLD else go.Scatter
+        df_plot = downsample_frame(df_recent, 'magnitude', DEFAULT_MAX_POINTS,
+                                   keep_col='queda_detectada', thresholds=(threshold_magnitude,))
+        
         fig_timeline = go.Figure()
         
         # Linha de magnitude
-        fig_timeline.add_trace(go.Scatter(
-            x=df_recent['tempo_s'],
-            y=df_recent['magnitude'],
+        fig_timeline.add_trace(Trace(
+            x=df_plot['tempo_s'],
+            y=df_plot['magnitude'],
             mode='lines',
             name='Magnitude',
             line=dict(color='blue', width=2)
@@ -238,7 +456,7 @@ def main():
         # Quedas detectadas
         quedas_recent = df_recent[df_recent['queda_detectada'] == 1]
         if len(quedas_recent) > 0:
-            fig_timeline.add_trace(go.Scatter(
+            fig_timeline.add_trace(Trace(
                 x=quedas_recent['tempo_s'],
                 y=quedas_recent['magnitude'],
                 mode='markers',
@@ -246,6 +464,9 @@ def main():
                 marker=dict(color='red', size=12, symbol='x')
             ))
         
+        if len(df_plot) < len(df_recent):
+            st.caption(f"Exibindo {len(df_plot):,} de {len(df_recent):,} leituras (downsampling min/max)")
+        
         fig_timeline.update_layout(
             xaxis_title="Tempo (segundos)",
             yaxis_title="Magnitude (g)",
@@ -258,8 +479,7 @@ def main():
     with col_right:
         st.subheader("🎯 Distribuição de Status")
         
-        status_counts = df_leituras['status_movimento'].value_counts().reset_index()
-        status_counts.columns = ['Status', 'Quantidade']
+        status_counts = df_status.rename(columns={'status_movimento': 'Status', 'total': 'Quantidade'})
         
         fig_status = px.pie(
             status_counts,
@@ -282,37 +502,43 @@ def main():
     # ====== EVENTOS DE QUEDA ======
     st.subheader("📋 Histórico de Eventos de Queda")
     
-    if len(df_quedas) > 0:
-        # Filtros
-        col_f1, col_f2 = st.columns(2)
+    if carregar_total_eventos(None, None) > 0:
+        # Filtros (aplicados no banco)
+        col_f1, col_f2, col_f3 = st.columns([2, 2, 1])
         
         with col_f1:
-            gravidades = ['Todas'] + df_quedas['gravidade'].unique().tolist()
-            filtro_gravidade = st.selectbox("Filtrar por Gravidade", gravidades)
+            filtro_gravidade = st.selectbox("Filtrar por Gravidade", ['Todas'] + GRAVIDADES)
         
         with col_f2:
-            filtro_status = st.selectbox(
-                "Filtrar por Status", 
-                ['Todos'] + df_quedas['status_atendimento'].unique().tolist()
-            )
+            filtro_status = st.selectbox("Filtrar por Status", ['Todos'] + STATUS_ATENDIMENTO)
+        
+        with col_f3:
+            tamanho_pagina = st.selectbox("Por página", [25, 50, 100, 250], index=1)
         
-        # Aplicar filtros
-        df_filtrado = df_quedas.copy()
-        if filtro_gravidade != 'Todas':
-            df_filtrado = df_filtrado[df_filtrado['gravidade'] == filtro_gravidade]
-        if filtro_status != 'Todos':
-            df_filtrado = df_filtrado[df_filtrado['status_atendimento'] == filtro_status]
+        gravidade = None if filtro_gravidade == 'Todas' else filtro_gravidade
+        status = None if filtro_status == 'Todos' else filtro_status
+        
+        # Paginação por keyset: pilha de cursores, reiniciada quando os filtros mudam
+        chave_filtros = (gravidade, status, tamanho_pagina)
+        if st.session_state.get('historico_filtros') != chave_filtros:
+            st.session_state['historico_filtros'] = chave_filtros
+            st.session_state['historico_cursores'] = [None]
+        cursores = st.session_state['historico_cursores']
+        
+        df_pagina, proximo = carregar_pagina_eventos(gravidade, status, cursores[-1], tamanho_pagina)
+        total_filtrado = carregar_total_eventos(gravidade, status)
         
         # Tabela
         st.dataframe(
-            df_filtrado[[
-                'id_evento', 'nome', 'setor', 'magnitude_impacto', 
+            df_pagina[[
+                'id_evento', 'nome', 'setor', 'magnitude_impacto', 'amostras_queda',
                 'gravidade', 'status_atendimento', 'tempo_resposta_segundos', 'data_evento'
             ]].rename(columns={
                 'id_evento': 'ID',
                 'nome': 'Trabalhador',
                 'setor': 'Setor',
                 'magnitude_impacto': 'Magnitude (g)',
+                'amostras_queda': 'Amostras',
                 'gravidade': 'Gravidade',
                 'status_atendimento': 'Status',
                 'tempo_resposta_segundos': 'Tempo Resposta (s)',
@@ -322,16 +548,29 @@ def main():
             hide_index=True
         )
         
+        col_p1, col_p2, col_p3 = st.columns([1, 3, 1])
+        with col_p1:
+            if st.button("◀ Anterior", disabled=len(cursores) == 1, use_container_width=True):
+                cursores.pop()
+                st.rerun()
+        with col_p2:
+            st.caption(f"Página {len(cursores)} de {max(1, -(-total_filtrado // tamanho_pagina))} "
+                       f"— {total_filtrado:,} eventos".replace(',', '.'))
+        with col_p3:
+            if st.button("Próxima ▶", disabled=proximo is None, use_container_width=True):
+                cursores.append(proximo)
+                st.rerun()
+        
         # Gráfico de quedas por gravidade
         col_g1, col_g2 = st.columns(2)
         
         with col_g1:
             fig_grav = px.bar(
-                df_quedas['gravidade'].value_counts().reset_index(),
+                carregar_quedas_por_gravidade(),
                 x='gravidade',
-                y='count',
+                y='total',
                 title="Quedas por Gravidade",
-                labels={'gravidade': 'Gravidade', 'count': 'Quantidade'},
+                labels={'gravidade': 'Gravidade', 'total': 'Quantidade'},
                 color='gravidade',
                 color_discrete_map={
                     'leve': '#00C851',
@@ -342,18 +581,23 @@ def main():
             st.plotly_chart(fig_grav, use_container_width=True)
         
         with col_g2:
-            fig_tempo = px.box(
-                df_quedas,
-                y='tempo_resposta_segundos',
-                x='gravidade',
+            # Box plot a partir de estatísticas agregadas no banco
+            cores = {'leve': '#00C851', 'moderada': '#ffbb33', 'grave': '#ff4444'}
+            fig_tempo = go.Figure()
+            for _, linha in carregar_resumo_tempo_resposta().iterrows():
+                fig_tempo.add_trace(go.Box(
+                    name=linha['gravidade'],
+                    q1=[linha['q1']],
+                    median=[linha['mediana']],
+                    q3=[linha['q3']],
+                    lowerfence=[linha['limite_inferior']],
+                    upperfence=[linha['limite_superior']],
+                    marker_color=cores.get(linha['gravidade'])
+                ))
+            fig_tempo.update_layout(
                 title="Tempo de Resposta por Gravidade",
-                labels={'tempo_resposta_segundos': 'Tempo (s)', 'gravidade': 'Gravidade'},
-                color='gravidade',
-                color_discrete_map={
-                    'leve': '#00C851',
-                    'moderada': '#ffbb33',
-                    'grave': '#ff4444'
-                }
+                xaxis_title="Gravidade",
+                yaxis_title="Tempo (s)"
             )
             st.plotly_chart(fig_tempo, use_container_width=True)
     else:
@@ -367,40 +611,114 @@ def main():
     model, scaler = carregar_modelo()
     
     if model and scaler:
-        col_ml1, col_ml2, col_ml3, col_ml4 = st.columns(4)
-        
-        with col_ml1:
-            ax = st.number_input("Aceleração X (g)", -3.0, 3.0, 0.0, 0.1)
-        with col_ml2:
-            ay = st.number_input("Aceleração Y (g)", -3.0, 3.0, 0.0, 0.1)
-        with col_ml3:
-            az = st.number_input("Aceleração Z (g)", -3.0, 3.0, 1.0, 0.1)
-        with col_ml4:
-            st.write("")
-            st.write("")
-            if st.button("🔮 Prever", use_container_width=True):
-                # Calcular magnitude
-                magnitude = np.sqrt(ax**2 + ay**2 + az**2)
+        modo = st.radio("Entrada", ["Leitura única", "CSV do firmware", "Banco (período)"], horizontal=True)
+        
+        if modo == "Leitura única":
+            col_ml1, col_ml2, col_ml3, col_ml4 = st.columns(4)
+            
+            with col_ml1:
+                ax = st.number_input("Aceleração X (g)", -3.0, 3.0, 0.0, 0.1)
+            with col_ml2:
+                ay = st.number_input("Aceleração Y (g)", -3.0, 3.0, 0.0, 0.1)
+            with col_ml3:
+                az = st.number_input("Aceleração Z (g)", -3.0, 3.0, 1.0, 0.1)
+            with col_ml4:
+                st.write("")
+                st.write("")
+                if st.button("🔮 Prever", use_container_width=True):
+                    # Mesmas features do treinamento (uma leitura isolada: sem histórico)
+                    leitura = preparar_lote(pd.DataFrame({
+                        'timestamp_ms': [0], 'aceleracao_x': [ax], 'aceleracao_y': [ay], 'aceleracao_z': [az]
+                    }))
+                    magnitude = leitura['magnitude'].iloc[0]
+                    prob = pontuar_lote(model, scaler, leitura)[0]
+                    
+                    # Resultado
+                    if prob >= 0.5:
+                        st.error(f"⚠️ QUEDA DETECTADA! (Probabilidade: {prob:.1%})")
+                    else:
+                        st.success(f"✅ Normal (Probabilidade queda: {prob:.1%})")
+                    
+                    st.metric("Magnitude Calculada", f"{magnitude:.3f}g")
+        else:
+            df_score = None
+            
+            if modo == "CSV do firmware":
+                arquivo = st.file_uploader("CSV no formato do firmware (Timestamp(ms), Ax(g), Ay(g), Az(g), ...)",
+                                           type='csv')
+                if arquivo is not None:
+                    conteudo = arquivo.getvalue()
+                    with st.spinner("Pontuando leituras..."):
+                        df_score = pontuar_entrada(hashlib.sha256(conteudo).hexdigest(),
+                                                   lambda: pd.read_csv(io.BytesIO(conteudo)))
+            else:
+                col_d1, col_d2, col_d3, col_d4 = st.columns([2, 2, 2, 1])
+                with col_d1:
+                    data_inicio = st.date_input("Início", datetime.now().date() - timedelta(days=1))
+                with col_d2:
+                    data_fim = st.date_input("Fim", datetime.now().date())
+                with col_d3:
+                    dispositivo = st.text_input("Dispositivo (id ou serial, opcional)").strip() or None
+                with col_d4:
+                    st.write("")
+                    st.write("")
+                    if st.button("🔮 Pontuar", use_container_width=True):
+                        st.session_state['lote_periodo'] = (str(data_inicio), str(data_fim + timedelta(days=1)),
+                                                            int(dispositivo) if dispositivo and dispositivo.isdigit()
+                                                            else dispositivo)
+                
+                if 'lote_periodo' in st.session_state:
+                    periodo = st.session_state['lote_periodo']
+                    # Com o período em aberto, leituras novas mudam a chave e são pontuadas
+                    entrada = (periodo, marca_periodo(periodo[1]))
+                    with st.spinner("Pontuando leituras..."):
+                        df_score = pontuar_entrada(hashlib.sha256(repr(entrada).encode()).hexdigest(),
+                                                   lambda: leituras_periodo(*periodo))
+            
+            if df_score is not None and len(df_score) > 0:
+                limiar = st.slider("Threshold de probabilidade", 0.05, 0.95, 0.5, 0.05)
+                
+                df_score = df_score.copy()
+                df_score['deteccao'] = (df_score['prob_queda'] >= limiar).astype(int)
+                grupo = df_score['id_dispositivo'] if 'id_dispositivo' in df_score else pd.Series(0, index=df_score.index)
+                anterior = df_score['deteccao'].groupby(grupo).shift(fill_value=0)
+                incidentes = int(((df_score['deteccao'] == 1) & (anterior == 0)).sum())
+                
+                # Resumo das detecções
+                col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+                col_r1.metric("Leituras Pontuadas", f"{len(df_score):,}".replace(',', '.'))
+                col_r2.metric("Amostras ≥ Threshold", f"{int(df_score['deteccao'].sum()):,}".replace(',', '.'))
+                col_r3.metric("Incidentes", incidentes)
+                col_r4.metric("Probabilidade Máxima", f"{df_score['prob_queda'].max():.1%}")
                 
-                # Criar features
-                features = np.array([[
-                    ax, ay, az, magnitude,
-                    0, 0, magnitude, magnitude,
-                    np.arctan2(ay, ax),
-                    np.arctan2(az, ax)
-                ]])
+                if 'queda_detectada' in df_score:
+                    firmware = df_score['queda_detectada'].astype(int) == 1
+                    modelo_ml = df_score['deteccao'] == 1
+                    acertos = int((firmware & modelo_ml).sum())
+                    st.caption(f"Comparação com o firmware: {acertos}/{int(firmware.sum())} quedas do firmware "
+                               f"detectadas | {int((modelo_ml & ~firmware).sum())} detecções extras do modelo")
                 
-                features_scaled = scaler.transform(features)
-                pred = model.predict(features_scaled)[0]
-                proba = model.predict_proba(features_scaled)[0]
+                # Probabilidade ao longo do tempo (um dispositivo por vez)
+                df_plot = df_score
+                if 'id_dispositivo' in df_score and df_score['id_dispositivo'].nunique() > 1:
+                    escolhido = st.selectbox("Dispositivo", sorted(df_score['id_dispositivo'].unique()))
+                    df_plot = df_score[df_score['id_dispositivo'] == escolhido]
                 
-                # Resultado
-                if pred == 1:
-                    st.error(f"⚠️ QUEDA DETECTADA! (Probabilidade: {proba[1]:.1%})")
-                else:
-                    st.success(f"✅ Normal (Probabilidade queda: {proba[1]:.1%})")
+                tempo_s = (df_plot['timestamp_ms'] - df_plot['timestamp_ms'].min()) / 1000
+                df_plot = downsample_frame(df_plot.assign(tempo_s=tempo_s), 'prob_queda', DEFAULT_MAX_POINTS,
+                                           keep_col='deteccao', thresholds=(limiar,))
+                Trace = go.Scattergl if len(df_plot) > WEBGL_THRESHOLD else go.Scatter
                 
-                st.metric("Magnitude Calculada", f"{magnitude:.3f}g")
+                fig_prob = go.Figure()
+                fig_prob.add_trace(Trace(x=df_plot['tempo_s'], y=df_plot['prob_queda'], mode='lines',
+                                         name='Probabilidade de queda', line=dict(color='purple', width=1.5)))
+                fig_prob.add_hline(y=limiar, line_dash="dash", line_color="red",
+                                   annotation_text=f"Threshold: {limiar:.2f}")
+                fig_prob.update_layout(xaxis_title="Tempo (segundos)", yaxis_title="Probabilidade",
+                                       yaxis_range=[0, 1], height=350)
+                st.plotly_chart(fig_prob, use_container_width=True)
+            elif df_score is not None:
+                st.info("Nenhuma leitura encontrada para a entrada selecionada")
     else:
         st.warning("⚠️ Modelo ML não disponível. Execute o treinamento primeiro.")
     
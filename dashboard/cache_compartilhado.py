@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+CACHE COMPARTILHADO DE CONSULTAS DO DASHBOARD
+
+Cache externo ao processo (arquivo SQLite local como stand-in de um
+key-value) compartilhado por todas as sessões e processos do dashboard:
+
+- TTL por consulta
+- Single-flight: misses concorrentes da mesma chave geram UMA consulta ao
+  banco (lock por chave entre threads + lease entre processos)
+- Invalidação direcionada por tag (ex.: 'eventos'), opcionalmente só das
+  entradas criadas antes de um instante
+- Métricas de hit/miss/coalescência por consulta, contadas em memória e
+  gravadas a cada `intervalo_metricas` segundos: um hit é só uma leitura,
+  sem transação de escrita disputando a trava do WAL
+
+Assim a carga no banco fica constante com o número de operadores.
+"""
+
+import atexit
+import functools
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+CAMINHO_PADRAO = 'logs/cache_dashboard.sqlite'
+
+
+class CacheCompartilhado:
+    def __init__(self, caminho=CAMINHO_PADRAO, lease_segundos=30, espera_poll=0.05, intervalo_metricas=5.0):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_segundos = lease_segundos
+        self.espera_poll = espera_poll
+        self.intervalo_metricas = intervalo_metricas
+        self._local = threading.local()
+        self._locks = {}            # chave -> [lock, threads usando]; removida ao fim do cálculo
+        self._locks_guarda = threading.Lock()
+        self._contagens = {}        # (consulta, tipo) -> total ainda não gravado
+        self._contagens_guarda = threading.Lock()
+        self._gravado_em = time.monotonic()
+        self._criar_tabelas()
+        atexit.register(self.gravar_metricas)
+
+    def _conn(self):
+        """Uma conexão SQLite por thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _criar_tabelas(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entradas (
+                chave TEXT PRIMARY KEY,
+                tag TEXT,
+                valor BLOB,
+                criado_em REAL,
+                expira_em REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entradas_tag ON entradas(tag, criado_em)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (chave TEXT PRIMARY KEY, ate REAL)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metricas (
+                consulta TEXT,
+                tipo TEXT,
+                total INTEGER,
+                PRIMARY KEY (consulta, tipo)
+            )
+        """)
+
+    def _registrar(self, consulta, tipo, quantidade=1):
+        with self._contagens_guarda:
+            self._contagens[(consulta, tipo)] = self._contagens.get((consulta, tipo), 0) + quantidade
+            vencido = time.monotonic() - self._gravado_em >= self.intervalo_metricas
+        if vencido:
+            self.gravar_metricas()
+
+    def gravar_metricas(self):
+        """Grava de uma vez (uma transação) as contagens acumuladas em memória"""
+        with self._contagens_guarda:
+            contagens, self._contagens = self._contagens, {}
+            self._gravado_em = time.monotonic()
+        if not contagens:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("""
+                INSERT INTO metricas (consulta, tipo, total) VALUES (?, ?, ?)
+                ON CONFLICT(consulta, tipo) DO UPDATE SET total = total + excluded.total
+            """, [(consulta, tipo, total) for (consulta, tipo), total in contagens.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _ler(self, chave):
+        row = self._conn().execute(
+            "SELECT valor FROM entradas WHERE chave = ? AND expira_em > ?",
+            (chave, time.time())
+        ).fetchone()
+        return (True, pickle.loads(row[0])) if row else (False, None)
+
+    def _gravar(self, chave, tag, valor, ttl):
+        agora = time.time()
+        self._conn().execute("""
+            INSERT OR REPLACE INTO entradas (chave, tag, valor, criado_em, expira_em)
+            VALUES (?, ?, ?, ?, ?)
+        """, (chave, tag, pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), agora, agora + ttl))
+
+    def _obter_lease(self, chave):
+        """Tenta ser o único processo calculando `chave` (lease com expiração)"""
+        conn = self._conn()
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT ate FROM leases WHERE chave = ?", (chave,)).fetchone()
+            if row and row[0] > agora:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (chave, ate) VALUES (?, ?)",
+                         (chave, agora + self.lease_segundos))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _liberar_lease(self, chave):
+        self._conn().execute("DELETE FROM leases WHERE chave = ?", (chave,))
+
+    @contextmanager
+    def _lock_chave(self, chave):
+        """Lock da chave entre threads; a entrada sai do dicionário quando ninguém mais a usa"""
+        with self._locks_guarda:
+            entrada = self._locks.setdefault(chave, [threading.Lock(), 0])
+            entrada[1] += 1
+        try:
+            with entrada[0]:
+                yield
+        finally:
+            with self._locks_guarda:
+                entrada[1] -= 1
+                if entrada[1] == 0:
+                    del self._locks[chave]
+
+    def obter_ou_calcular(self, chave, ttl, funcao, consulta='consulta', tag=None):
+        """Retorna o valor em cache ou calcula com `funcao` (single-flight)"""
+        achou, valor = self._ler(chave)
+        if achou:
+            self._registrar(consulta, 'hit')
+            return valor
+
+        # Threads deste processo: apenas uma calcula, as demais esperam o resultado
+        with self._lock_chave(chave):
+            achou, valor = self._ler(chave)
+            if achou:
+                self._registrar(consulta, 'coalescido')
+                return valor
+
+            # Outros processos: lease - quem não obtém espera a entrada aparecer
+            while not self._obter_lease(chave):
+                time.sleep(self.espera_poll)
+                achou, valor = self._ler(chave)
+                if achou:
+                    self._registrar(consulta, 'coalescido')
+                    return valor
+
+            try:
+                self._registrar(consulta, 'miss')
+                inicio = time.perf_counter()
+                valor = funcao()
+                self._registrar_tempo(consulta, time.perf_counter() - inicio)
+                self._gravar(chave, tag, valor, ttl)
+            finally:
+                self._liberar_lease(chave)
+
+        return valor
+
+    def _registrar_tempo(self, consulta, segundos):
+        self._registrar(consulta, 'tempo_ms', int(segundos * 1000))
+
+    def invalidar(self, tag=None, antes_de=None):
+        """Remove entradas de uma tag (todas, ou só as criadas antes de `antes_de`)"""
+        sql = "DELETE FROM entradas"
+        condicoes, params = [], []
+        if tag is not None:
+            condicoes.append("tag = ?")
+            params.append(tag)
+        if antes_de is not None:
+            condicoes.append("criado_em < ?")
+            params.append(antes_de)
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        removidas = self._conn().execute(sql, params).rowcount
+        return removidas
+
+    def limpar_expiradas(self):
+        return self._conn().execute("DELETE FROM entradas WHERE expira_em <= ?", (time.time(),)).rowcount
+
+    def metricas(self):
+        """{consulta: {'hit': n, 'miss': n, 'coalescido': n, 'tempo_ms': n, 'taxa_hit': x}}"""
+        self.gravar_metricas()
+        resultado = {}
+        for consulta, tipo, total in self._conn().execute("SELECT consulta, tipo, total FROM metricas"):
+            resultado.setdefault(consulta, {'hit': 0, 'miss': 0, 'coalescido': 0, 'tempo_ms': 0})[tipo] = total
+        for valores in resultado.values():
+            acessos = valores['hit'] + valores['miss'] + valores['coalescido']
+            valores['taxa_hit'] = (valores['hit'] + valores['coalescido']) / acessos if acessos else 0.0
+        return resultado
+
+
+def compartilhado(cache, ttl, tag=None):
+    """
+    Decorator: resultado da função compartilhado entre sessões/processos
+
+    A chave é o nome da função + argumentos. `funcao.invalidar()` remove as
+    entradas da tag (padrão: nome da função).
+    """
+    def decorator(funcao):
+        nome = funcao.__qualname__
+        tag_funcao = tag or nome
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            chave = nome + ':' + hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+            return cache().obter_ou_calcular(chave, ttl, lambda: funcao(*args, **kwargs),
+                                             consulta=nome, tag=tag_funcao)
+
+        wrapper.invalidar = lambda antes_de=None: cache().invalidar(tag_funcao, antes_de)
+        return wrapper
+
+    return decorator
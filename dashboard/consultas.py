@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+CONSULTAS DO DASHBOARD - SISTEMA WEARABLE DE SEGURANÇA
+
+Consultas SQL usadas pelo dashboard, separadas do Streamlit para poderem
+ser reutilizadas (benchmarks, scripts) sem subir a interface.
+
+Atualização incremental: cada sessão guarda os DataFrames já carregados e
+uma marca d'água (maior id_leitura, id_evento e id_alerta vistos). A cada
+refresh só são buscadas as linhas novas, e os frames em memória ficam
+limitados a uma janela. Alterações de linhas já carregadas (alerta enviado,
+status de atendimento) chegam pelo barramento de eventos
+(aplicar_alteracoes); só depois de uma lacuna no barramento os status em
+memória são reconferidos no banco (atualizar_estado(reconciliar=True)).
+"""
+
+import pandas as pd
+
+# Tamanho máximo dos frames mantidos em memória por sessão
+JANELA_LEITURAS = 1000
+JANELA_EVENTOS = 5000
+JANELA_ALERTAS = 1000
+
+
+def novo_estado():
+    """Estado inicial de uma sessão do dashboard"""
+    return {
+        'leituras': None,
+        'quedas': None,
+        'alertas': None,
+        'marca_dagua': {'id_leitura': 0, 'id_evento': 0, 'id_alerta': 0},
+    }
+
+
+def _placeholders(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+def buscar_leituras_novas(conn, ultimo_id, limite=JANELA_LEITURAS):
+    """Leituras com id_leitura acima da marca d'água (no máximo as `limite` mais recentes)"""
+    return pd.read_sql_query("""
+        SELECT * FROM leituras_sensores
+        WHERE id_leitura > %s
+        ORDER BY id_leitura DESC
+        LIMIT %s
+    """, conn, params=(int(ultimo_id), int(limite)))
+
+
+def buscar_eventos_novos(conn, ultimo_id, limite=JANELA_EVENTOS):
+    """Eventos de queda com id_evento acima da marca d'água"""
+    return pd.read_sql_query("""
+        SELECT e.*, t.nome, t.setor
+        FROM eventos_queda e
+        JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
+        WHERE e.id_evento > %s
+        ORDER BY e.id_evento DESC
+        LIMIT %s
+    """, conn, params=(int(ultimo_id), int(limite)))
+
+
+def buscar_status_eventos(conn, ids):
+    """Status atual de eventos ainda em aberto (podem ter mudado desde o último refresh)"""
+    return pd.read_sql_query(f"""
+        SELECT id_evento, status_atendimento, tempo_resposta_segundos
+        FROM eventos_queda
+        WHERE id_evento IN ({_placeholders(ids)})
+    """, conn, params=[int(i) for i in ids])
+
+
+def buscar_alertas_novos(conn, ultimo_id, limite=JANELA_ALERTAS):
+    """Alertas pendentes com id_alerta acima da marca d'água"""
+    return pd.read_sql_query("""
+        SELECT a.*, e.magnitude_impacto, t.nome
+        FROM alertas a
+        JOIN eventos_queda e ON a.id_evento = e.id_evento
+        JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
+        WHERE a.id_alerta > %s AND a.enviado = FALSE
+        ORDER BY a.id_alerta DESC
+        LIMIT %s
+    """, conn, params=(int(ultimo_id), int(limite)))
+
+
+def buscar_alertas_enviados(conn, ids):
+    """Dentre os alertas pendentes em memória, quais já foram enviados"""
+    df = pd.read_sql_query(f"""
+        SELECT id_alerta FROM alertas
+        WHERE enviado = TRUE AND id_alerta IN ({_placeholders(ids)})
+    """, conn, params=[int(i) for i in ids])
+    return set(df['id_alerta'].tolist())
+
+
+def _anexar(atual, novos, janela, coluna_id=None):
+    """Anexa linhas novas ao frame da sessão mantendo as `janela` mais recentes"""
+    if atual is None:
+        return novos.reset_index(drop=True)
+    if novos.empty:
+        return atual
+    df = pd.concat([novos, atual], ignore_index=True)
+    if coluna_id:
+        df = df.drop_duplicates(subset=coluna_id, keep='first')
+    return df.head(janela).reset_index(drop=True)
+
+
+def mesclar_alertas_publicados(estado, alertas):
+    """Anexa alertas recebidos pelo barramento (sem consultar o banco)"""
+    if not alertas:
+        return estado
+    novos = pd.DataFrame(alertas).sort_values('id_alerta', ascending=False)
+    estado['alertas'] = _anexar(estado['alertas'], novos, JANELA_ALERTAS, 'id_alerta')
+    return estado
+
+
+def aplicar_alteracoes(estado, eventos):
+    """
+    Aplica ao estado as alterações publicadas no barramento (sem consultar o banco):
+    'alerta_enviado' ({'ids': [...]}) e 'status_evento' ({'id_evento',
+    'status_atendimento', 'tempo_resposta_segundos'})
+    """
+    enviados = {int(i) for evento in eventos if evento['tipo'] == 'alerta_enviado'
+                for i in evento['dados']['ids']}
+    alertas = estado['alertas']
+    if enviados and alertas is not None and not alertas.empty:
+        estado['alertas'] = alertas[~alertas['id_alerta'].isin(enviados)].reset_index(drop=True)
+
+    quedas = estado['quedas']
+    if quedas is None or quedas.empty:
+        return estado
+    for evento in eventos:
+        if evento['tipo'] != 'status_evento':
+            continue
+        dados = evento['dados']
+        idx = quedas['id_evento'] == int(dados['id_evento'])
+        for coluna in ('status_atendimento', 'tempo_resposta_segundos'):
+            if coluna in dados:
+                quedas.loc[idx, coluna] = dados[coluna]
+    return estado
+
+
+def atualizar_estado(conn, estado, reconciliar=False):
+    """
+    Atualiza o estado da sessão buscando apenas as linhas novas
+
+    Custo proporcional à atividade nova (linhas acima da marca d'água).
+    Com reconciliar=True (lacuna no barramento) também reconfere no banco
+    os eventos em aberto e os alertas pendentes já em memória.
+    """
+    marca = estado['marca_dagua']
+
+    # Leituras: apenas novas
+    novas = buscar_leituras_novas(conn, marca['id_leitura'])
+    estado['leituras'] = _anexar(estado['leituras'], novas, JANELA_LEITURAS)
+    if not novas.empty:
+        marca['id_leitura'] = int(novas['id_leitura'].max())
+
+    # Eventos: novos (+ status dos que ainda estão em aberto, ao reconciliar)
+    quedas = estado['quedas']
+    if reconciliar and quedas is not None and not quedas.empty:
+        abertos = quedas.loc[quedas['status_atendimento'] != 'finalizado', 'id_evento'].tolist()
+        if abertos:
+            status = buscar_status_eventos(conn, abertos).set_index('id_evento')
+            idx = quedas['id_evento'].isin(status.index)
+            for coluna in ('status_atendimento', 'tempo_resposta_segundos'):
+                quedas.loc[idx, coluna] = quedas.loc[idx, 'id_evento'].map(status[coluna]).values
+
+    novos = buscar_eventos_novos(conn, marca['id_evento'])
+    estado['quedas'] = _anexar(quedas, novos, JANELA_EVENTOS)
+    if not novos.empty:
+        marca['id_evento'] = int(novos['id_evento'].max())
+
+    # Alertas: anexa os novos pendentes (+ remove os já enviados, ao reconciliar)
+    alertas = estado['alertas']
+    if reconciliar and alertas is not None and not alertas.empty:
+        enviados = buscar_alertas_enviados(conn, alertas['id_alerta'].tolist())
+        if enviados:
+            alertas = alertas[~alertas['id_alerta'].isin(enviados)].reset_index(drop=True)
+
+    novos = buscar_alertas_novos(conn, marca['id_alerta'])
+    estado['alertas'] = _anexar(alertas, novos, JANELA_ALERTAS, 'id_alerta')
+    if not novos.empty:
+        marca['id_alerta'] = int(novos['id_alerta'].max())
+
+    return estado
+
+
+# ====== HISTÓRICO DE EVENTOS (filtros, agregações e paginação no banco) ======
+
+# Valores possíveis (mesmos CHECKs de db/schema.sql) - evita SELECT DISTINCT
+GRAVIDADES = ['leve', 'moderada', 'grave']
+STATUS_ATENDIMENTO = ['pendente', 'em_atendimento', 'finalizado']
+
+
+def _filtros_eventos(gravidade=None, status=None, alias='e'):
+    """Cláusulas WHERE (lista) e parâmetros para os filtros do histórico"""
+    condicoes = []
+    params = []
+    if gravidade:
+        condicoes.append(f"{alias}.gravidade = %s")
+        params.append(gravidade)
+    if status:
+        condicoes.append(f"{alias}.status_atendimento = %s")
+        params.append(status)
+    return condicoes, params
+
+
+def _where(condicoes):
+    return f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+
+def contar_eventos(conn, gravidade=None, status=None):
+    """Total de eventos que atendem aos filtros"""
+    condicoes, params = _filtros_eventos(gravidade, status)
+    df = pd.read_sql_query(f"""
+        SELECT COUNT(*) AS total FROM eventos_queda e {_where(condicoes)}
+    """, conn, params=params)
+    return int(df.iloc[0, 0])
+
+
+def buscar_pagina_eventos(conn, gravidade=None, status=None, cursor=None, tamanho=50):
+    """
+    Uma página do histórico com paginação por keyset
+
+    Args:
+        cursor (tuple): (timestamp_queda, id_evento) da última linha da página anterior
+
+    Returns:
+        tuple: (DataFrame da página, cursor da próxima página ou None)
+    """
+    condicoes, params = _filtros_eventos(gravidade, status)
+    if cursor is not None:
+        # Expandido (não (a, b) < (x, y)): o MySQL não faz range no índice com row
+        # values; o <= redundante dá o limite do range aos dois bancos
+        condicoes.append("e.timestamp_queda <= %s "
+                         "AND (e.timestamp_queda < %s OR (e.timestamp_queda = %s AND e.id_evento < %s))")
+        params.extend([int(cursor[0]), int(cursor[0]), int(cursor[0]), int(cursor[1])])
+
+    df = pd.read_sql_query(f"""
+        SELECT e.id_evento, t.nome, t.setor, e.magnitude_impacto, e.amostras_queda,
+               e.gravidade, e.status_atendimento, e.tempo_resposta_segundos, e.data_evento,
+               e.timestamp_queda
+        FROM eventos_queda e
+        JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
+        {_where(condicoes)}
+        ORDER BY e.timestamp_queda DESC, e.id_evento DESC
+        LIMIT %s
+    """, conn, params=[*params, int(tamanho) + 1])
+
+    proximo = None
+    if len(df) > tamanho:
+        df = df.head(tamanho)
+        ultima = df.iloc[-1]
+        proximo = (int(ultima['timestamp_queda']), int(ultima['id_evento']))
+
+    return df, proximo
+
+
+def quedas_por_gravidade(conn, gravidade=None, status=None):
+    """Contagem de eventos por gravidade (agregada no banco)"""
+    condicoes, params = _filtros_eventos(gravidade, status)
+    return pd.read_sql_query(f"""
+        SELECT e.gravidade, COUNT(*) AS total
+        FROM eventos_queda e
+        {_where(condicoes)}
+        GROUP BY e.gravidade
+    """, conn, params=params)
+
+
+def resumo_tempo_resposta(conn, gravidade=None, status=None):
+    """
+    Estatísticas de box plot do tempo de resposta por gravidade
+
+    O banco devolve apenas o histograma (gravidade, tempo, quantidade) - o
+    número de linhas depende dos valores distintos de tempo, não do total de
+    eventos. Quartis e limites são calculados sobre esse histograma.
+    """
+    condicoes, params = _filtros_eventos(gravidade, status)
+    condicoes.append("e.tempo_resposta_segundos IS NOT NULL")
+    hist = pd.read_sql_query(f"""
+        SELECT e.gravidade, e.tempo_resposta_segundos AS tempo, COUNT(*) AS total
+        FROM eventos_queda e
+        {_where(condicoes)}
+        GROUP BY e.gravidade, e.tempo_resposta_segundos
+    """, conn, params=params)
+
+    linhas = []
+    for grav, grupo in hist.groupby('gravidade'):
+        grupo = grupo.sort_values('tempo')
+        valores = grupo['tempo'].to_numpy(dtype=float)
+        acumulado = grupo['total'].cumsum().to_numpy()
+        n = acumulado[-1]
+
+        def quantil(q):
+            return float(valores[min(acumulado.searchsorted(q * n, side='left'), len(valores) - 1)])
+
+        q1, mediana, q3 = quantil(0.25), quantil(0.5), quantil(0.75)
+        iqr = q3 - q1
+        dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+        linhas.append({
+            'gravidade': grav,
+            'q1': q1,
+            'mediana': mediana,
+            'q3': q3,
+            'limite_inferior': float(dentro.min()) if len(dentro) else q1,
+            'limite_superior': float(dentro.max()) if len(dentro) else q3,
+            'total': int(n)
+        })
+
+    return pd.DataFrame(linhas)
+
+
+# ====== KPIs (agregados no banco sobre o rollup por minuto) ======
+
+def kpis_periodo(conn, inicio=None, recente=None):
+    """
+    Indicadores principais da janela [inicio, agora]
+
+    Leituras e magnitude vêm de rollup_leituras_minuto (custo proporcional
+    ao número de minutos); quedas e alertas são contagens indexadas.
+
+    Args:
+        inicio (str): 'YYYY-MM-DD HH:MM:SS' (None = todo o período)
+        recente (str): início da janela do delta de leituras
+    """
+    recente = recente or inicio or '1970-01-01 00:00:00'
+    condicao, params = ("WHERE minuto >= %s", [inicio]) if inicio else ("", [])
+    leituras = pd.read_sql_query(f"""
+        SELECT
+            COALESCE(SUM(total_leituras), 0) AS total_leituras,
+            COALESCE(SUM(amostras_queda), 0) AS amostras_queda,
+            SUM(soma_magnitude) AS soma_magnitude,
+            MAX(magnitude_maxima) AS magnitude_maxima,
+            COALESCE(SUM(CASE WHEN minuto >= %s THEN total_leituras ELSE 0 END), 0) AS leituras_recentes
+        FROM rollup_leituras_minuto
+        {condicao}
+    """, conn, params=[recente, *params]).iloc[0]
+
+    condicao, params = ("WHERE data_evento >= %s", [inicio]) if inicio else ("", [])
+    quedas = pd.read_sql_query(f"""
+        SELECT COUNT(*) AS total FROM eventos_queda {condicao}
+    """, conn, params=params).iloc[0, 0]
+
+    criticos = pd.read_sql_query("""
+        SELECT COUNT(*) AS total FROM alertas
+        WHERE enviado = FALSE AND nivel_prioridade = 'critica'
+    """, conn).iloc[0, 0]
+
+    total = int(leituras['total_leituras'])
+    return {
+        'total_leituras': total,
+        'leituras_recentes': int(leituras['leituras_recentes']),
+        'amostras_queda': int(leituras['amostras_queda']),
+        'magnitude_media': float(leituras['soma_magnitude']) / total if total else None,
+        'magnitude_maxima': float(leituras['magnitude_maxima']) if total else None,
+        'quedas': int(quedas),
+        'alertas_criticos_pendentes': int(criticos)
+    }
+
+
+def distribuicao_status(conn, inicio=None):
+    """Leituras por status de movimento na janela (a partir do rollup)"""
+    condicao, params = ("WHERE minuto >= %s", [inicio]) if inicio else ("", [])
+    return pd.read_sql_query(f"""
+        SELECT status_movimento, SUM(total_leituras) AS total
+        FROM rollup_leituras_minuto
+        {condicao}
+        GROUP BY status_movimento
+    """, conn, params=params)
+
+
+# ====== FROTA (por setor/trabalhador, sobre rollup_trabalhador_hora) ======
+
+def resumo_frota(conn, inicio):
+    """
+    Uma linha por trabalhador: atividade e quedas na janela e último contato
+
+    Cada junção é um agregado indexado (rollup por hora, eventos por data,
+    último contato por trabalhador) - nenhuma varredura de leituras_sensores.
+    """
+    return pd.read_sql_query("""
+        SELECT
+            t.id_trabalhador, t.nome, t.matricula, t.setor,
+            COALESCE(r.total_leituras, 0) AS total_leituras,
+            COALESCE(r.amostras_queda, 0) AS amostras_queda,
+            r.magnitude_maxima,
+            COALESCE(q.quedas, 0) AS quedas,
+            u.ultima_leitura
+        FROM trabalhadores t
+        LEFT JOIN (
+            SELECT id_trabalhador,
+                   SUM(total_leituras) AS total_leituras,
+                   SUM(amostras_queda) AS amostras_queda,
+                   MAX(magnitude_maxima) AS magnitude_maxima
+            FROM rollup_trabalhador_hora
+            WHERE hora >= %s
+            GROUP BY id_trabalhador
+        ) r ON r.id_trabalhador = t.id_trabalhador
+        LEFT JOIN (
+            SELECT id_trabalhador, COUNT(*) AS quedas
+            FROM eventos_queda
+            WHERE data_evento >= %s
+            GROUP BY id_trabalhador
+        ) q ON q.id_trabalhador = t.id_trabalhador
+        LEFT JOIN ultima_leitura_trabalhador u ON u.id_trabalhador = t.id_trabalhador
+        ORDER BY t.setor, t.id_trabalhador
+    """, conn, params=(inicio, inicio))
+
+
+def atividade_trabalhador(conn, id_trabalhador, inicio):
+    """Atividade por hora de um trabalhador (chave primária do rollup)"""
+    return pd.read_sql_query("""
+        SELECT hora, total_leituras, amostras_queda, magnitude_maxima,
+               soma_magnitude / total_leituras AS magnitude_media
+        FROM rollup_trabalhador_hora
+        WHERE id_trabalhador = %s AND hora >= %s
+        ORDER BY hora
+    """, conn, params=(int(id_trabalhador), inicio))
+
+
+def eventos_trabalhador(conn, id_trabalhador, limite=50):
+    """Últimos eventos de queda de um trabalhador"""
+    return pd.read_sql_query("""
+        SELECT id_evento, magnitude_impacto, amostras_queda, gravidade, status_atendimento,
+               tempo_resposta_segundos, data_evento
+        FROM eventos_queda
+        WHERE id_trabalhador = %s
+        ORDER BY timestamp_queda DESC
+        LIMIT %s
+    """, conn, params=(int(id_trabalhador), int(limite)))
+
+
+def leituras_trabalhador(conn, id_trabalhador, limite=2000):
+    """Últimas leituras de um trabalhador (ordem cronológica)"""
+    df = pd.read_sql_query("""
+        SELECT id_leitura, timestamp_ms, magnitude, status_movimento, queda_detectada
+        FROM leituras_sensores
+        WHERE id_trabalhador = %s
+        ORDER BY id_leitura DESC
+        LIMIT %s
+    """, conn, params=(int(id_trabalhador), int(limite)))
+    return df.iloc[::-1].reset_index(drop=True)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+DASHBOARD - VISÃO DA FROTA
+
+Mapa de calor setor x trabalhador, quedas e último contato de toda a frota,
+servidos pelos rollups (db/rollups.py) e índices compostos. O detalhe de um
+trabalhador só é consultado quando ele é selecionado.
+
+Executar: streamlit run dashboard/app.py (página "Frota" no menu lateral)
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from db.load_data import conectar_banco_mysql
+from dashboard.cache_compartilhado import CacheCompartilhado, compartilhado
+from dashboard.consultas import (
+    resumo_frota, atividade_trabalhador, eventos_trabalhador, leituras_trabalhador
+)
+
+st.set_page_config(
+    page_title="SENTINELA - Frota",
+    page_icon="🏭",
+    layout="wide"
+)
+
+JANELAS_FROTA = {
+    'Última hora': timedelta(hours=1),
+    'Últimas 8 horas': timedelta(hours=8),
+    'Últimas 24 horas': timedelta(days=1),
+    'Últimos 7 dias': timedelta(days=7)
+}
+
+METRICAS_MAPA = {
+    'Leituras': 'total_leituras',
+    'Quedas': 'quedas',
+    'Magnitude máxima (g)': 'magnitude_maxima',
+    'Minutos sem contato': 'minutos_sem_contato'
+}
+
+@st.cache_resource
+def cache_consultas():
+    """Cache de consultas compartilhado entre todas as sessões e processos"""
+    return CacheCompartilhado()
+
+@compartilhado(cache_consultas, ttl=15, tag='frota')
+def carregar_resumo_frota(inicio):
+    """Resumo por trabalhador (rollups mantidos por quem grava as leituras)"""
+    conn = conectar_banco_mysql()
+    try:
+        return resumo_frota(conn, inicio)
+    finally:
+        conn.close()
+
+@compartilhado(cache_consultas, ttl=15, tag='frota')
+def carregar_detalhe_trabalhador(id_trabalhador, inicio):
+    """Detalhe de um trabalhador: atividade por hora, eventos e últimas leituras"""
+    conn = conectar_banco_mysql()
+    try:
+        return (atividade_trabalhador(conn, id_trabalhador, inicio),
+                eventos_trabalhador(conn, id_trabalhador),
+                leituras_trabalhador(conn, id_trabalhador))
+    finally:
+        conn.close()
+
+def grade_setor_trabalhador(df, coluna):
+    """
+    Matriz setor x posição do trabalhador no setor (cada linha é um setor)
+
+    Retorna valores e textos de hover no formato esperado por go.Heatmap.
+    """
+    df = df.assign(posicao=df.groupby('setor').cumcount())
+    valores = df.pivot(index='setor', columns='posicao', values=coluna)
+    textos = df.assign(
+        texto=df['nome'] + ' (' + df['matricula'] + ')<br>' + coluna + ': ' + df[coluna].round(2).astype(str)
+    ).pivot(index='setor', columns='posicao', values='texto')
+    return valores, textos
+
+def main():
+    st.title("🏭 Visão da Frota")
+
+    with st.sidebar:
+        janela = st.selectbox("Janela", list(JANELAS_FROTA), index=2)
+        metrica = st.selectbox("Métrica do Mapa", list(METRICAS_MAPA))
+
+    # Início arredondado à hora: chave de cache estável entre sessões
+    agora = datetime.now()
+    inicio = (agora.replace(minute=0, second=0, microsecond=0) - JANELAS_FROTA[janela]).strftime('%Y-%m-%d %H:%M:%S')
+
+    df = carregar_resumo_frota(inicio).copy()
+    if df.empty:
+        st.info("Nenhum trabalhador cadastrado")
+        return
+
+    df['setor'] = df['setor'].fillna('Sem setor')
+    df['magnitude_maxima'] = df['magnitude_maxima'].astype(float)
+    ultima = pd.to_datetime(df['ultima_leitura'])
+    df['minutos_sem_contato'] = ((agora - ultima).dt.total_seconds() / 60).round(0)
+
+    # ====== KPIs DA FROTA ======
+    ativos = int((df['total_leituras'] > 0).sum())
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Trabalhadores", f"{len(df):,}".replace(',', '.'))
+    col2.metric("Ativos na Janela", f"{ativos:,}".replace(',', '.'))
+    col3.metric("Quedas na Janela", int(df['quedas'].sum()), delta_color="inverse")
+    col4.metric("Sem Contato > 1h", int((df['minutos_sem_contato'] > 60).sum()), delta_color="inverse")
+
+    # ====== MAPA DE CALOR SETOR x TRABALHADOR ======
+    st.subheader(f"🗺️ {metrica} por Setor e Trabalhador")
+    coluna = METRICAS_MAPA[metrica]
+    valores, textos = grade_setor_trabalhador(df, coluna)
+
+    fig_mapa = go.Figure(go.Heatmap(
+        z=valores.to_numpy(dtype=float),
+        y=valores.index,
+        text=textos.to_numpy(),
+        hoverinfo='text',
+        colorscale='Reds' if coluna != 'total_leituras' else 'Blues',
+        colorbar=dict(title=metrica)
+    ))
+    fig_mapa.update_layout(
+        xaxis_title="Trabalhadores do setor",
+        height=max(300, 60 * len(valores)),
+        xaxis_showticklabels=False
+    )
+    st.plotly_chart(fig_mapa, use_container_width=True)
+
+    # ====== RESUMO POR SETOR ======
+    st.subheader("📊 Resumo por Setor")
+    por_setor = df.groupby('setor').agg(
+        trabalhadores=('id_trabalhador', 'size'),
+        ativos=('total_leituras', lambda s: int((s > 0).sum())),
+        leituras=('total_leituras', 'sum'),
+        quedas=('quedas', 'sum'),
+        magnitude_maxima=('magnitude_maxima', 'max'),
+        ultimo_contato=('ultima_leitura', 'max')
+    ).reset_index()
+    st.dataframe(por_setor, use_container_width=True, hide_index=True)
+
+    # ====== TRABALHADORES ======
+    st.subheader("👷 Trabalhadores")
+    setores = ['Todos'] + sorted(df['setor'].unique())
+    col_f1, col_f2 = st.columns([1, 3])
+    with col_f1:
+        setor = st.selectbox("Setor", setores)
+    with col_f2:
+        busca = st.text_input("Buscar por nome ou matrícula").strip().lower()
+
+    filtrado = df if setor == 'Todos' else df[df['setor'] == setor]
+    if busca:
+        filtrado = filtrado[filtrado['nome'].str.lower().str.contains(busca, regex=False)
+                            | filtrado['matricula'].str.lower().str.contains(busca, regex=False)]
+    filtrado = filtrado.sort_values(['quedas', 'total_leituras'], ascending=False)
+
+    st.dataframe(
+        filtrado[['matricula', 'nome', 'setor', 'total_leituras', 'quedas',
+                  'magnitude_maxima', 'ultima_leitura', 'minutos_sem_contato']].rename(columns={
+            'matricula': 'Matrícula',
+            'nome': 'Nome',
+            'setor': 'Setor',
+            'total_leituras': 'Leituras',
+            'quedas': 'Quedas',
+            'magnitude_maxima': 'Magnitude Máx. (g)',
+            'ultima_leitura': 'Último Contato',
+            'minutos_sem_contato': 'Min. sem Contato'
+        }),
+        use_container_width=True,
+        hide_index=True,
+        height=300
+    )
+
+    # ====== DETALHE (consultado só quando um trabalhador é selecionado) ======
+    st.subheader("🔍 Detalhe do Trabalhador")
+    opcoes = [None] + filtrado['id_trabalhador'].tolist()
+    nomes = dict(zip(df['id_trabalhador'], df['matricula'] + ' - ' + df['nome']))
+    escolhido = st.selectbox("Trabalhador", opcoes,
+                             format_func=lambda i: 'Selecione...' if i is None else nomes[i])
+
+    if escolhido is None:
+        return
+
+    atividade, eventos, leituras = carregar_detalhe_trabalhador(int(escolhido), inicio)
+
+    col_d1, col_d2 = st.columns(2)
+    with col_d1:
+        fig_atividade = go.Figure(go.Bar(x=atividade['hora'], y=atividade['total_leituras'], name='Leituras'))
+        fig_atividade.update_layout(title="Leituras por Hora", height=300)
+        st.plotly_chart(fig_atividade, use_container_width=True)
+    with col_d2:
+        fig_leituras = go.Figure(go.Scatter(x=np.arange(len(leituras)), y=leituras['magnitude'],
+                                            mode='lines', name='Magnitude'))
+        quedas = leituras[leituras['queda_detectada'] == 1]
+        fig_leituras.add_trace(go.Scatter(x=quedas.index, y=quedas['magnitude'], mode='markers',
+                                          name='Quedas', marker=dict(color='red', size=10, symbol='x')))
+        fig_leituras.update_layout(title=f"Últimas {len(leituras)} Leituras", yaxis_title="Magnitude (g)",
+                                   height=300)
+        st.plotly_chart(fig_leituras, use_container_width=True)
+
+    if len(eventos) > 0:
+        st.dataframe(eventos, use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ Nenhum evento de queda registrado para este trabalhador")
+
+main()
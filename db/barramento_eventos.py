@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+BARRAMENTO LOCAL DE EVENTOS (QUEDAS E ALERTAS)
+
+A ingestão publica cada nova queda/alerta aqui e os consumidores (dashboard,
+despachante de alertas) são notificados sem depender de polling no banco.
+
+- Assinantes no mesmo processo recebem o evento por callback
+- Outros processos na mesma máquina leem um log append-only em JSON Lines
+  a partir da sua última posição (leitura barata, só os bytes novos)
+- O log rotacionado mantém GERACOES arquivos antigos; um leitor que ficou
+  para trás além disso recebe um evento 'lacuna' e deve ressincronizar
+  pelo banco (marcas d'água de id)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+CAMINHO_PADRAO = 'logs/eventos_barramento.jsonl'
+TAMANHO_MAXIMO = 10 * 1024 * 1024  # rotaciona acima de 10 MB
+GERACOES = 3  # .jsonl.1 (mais recente) ... .jsonl.3
+
+
+class BarramentoEventos:
+    def __init__(self, caminho=CAMINHO_PADRAO, tamanho_maximo=TAMANHO_MAXIMO, geracoes=GERACOES):
+        self.caminho = Path(caminho)
+        self.tamanho_maximo = tamanho_maximo
+        self.geracoes = max(1, geracoes)
+        self.assinantes = []
+
+    def assinar(self, callback):
+        """Registra um callback chamado a cada evento publicado neste processo"""
+        self.assinantes.append(callback)
+
+    def publicar(self, tipo, dados):
+        """Publica um evento ('queda', 'alerta', ...) para todos os assinantes"""
+        evento = {
+            'tipo': tipo,
+            'publicado_em': datetime.now().isoformat(timespec='milliseconds'),
+            'dados': dados
+        }
+        self.publicar_lote([evento])
+        return evento
+
+    def publicar_lote(self, eventos):
+        """Publica vários eventos com uma única escrita no log"""
+        if not eventos:
+            return
+
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        linhas = ''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in eventos)
+
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(linhas)
+                f.flush()
+                tamanho = f.tell()
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+        if tamanho > self.tamanho_maximo:
+            self._rotacionar()
+
+        for evento in eventos:
+            for callback in self.assinantes:
+                callback(evento)
+
+    def _geracao(self, n):
+        return self.caminho.with_suffix(f'.jsonl.{n}')
+
+    def _rotacionar(self):
+        """
+        Desloca .1 -> .2 -> ... e move o log atual para .1 (leitores ainda num
+        arquivo antigo terminam de lê-lo); a geração mais velha é descartada
+        """
+        try:
+            if os.stat(self.caminho).st_size <= self.tamanho_maximo:
+                return  # outro produtor já rotacionou
+        except FileNotFoundError:
+            return
+        for n in range(self.geracoes - 1, 0, -1):
+            try:
+                os.replace(self._geracao(n), self._geracao(n + 1))
+            except FileNotFoundError:
+                pass
+        try:
+            os.replace(self.caminho, self._geracao(1))
+        except FileNotFoundError:
+            pass
+
+    def _identidade(self, caminho):
+        """
+        (inode, assinatura da primeira linha) - o inode sozinho não basta: o
+        sistema de arquivos reaproveita o da geração descartada num log novo
+        """
+        try:
+            with open(caminho, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                linha = f.readline(4096)
+        except FileNotFoundError:
+            return None, None
+        assinatura = hashlib.sha1(linha).hexdigest()[:16] if linha.endswith(b'\n') else None
+        return inode, assinatura
+
+    @staticmethod
+    def _mesmo_arquivo(identidade, posicao):
+        inode, assinatura = identidade
+        if inode is None or inode != posicao['inode']:
+            return False
+        # Sem assinatura (primeira linha ainda incompleta) vale só o inode
+        anterior = posicao.get('assinatura')
+        return assinatura is None or anterior is None or assinatura == anterior
+
+    def posicao_atual(self):
+        """Posição do fim do log (para assinar apenas eventos futuros)"""
+        # Log atual recém-rotacionado: o fim da geração mais nova
+        for caminho in (self.caminho, self._geracao(1)):
+            inode, assinatura = self._identidade(caminho)
+            if inode is not None:
+                return {'inode': inode, 'offset': os.stat(caminho).st_size, 'assinatura': assinatura}
+        return {'inode': None, 'offset': 0}
+
+    def _ler_arquivo(self, caminho, offset):
+        with open(caminho, 'rb') as f:
+            f.seek(offset)
+            dados = f.read()
+        # Ignora uma última linha incompleta (escrita em andamento)
+        completo = dados[:dados.rfind(b'\n') + 1]
+        eventos = [json.loads(linha) for linha in completo.decode('utf-8').splitlines() if linha.strip()]
+        return eventos, offset + len(completo)
+
+    def ler_desde(self, posicao):
+        """
+        Lê os eventos publicados desde `posicao`
+
+        Se o arquivo de `posicao` já saiu das gerações mantidas, os eventos
+        entre ele e as gerações restantes se perderam: a lista começa com um
+        evento {'tipo': 'lacuna'} e o consumidor deve ressincronizar pelo banco.
+        Na dúvida (posição sem arquivo conhecido) a lacuna é sinalizada: uma
+        ressincronização a mais é barata, um evento perdido em silêncio não.
+
+        Returns:
+            tuple: (lista de eventos, nova posição)
+        """
+        eventos = []
+        atual = self._identidade(self.caminho)
+
+        if posicao['inode'] is None or not self._mesmo_arquivo(atual, posicao):
+            # O log foi rotacionado: termina de ler o arquivo antigo e as
+            # gerações mais novas que ele, da mais velha para a mais nova
+            geracoes = [self._identidade(self._geracao(n)) for n in range(1, self.geracoes + 1)]
+            if posicao['inode'] is None:
+                # Posição anterior a qualquer log: lê todas as gerações; com a
+                # mais velha ocupada, outras podem ter sido descartadas
+                achada = None
+                perdeu = geracoes[-1][0] is not None
+            else:
+                achada = next((n for n, identidade in enumerate(geracoes, 1)
+                               if self._mesmo_arquivo(identidade, posicao)), None)
+                perdeu = achada is None
+            if perdeu:
+                eventos.append({
+                    'tipo': 'lacuna',
+                    'publicado_em': datetime.now().isoformat(timespec='milliseconds'),
+                    'dados': {'inode': posicao['inode'], 'offset': posicao['offset']}
+                })
+            if achada is None:
+                achada = max((n for n, (inode, _) in enumerate(geracoes, 1) if inode is not None),
+                             default=None)
+                offset = 0
+            else:
+                offset = posicao['offset']
+            if achada is not None:
+                for n in range(achada, 0, -1):
+                    if geracoes[n - 1][0] is None:
+                        continue
+                    lidos, fim = self._ler_arquivo(self._geracao(n), offset)
+                    eventos.extend(lidos)
+                    # Sem log atual (acabou de rotacionar), continua do fim da última geração lida
+                    posicao = {'inode': geracoes[n - 1][0], 'offset': fim,
+                               'assinatura': geracoes[n - 1][1]}
+                    offset = 0
+            if atual[0] is not None:
+                posicao = {'inode': atual[0], 'offset': 0}
+
+        if atual[0] is None:
+            return eventos, posicao if posicao['inode'] is not None else {'inode': None, 'offset': 0}
+
+        novos, offset = self._ler_arquivo(self.caminho, posicao['offset'])
+        assinatura = atual[1]
+        if assinatura is None and offset > 0:
+            assinatura = self._identidade(self.caminho)[1]
+        return eventos + novos, {'inode': atual[0], 'offset': offset, 'assinatura': assinatura}
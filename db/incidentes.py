@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+AGRUPAMENTO DE AMOSTRAS DE QUEDA EM INCIDENTES
+
+Um impacto mantém Queda=1 por várias amostras seguidas (50 ms cada). O
+agrupador recebe as amostras em ordem de tempo e junta, por dispositivo, as
+amostras sinalizadas separadas por no máximo `intervalo_max_ms` em um único
+incidente - que vira UM evento de queda e no máximo UM alerta.
+
+Streaming: mantém em memória apenas o incidente aberto de cada dispositivo.
+"""
+
+
+class AgrupadorIncidentes:
+    def __init__(self, intervalo_max_ms=1000):
+        """
+        Args:
+            intervalo_max_ms (int): maior intervalo entre duas amostras
+                sinalizadas do mesmo incidente
+        """
+        self.intervalo_max_ms = intervalo_max_ms
+        self.abertos = {}
+
+    def _novo(self, dispositivo, trabalhador, timestamp_ms, magnitude, id_leitura):
+        return {
+            'id_dispositivo': dispositivo,
+            'id_trabalhador': trabalhador,
+            'inicio_ms': timestamp_ms,
+            'fim_ms': timestamp_ms,
+            'magnitude_pico': magnitude,
+            'id_leitura_pico': id_leitura,
+            'amostras': 1
+        }
+
+    def avancar(self, dispositivo, timestamp_ms):
+        """
+        Informa o tempo atual de um dispositivo (amostra sem queda)
+
+        Returns:
+            list: incidentes encerrados (no máximo um)
+        """
+        aberto = self.abertos.get(dispositivo)
+        if aberto and timestamp_ms - aberto['fim_ms'] > self.intervalo_max_ms:
+            return [self.abertos.pop(dispositivo)]
+        return []
+
+    def adicionar(self, dispositivo, trabalhador, timestamp_ms, magnitude, id_leitura=None):
+        """
+        Adiciona uma amostra com queda sinalizada
+
+        Returns:
+            list: incidentes encerrados por esta amostra (no máximo um)
+        """
+        encerrados = self.avancar(dispositivo, timestamp_ms)
+        aberto = self.abertos.get(dispositivo)
+
+        if aberto is None:
+            self.abertos[dispositivo] = self._novo(dispositivo, trabalhador, timestamp_ms, magnitude, id_leitura)
+            return encerrados
+
+        aberto['fim_ms'] = timestamp_ms
+        aberto['amostras'] += 1
+        if magnitude > aberto['magnitude_pico']:
+            aberto['magnitude_pico'] = magnitude
+            aberto['id_leitura_pico'] = id_leitura
+        return encerrados
+
+    def encerrar(self, dispositivos):
+        """
+        Encerra os incidentes abertos destes dispositivos (ex.: dispositivo
+        que parou de enviar amostras - comum logo após uma queda)
+
+        Returns:
+            list: incidentes encerrados
+        """
+        return [self.abertos.pop(d) for d in list(dispositivos) if d in self.abertos]
+
+    def finalizar(self):
+        """Encerra todos os incidentes ainda abertos (fim do lote)"""
+        encerrados = sorted(self.abertos.values(), key=lambda i: i['inicio_ms'])
+        self.abertos = {}
+        return encerrados
@@ -0,0 +1,22 @@
+-- =====================================================
+-- ÍNDICES PARCIAIS - SQLITE
+-- =====================================================
+-- O MySQL não tem índices com WHERE; lá as mesmas consultas usam os índices
+-- compostos de schema.sql. conectar_banco_sqlite aplica este arquivo em
+-- bancos novos, depois de schema.sql. A condição do índice precisa ser a
+-- mesma da consulta para o SQLite usá-lo.
+
+-- vw_leituras_criticas: só as leituras críticas, já em ordem de tempo (sem união nem ordenação)
+CREATE INDEX idx_leituras_criticas ON leituras_sensores(timestamp_ms) WHERE queda_detectada = TRUE OR magnitude > 2.0;
+
+-- Alertas pendentes (enviado = FALSE é uma fração pequena da tabela):
+-- dashboard (id_alerta > ?) e vw_alertas_pendentes (ORDER BY data_alerta)
+CREATE INDEX idx_alertas_pendentes_id ON alertas(id_alerta) WHERE enviado = FALSE;
+CREATE INDEX idx_alertas_pendentes_data ON alertas(data_alerta, nivel_prioridade) WHERE enviado = FALSE;
+
+-- Fila do despachante: ORDER BY prioridade (mesmo CASE de ORDEM_PRIORIDADE em
+-- alertas/despachante.py), id_alerta - sem ordenação temporária
+CREATE INDEX idx_alertas_pendentes_prioridade ON alertas(
+    (CASE nivel_prioridade WHEN 'critica' THEN 0 WHEN 'alta' THEN 1 WHEN 'media' THEN 2 WHEN 'baixa' THEN 3 ELSE 4 END),
+    id_alerta
+) WHERE enviado = FALSE;
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+CONEXÃO INSTRUMENTADA
+
+Proxy de conexão DB-API que conta as consultas executadas e o tempo gasto
+no banco (execução e leitura dos resultados), sem mudar o comportamento da conexão original (inclusive com
+pd.read_sql_query, que usa conn.cursor()). O pipeline usa um contador por
+passo para as métricas de execução.
+"""
+
+import threading
+import time
+
+
+class ContadorConsultas:
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_s = 0.0
+        self.lock = threading.Lock()
+
+    def registrar(self, duracao_s, consulta=True):
+        """consulta=False soma só o tempo (fetch* de uma consulta já contada)"""
+        with self.lock:
+            if consulta:
+                self.consultas += 1
+            self.tempo_s += duracao_s
+
+
+class CursorInstrumentado:
+    def __init__(self, cursor, contador):
+        self._cursor = cursor
+        self._contador = contador
+
+    def _medir(self, metodo, *args, consulta=True, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            self._contador.registrar(time.perf_counter() - inicio, consulta)
+
+    def execute(self, *args, **kwargs):
+        return self._medir(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._medir(self._cursor.executemany, *args, **kwargs)
+
+    def fetchone(self):
+        return self._medir(self._cursor.fetchone, consulta=False)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._medir(self._cursor.fetchmany, *args, consulta=False, **kwargs)
+
+    def fetchall(self):
+        return self._medir(self._cursor.fetchall, consulta=False)
+
+    def __iter__(self):
+        # Tempo acumulado das linhas, registrado uma vez ao fim da iteração
+        linhas = iter(self._cursor)
+        gasto = 0.0
+        try:
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    linha = next(linhas)
+                except StopIteration:
+                    return
+                finally:
+                    gasto += time.perf_counter() - inicio
+                yield linha
+        finally:
+            self._contador.registrar(gasto, consulta=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoInstrumentada:
+    def __init__(self, conn, contador):
+        self._conn = conn
+        self.contador = contador
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._conn.cursor(*args, **kwargs), self.contador)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+LINHA DO TEMPO DA FROTA (MERGE K-WAY)
+
+Junta as leituras de vários dispositivos em ordem de tempo real
+(epoch_ms = epoch_boot_ms + timestamp_ms, ver db/sessoes.py) sem carregar
+nem ordenar tudo. No banco, cada dispositivo é um fluxo já ordenado, lido
+aos poucos por keyset, e heapq.merge mantém só a próxima leitura de cada
+fluxo (memória: dispositivos x tamanho da página). No Parquet, cada janela
+de tempo real é lida uma vez para todos os dispositivos e ordenada em
+memória (memória: leituras da frota na janela).
+
+Cada leitura é a tupla (epoch_ms, id_dispositivo, id_trabalhador,
+id_leitura, timestamp_ms, aceleracao_x, aceleracao_y, aceleracao_z,
+magnitude, status_movimento, queda_detectada); id_leitura é None no Parquet.
+
+Executar: python db/linha_do_tempo.py [--dispositivos 1,2,3] [--mostrar 20] [--janela-quedas 2000]
+"""
+
+import argparse
+import heapq
+import sys
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+
+COLUNAS = ['epoch_ms', 'id_dispositivo', 'id_trabalhador', 'id_leitura', 'timestamp_ms',
+           'aceleracao_x', 'aceleracao_y', 'aceleracao_z', 'magnitude', 'status_movimento',
+           'queda_detectada']
+
+
+def _sessoes_dispositivo(cursor, id_dispositivo, inicio_ms=None, fim_ms=None):
+    """
+    Sessões do dispositivo que cruzam a janela [inicio_ms, fim_ms] (epoch ms),
+    em ordem de início real: os ids seguem a ordem de ingestão, não a do
+    tempo (backfill de sessões, CSV antigo reingerido)
+
+    Returns:
+        list: (id_sessao, epoch_boot_ms, inicio_epoch_ms, fim_epoch_ms)
+    """
+    condicoes = ["id_dispositivo = %s"]
+    params = [int(id_dispositivo)]
+    if inicio_ms is not None:
+        condicoes.append("epoch_boot_ms + timestamp_fim_ms >= %s")
+        params.append(int(inicio_ms))
+    if fim_ms is not None:
+        condicoes.append("epoch_boot_ms + timestamp_inicio_ms <= %s")
+        params.append(int(fim_ms))
+    cursor.execute(f"""
+        SELECT id_sessao, epoch_boot_ms, epoch_boot_ms + timestamp_inicio_ms, epoch_boot_ms + timestamp_fim_ms
+        FROM sessoes_boot
+        WHERE {' AND '.join(condicoes)}
+        ORDER BY epoch_boot_ms + timestamp_inicio_ms, id_sessao
+    """, params)
+    return [tuple(int(v) for v in row) for row in cursor.fetchall()]
+
+
+def _grupos_sobrepostos(sessoes):
+    """
+    Agrupa sessões consecutivas cujos intervalos reais se sobrepõem (erro de
+    estimativa da época, mesmos dados ingeridos por caminhos diferentes);
+    normalmente cada grupo tem uma sessão só
+    """
+    grupo, fim_grupo = [], None
+    for sessao in sessoes:
+        if grupo and sessao[2] > fim_grupo:
+            yield grupo
+            grupo = []
+        fim_grupo = sessao[3] if not grupo else max(fim_grupo, sessao[3])
+        grupo.append(sessao)
+    if grupo:
+        yield grupo
+
+
+def _leituras_sessao(conn, id_dispositivo, id_sessao, epoch_boot_ms, inicio_ms, fim_ms, tamanho_pagina):
+    """Leituras de uma sessão em ordem, páginas por keyset (timestamp_ms, id_leitura)"""
+    cursor = conn.cursor()
+    minimo = -1 if inicio_ms is None else int(inicio_ms) - epoch_boot_ms
+    condicao_fim, params_fim = ("", []) if fim_ms is None else \
+        ("AND l.timestamp_ms <= %s", [int(fim_ms) - epoch_boot_ms])
+    ultimo = (minimo - 1, 0)
+    while True:
+        # Keyset expandido em OR: o MySQL não faz range no índice com row values
+        cursor.execute(f"""
+            SELECT l.id_trabalhador, l.id_leitura, l.timestamp_ms, l.aceleracao_x, l.aceleracao_y,
+                   l.aceleracao_z, l.magnitude, l.status_movimento, l.queda_detectada
+            FROM leituras_sensores l
+            WHERE l.id_dispositivo = %s AND l.id_sessao = %s
+              AND l.timestamp_ms >= %s
+              AND (l.timestamp_ms > %s OR (l.timestamp_ms = %s AND l.id_leitura > %s)) {condicao_fim}
+            ORDER BY l.timestamp_ms, l.id_leitura
+            LIMIT %s
+        """, [int(id_dispositivo), id_sessao, ultimo[0], ultimo[0], ultimo[0], ultimo[1],
+              *params_fim, int(tamanho_pagina)])
+        pagina = cursor.fetchall()
+
+        for id_trabalhador, id_leitura, timestamp_ms, ax, ay, az, magnitude, status, queda in pagina:
+            yield (epoch_boot_ms + int(timestamp_ms), int(id_dispositivo), id_trabalhador, id_leitura,
+                   int(timestamp_ms), float(ax), float(ay), float(az), float(magnitude), status, int(queda))
+
+        if len(pagina) < tamanho_pagina:
+            break
+        ultimo = (int(pagina[-1][2]), int(pagina[-1][1]))
+
+
+def leituras_dispositivo_banco(conn, id_dispositivo, inicio_ms=None, fim_ms=None, tamanho_pagina=5000):
+    """
+    Fluxo ordenado de um dispositivo: sessão a sessão em ordem de início
+    real, páginas por keyset (timestamp_ms, id_leitura) no índice
+    (id_dispositivo, id_sessao, timestamp_ms, id_leitura)
+
+    Sessões que se sobrepõem no tempo real são intercaladas por merge (uma
+    página em memória por sessão do grupo). Cada página é lida por completo
+    antes de ceder, então vários fluxos podem compartilhar a mesma conexão.
+    """
+    sessoes = _sessoes_dispositivo(conn.cursor(), id_dispositivo, inicio_ms, fim_ms)
+    for grupo in _grupos_sobrepostos(sessoes):
+        fluxos = [_leituras_sessao(conn, id_dispositivo, id_sessao, epoch_boot_ms, inicio_ms, fim_ms,
+                                   tamanho_pagina)
+                  for id_sessao, epoch_boot_ms, _, _ in grupo]
+        yield from fluxos[0] if len(fluxos) == 1 else linha_do_tempo(fluxos)
+
+
+def leituras_dispositivo_arquivo(caminho, id_dispositivo, epoch_boot_ms=0, janela_ms=60_000):
+    """
+    Fluxo ordenado de um dispositivo em um Parquet no formato do firmware
+    (ex.: generate_fleet_data); para vários, use linha_do_tempo_arquivo
+    (uma leitura do arquivo por janela para todos, não uma por dispositivo)
+    """
+    return linha_do_tempo_arquivo(caminho, [id_dispositivo], {id_dispositivo: epoch_boot_ms}, janela_ms)
+
+
+def linha_do_tempo(fluxos):
+    """Merge k-way preguiçoso de fluxos ordenados por epoch_ms (empate: ordem dos fluxos)"""
+    return heapq.merge(*fluxos, key=itemgetter(0))
+
+
+def linha_do_tempo_banco(conn, dispositivos=None, inicio_ms=None, fim_ms=None, tamanho_pagina=5000):
+    """Linha do tempo da frota (ou dos `dispositivos` informados) a partir do banco"""
+    if dispositivos is None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT id_dispositivo FROM sessoes_boot ORDER BY id_dispositivo")
+        dispositivos = [int(row[0]) for row in cursor.fetchall()]
+    return linha_do_tempo(
+        leituras_dispositivo_banco(conn, d, inicio_ms, fim_ms, tamanho_pagina) for d in dispositivos
+    )
+
+
+def linha_do_tempo_arquivo(caminho, dispositivos, epocas_boot=None, janela_ms=60_000):
+    """
+    Linha do tempo a partir de um Parquet no formato do firmware, em janelas
+    de `janela_ms` de tempo real
+
+    Cada janela é uma única leitura do arquivo (filtro por dispositivo e
+    millis(), agrupando os dispositivos de mesma época de boot), dividida e
+    ordenada em memória: cada row group é decodificado uma vez por janela
+    que o cruza, qualquer que seja o número de dispositivos. O Parquet não
+    registra a sessão: cada dispositivo é tratado como uma sessão só.
+
+    Args:
+        epocas_boot (dict): id_dispositivo -> epoch_boot_ms (padrão 0: millis() como está)
+    """
+    import pandas as pd
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Leitura de Parquet requer pyarrow: pip install pyarrow")
+
+    dispositivos = [int(d) for d in dispositivos]
+    if not dispositivos:
+        return
+    epocas_boot = {d: int((epocas_boot or {}).get(d, 0)) for d in dispositivos}
+    grupos = {}
+    for d in dispositivos:
+        grupos.setdefault(epocas_boot[d], []).append(d)
+    # Empate no epoch_ms: ordem dos dispositivos informados (como no merge do banco)
+    ordem = {d: posicao for posicao, d in enumerate(dispositivos)}
+
+    arquivo = pq.ParquetFile(caminho)
+    coluna = arquivo.schema_arrow.get_field_index('Timestamp(ms)')
+    estatisticas = [arquivo.metadata.row_group(i).column(coluna).statistics
+                    for i in range(arquivo.num_row_groups)]
+    if not estatisticas:
+        return
+    inicio = min(int(e.min) for e in estatisticas) + min(grupos)
+    fim = max(int(e.max) for e in estatisticas) + max(grupos)
+
+    for janela in range(inicio, fim + 1, janela_ms):
+        # Mesma janela de tempo real = janela de millis() deslocada pela época de cada grupo
+        df = pd.read_parquet(caminho, filters=[
+            [('Dispositivo', 'in', grupo),
+             ('Timestamp(ms)', '>=', janela - epoca),
+             ('Timestamp(ms)', '<', janela + janela_ms - epoca)]
+            for epoca, grupo in grupos.items()
+        ])
+        if df.empty:
+            continue
+        df['_epoch'] = df['Dispositivo'].map(epocas_boot).astype('int64') + df['Timestamp(ms)'].astype('int64')
+        df['_ordem'] = df['Dispositivo'].map(ordem)
+        df = df.sort_values(['_epoch', '_ordem'], kind='stable')
+
+        for linha in zip(df['_epoch'], df['Dispositivo'], df['Trabalhador'], df['Timestamp(ms)'],
+                         df['Ax(g)'], df['Ay(g)'], df['Az(g)'], df['Magnitude(g)'], df['Status'], df['Queda']):
+            epoch_ms, id_dispositivo, id_trabalhador, timestamp_ms, ax, ay, az, magnitude, status, queda = linha
+            yield (int(epoch_ms), int(id_dispositivo), int(id_trabalhador), None, int(timestamp_ms),
+                   float(ax), float(ay), float(az), float(magnitude), status, int(queda))
+
+
+def quedas_simultaneas(leituras, janela_ms=2000, minimo_dispositivos=2):
+    """
+    Correlação entre dispositivos em streaming: amostras de queda de pelo
+    menos `minimo_dispositivos` dispositivos dentro de `janela_ms` (ex.:
+    desabamento, piso escorregadio em um setor)
+
+    Args:
+        leituras: linha do tempo (ordenada por epoch_ms)
+
+    Yields:
+        list: amostras de queda do agrupamento, em ordem de tempo
+    """
+    janela = deque()
+    for leitura in leituras:
+        if not leitura[10]:
+            continue
+        # Fecha o agrupamento quando a nova queda fica fora da janela do primeiro
+        if janela and leitura[0] - janela[0][0] > janela_ms:
+            if len({amostra[1] for amostra in janela}) >= minimo_dispositivos:
+                yield list(janela)
+                janela.clear()
+            while janela and leitura[0] - janela[0][0] > janela_ms:
+                janela.popleft()
+        janela.append(leitura)
+    if len({amostra[1] for amostra in janela}) >= minimo_dispositivos:
+        yield list(janela)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from datetime import datetime
+    from db.load_data import conectar_banco_mysql
+
+    parser = argparse.ArgumentParser(description='Linha do tempo da frota (merge por tempo real)')
+    parser.add_argument('--dispositivos', default=None, help='Ids separados por vírgula (padrão: todos)')
+    parser.add_argument('--mostrar', type=int, default=20, help='Leituras exibidas do início da linha do tempo')
+    parser.add_argument('--janela-quedas', type=int, default=2000,
+                        help='Janela (ms) para quedas simultâneas em dispositivos diferentes')
+    args = parser.parse_args()
+
+    dispositivos = [int(d) for d in args.dispositivos.split(',')] if args.dispositivos else None
+    conn = conectar_banco_mysql()
+    try:
+        for leitura in islice(linha_do_tempo_banco(conn, dispositivos), args.mostrar):
+            epoch_ms, id_dispositivo, _, _, timestamp_ms, _, _, _, magnitude, status, _ = leitura
+            print(f"{datetime.fromtimestamp(epoch_ms / 1000).isoformat(timespec='milliseconds')} "
+                  f"disp {id_dispositivo:>4} millis {timestamp_ms:>10} {magnitude:6.3f}g {status}")
+
+        total = 0
+        for grupo in quedas_simultaneas(linha_do_tempo_banco(conn, dispositivos), args.janela_quedas):
+            total += 1
+            inicio = datetime.fromtimestamp(grupo[0][0] / 1000).isoformat(timespec='seconds')
+            print(f"⚠️ {inicio}: quedas em {len({a[1] for a in grupo})} dispositivos "
+                  f"({', '.join(str(d) for d in sorted({a[1] for a in grupo}))})")
+        print(f"✅ {total} ocorrências de quedas simultâneas")
+    finally:
+        conn.close()
@@ -3,14 +3,37 @@
 CARGA DE DADOS NO BANCO
 """
 
-import mysql.connector
+import hashlib
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
 import pandas as pd
 from datetime import datetime
 from datetime import datetime
 
+# Permite importar os módulos do projeto ao executar como script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.barramento_eventos import BarramentoEventos
+from db.rollups import atualizar_rollups
+from db.incidentes import AgrupadorIncidentes
+from db.sessoes import atribuir_sessoes
+
+try:
+    import mysql.connector
+except ImportError:  # sem o conector só o banco local (conectar_banco_sqlite) funciona
+    mysql = None
+
+TRAVA_IDS_LEITURAS = 'sentinela_ids_leituras'
+
 
 def conectar_banco_mysql():
     """Conecta ao banco MySQL"""
+    if mysql is None:
+        raise ImportError("Conector MySQL não instalado: pip install mysql-connector-python")
     return mysql.connector.connect(
         host='localhost',
         port=3306,
@@ -19,6 +42,42 @@ def conectar_banco_mysql():
         database='sentinela'
     )
 
+class _CursorSqlite(sqlite3.Cursor):
+    """Cursor que aceita o placeholder %s do MySQL (mesmo SQL nos dois bancos)"""
+    
+    def execute(self, sql, parametros=()):
+        return super().execute(sql.replace('%s', '?'), parametros)
+    
+    def executemany(self, sql, parametros):
+        return super().executemany(sql.replace('%s', '?'), parametros)
+
+class _ConexaoSqlite(sqlite3.Connection):
+    def cursor(self, factory=_CursorSqlite):
+        return super().cursor(factory)
+    
+    def iniciar_escrita(self):
+        """Toma a trava de escrita do arquivo já no início da transação (BEGIN IMMEDIATE)"""
+        if not self.in_transaction:
+            self.execute("BEGIN IMMEDIATE")
+
+def conectar_banco_sqlite(caminho='sentinela.db'):
+    """
+    Banco SQLite local no lugar do MySQL (benchmarks, execução offline)
+    
+    Aceita o mesmo SQL com %s do restante do projeto; um arquivo novo (ou
+    ':memory:') recebe o schema de db/schema.sql e os índices parciais de
+    db/indices_parciais_sqlite.sql.
+    """
+    novo = caminho == ':memory:' or not os.path.exists(caminho)
+    # Espera pela trava de escrita tanto quanto trava_ids_leituras espera no MySQL
+    conn = sqlite3.connect(caminho, factory=_ConexaoSqlite, check_same_thread=False, timeout=30)
+    if novo:
+        for script in ('schema.sql', 'indices_parciais_sqlite.sql'):
+            with open(Path(__file__).resolve().parent / script, 'r') as f:
+                conn.executescript(f.read())
+        conn.commit()
+    return conn
+
 def criar_banco_sqlite():
     """Cria o banco SQLite e estrutura inicial"""
     conn = conectar_banco_mysql()
@@ -39,105 +98,278 @@ def criar_banco_sqlite():
     conn.commit()
     return conn
 
-def carregar_dados_csv(conn, csv_path='data/sample_data.csv'):
-    """Carrega dados do CSV para o banco"""
+def gravidade_queda(magnitude):
+    """Gravidade pela magnitude de pico do incidente (g)"""
+    if magnitude >= 3.0:
+        return 'grave'
+    if magnitude >= 2.0:
+        return 'moderada'
+    return 'leve'
+
+def registrar_incidentes(cursor, incidentes, id_evento):
+    """
+    Insere um evento de queda por incidente (db/incidentes.py) e um alerta
+    para os moderados/graves (id_alerta = id_evento)
+    
+    Não faz commit: as publicações retornadas devem ir ao barramento só
+    depois do commit de quem chamou.
+    
+    Returns:
+        list: publicações 'queda'/'alerta' para o barramento
+    """
+    publicacoes = []
+    for evento in incidentes:
+        magnitude = evento['magnitude_pico']
+        gravidade = gravidade_queda(magnitude)
+        
+        cursor.execute("""
+            INSERT INTO eventos_queda 
+            (id_evento, id_leitura, id_trabalhador, timestamp_queda, timestamp_fim_queda,
+             amostras_queda, magnitude_impacto, gravidade, status_atendimento, tempo_resposta_segundos)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'pendente', %s)
+        """, (id_evento, evento['id_leitura_pico'], evento['id_trabalhador'], evento['inicio_ms'],
+              evento['fim_ms'], evento['amostras'], magnitude, gravidade, 250))
+        
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        publicacoes.append({'tipo': 'queda', 'dados': {
+            'id_evento': id_evento,
+            'id_trabalhador': evento['id_trabalhador'],
+            'magnitude_impacto': magnitude,
+            'gravidade': gravidade,
+            'inicio_ms': evento['inicio_ms'],
+            'fim_ms': evento['fim_ms'],
+            'amostras': evento['amostras'],
+            'data_evento': agora
+        }})
+        
+        # Criar alerta para quedas graves
+        if gravidade in ['grave', 'moderada']:
+            nivel = 'critica' if gravidade == 'grave' else 'alta'
+            mensagem = (f'ALERTA: Queda detectada com magnitude {magnitude:.2f}g '
+                        f'({evento["amostras"]} amostras em {evento["fim_ms"] - evento["inicio_ms"]} ms)')
+            cursor.execute("""
+                INSERT INTO alertas 
+                (id_alerta, id_evento, tipo_alerta, nivel_prioridade, mensagem, enviado)
+                VALUES (%s, %s, 'queda', %s, %s, FALSE)
+            """, (id_evento, id_evento, nivel, mensagem))
+            
+            publicacoes.append({'tipo': 'alerta', 'dados': {
+                'id_alerta': id_evento,
+                'id_evento': id_evento,
+                'id_trabalhador': evento['id_trabalhador'],
+                'tipo_alerta': 'queda',
+                'nivel_prioridade': nivel,
+                'mensagem': mensagem,
+                'magnitude_impacto': magnitude,
+                'data_alerta': agora
+            }})
+        
+        id_evento += 1
+    
+    return publicacoes
+
+def _marca_carga_csv(csv_path):
+    """Nome em rollup_controle das linhas já carregadas de um CSV (VARCHAR(50))"""
+    caminho = str(Path(csv_path).resolve())
+    return f"carga_csv:{hashlib.sha1(caminho.encode('utf-8')).hexdigest()[:16]}"
+
+def carregar_dados_csv(conn, csv_path='data/sample_data.csv', barramento=None, intervalo_incidente_ms=1000):
+    """
+    Carrega dados do CSV para o banco e publica quedas/alertas no barramento
+    
+    Amostras de queda consecutivas do mesmo dispositivo (intervalo de até
+    `intervalo_incidente_ms`) viram um único evento e um único alerta.
+    
+    Só as linhas além das já carregadas deste arquivo são inseridas (marca
+    em rollup_controle), com ids alocados sob trava_ids_leituras: recarregar
+    um CSV que cresceu insere apenas o final novo. Qualquer falha desfaz a
+    carga inteira e é propagada.
+    
+    Retorna o número de leituras inseridas
+    """
     
     # Ler CSV
     df = pd.read_csv(csv_path)
     print(f"Lendo {len(df)} registros do CSV...")
+    df['Dispositivo'] = 1
+    df['Trabalhador'] = 1
     
     cursor = conn.cursor()
-    
-    # Inserir trabalhador e dispositivo padrão se não existirem
-    # cursor.execute("""
-    #     INSERT INTO trabalhadores (id_trabalhador, nome, matricula, setor) 
-    #     VALUES (1, 'João Silva', 'TRB001', 'Produção')
-    # """)
-    
-    # cursor.execute("""
-    #     INSERT INTO dispositivos (id_dispositivo, serial_number, modelo, status) 
-    #     VALUES (1, 'ESP32-WRB-001', 'ESP32-WROOM', 'ativo')
-    # """)
-    
-    # Inserir leituras
-    id_leitura = 1
+    marca = _marca_carga_csv(csv_path)
     eventos_queda = []
     
     try:
-        for idx, row in df.iterrows():
-            
-            queda_detectada = 1 if row['Queda'] == 1 else 0
+        with trava_ids_leituras(conn):
+            cursor.execute("SELECT ultimo_id FROM rollup_controle WHERE nome = %s", (marca,))
+            row = cursor.fetchone()
+            carregadas = int(row[0]) if row is not None else 0
+            if len(df) < carregadas:
+                raise ValueError(f"{csv_path} tem {len(df)} linhas, menos que as {carregadas} "
+                                 f"já carregadas: arquivo substituído, não estendido")
             
-            timestamp_ms = int(row['Timestamp(ms)'])
-            aceleracao_x = float(row['Ax(g)'])
-            aceleracao_y = float(row['Ay(g)'])
-            aceleracao_z = float(row['Az(g)'])
-            magnitude = float(row['Magnitude(g)'])
-            status_movimento = row['Status']
+            novas = df.iloc[carregadas:].reset_index(drop=True)
+            cursor.execute("SELECT COALESCE(MAX(id_leitura), 0) FROM leituras_sensores")
+            id_inicial = int(cursor.fetchone()[0]) + 1
             
-            try:
-                # MySQL usa %s como placeholder
-                cursor.execute("""
-                    INSERT INTO leituras_sensores 
-                    (id_leitura, id_trabalhador, id_dispositivo, timestamp_ms, 
-                    aceleracao_x, aceleracao_y, aceleracao_z, magnitude, 
-                    status_movimento, queda_detectada)
-                    VALUES (%s, 1, 1, %s, %s, %s, %s, %s, %s, %s)
-                """, (id_leitura, timestamp_ms, aceleracao_x, aceleracao_y, 
-                    aceleracao_z, magnitude, status_movimento, queda_detectada))
-            except mysql.connector.errors.IntegrityError as e:
-                print(f"Erro ao inserir leitura {id_leitura}: {e}")
-                continue
-
+            # Sessão de boot (alinhamento do millis()): a última linha foi gravada quando o arquivo foi salvo
+            registros = _registros_leituras(cursor, novas, id_inicial,
+                                            int(os.path.getmtime(csv_path) * 1000))
+            cursor.executemany("""
+                INSERT INTO leituras_sensores 
+                (id_leitura, id_trabalhador, id_dispositivo, id_sessao, timestamp_ms, 
+                aceleracao_x, aceleracao_y, aceleracao_z, magnitude, 
+                status_movimento, queda_detectada)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, registros)
             
+            # Amostras de queda são agrupadas em incidentes (um evento por incidente)
+            agrupador = AgrupadorIncidentes(intervalo_incidente_ms)
+            for id_leitura, timestamp_ms, magnitude, queda in zip(
+                    range(id_inicial, id_inicial + len(novas)),
+                    novas['Timestamp(ms)'].astype('int64').tolist(),
+                    novas['Magnitude(g)'].astype(float).tolist(),
+                    novas['Queda'].astype(int).tolist()):
+                if queda == 1:
+                    eventos_queda += agrupador.adicionar(1, 1, timestamp_ms, magnitude, id_leitura)
+                else:
+                    eventos_queda += agrupador.avancar(1, timestamp_ms)
+            eventos_queda += agrupador.finalizar()
             
+            cursor.execute("SELECT COALESCE(MAX(id_evento), 0) FROM eventos_queda")
+            publicacoes = registrar_incidentes(cursor, eventos_queda, id_evento=int(cursor.fetchone()[0]) + 1)
             
-            # Se foi queda, criar evento
-            if queda_detectada:
-                eventos_queda.append({
-                    'id_leitura': id_leitura,
-                    'timestamp': timestamp_ms,
-                    'magnitude': magnitude
-                })
-            
-            id_leitura += 1
-    except Exception as e:
-        print(f"Erro ao inserir leitura {id_leitura}: {e}")
-        
+            if row is None:
+                cursor.execute("INSERT INTO rollup_controle (nome, ultimo_id) VALUES (%s, %s)",
+                               (marca, len(df)))
+            else:
+                cursor.execute("UPDATE rollup_controle SET ultimo_id = %s WHERE nome = %s",
+                               (len(df), marca))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     
-    # Inserir eventos de queda
-    id_evento = 1
-    for evento in eventos_queda:
-        # Determinar gravidade baseado na magnitude
-        if evento['magnitude'] >= 3.0:
-            gravidade = 'grave'
-        elif evento['magnitude'] >= 2.0:
-            gravidade = 'moderada'
-        else:
-            gravidade = 'leve'
-        
-        cursor.execute("""
-            INSERT INTO eventos_queda 
-            (id_evento, id_leitura, id_trabalhador, timestamp_queda, 
-             magnitude_impacto, gravidade, status_atendimento, tempo_resposta_segundos)
-            VALUES (%s, %s, 1, %s, %s, %s, 'pendente', %s)
-        """, (id_evento, evento['id_leitura'], evento['timestamp'], 
-              evento['magnitude'], gravidade, 250))
+    atualizar_rollups(conn)
+    
+    # Notificar consumidores (dashboard, despachante) somente após o commit
+    publicado_em = datetime.now().isoformat(timespec='milliseconds')
+    for publicacao in publicacoes:
+        publicacao['publicado_em'] = publicado_em
+    (barramento or BarramentoEventos()).publicar_lote(publicacoes)
+    amostras = sum(evento['amostras'] for evento in eventos_queda)
+    print(f"✅ Carregados {len(novas)} leituras novas ({carregadas} já carregadas) e "
+          f"{len(eventos_queda)} eventos de queda ({amostras} amostras de queda agrupadas)")
+    return len(novas)
+
+SETORES_SIMULACAO = ['Produção', 'Manutenção', 'Logística', 'Almoxarifado', 'Expedição']
+
+def garantir_frota(conn, n_dispositivos, setores=SETORES_SIMULACAO):
+    """Garante trabalhadores e dispositivos 1..N para cargas simuladas"""
+    
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT id_trabalhador FROM trabalhadores")
+    existentes = {row[0] for row in cursor.fetchall()}
+    novos = [
+        (i, f'Trabalhador Simulado {i:05d}', f'SIM{i:05d}', setores[i % len(setores)])
+        for i in range(1, n_dispositivos + 1) if i not in existentes
+    ]
+    if novos:
+        cursor.executemany("""
+            INSERT INTO trabalhadores (id_trabalhador, nome, matricula, setor)
+            VALUES (%s, %s, %s, %s)
+        """, novos)
+    
+    cursor.execute("SELECT id_dispositivo FROM dispositivos")
+    existentes = {row[0] for row in cursor.fetchall()}
+    novos = [
+        (i, f'ESP32-SIM-{i:05d}', 'ESP32-WROOM', 'ativo')
+        for i in range(1, n_dispositivos + 1) if i not in existentes
+    ]
+    if novos:
+        cursor.executemany("""
+            INSERT INTO dispositivos (id_dispositivo, serial_number, modelo, status)
+            VALUES (%s, %s, %s, %s)
+        """, novos)
+    
+    conn.commit()
+
+@contextmanager
+def trava_ids_leituras(conn, timeout_s=30):
+    """
+    Serializa entre processos a alocação de ids (MAX + 1 de leituras e
+    sessões) até o commit: gateway, daemon e cargas gravam ao mesmo tempo
+    
+    No MySQL é uma trava nomeada (GET_LOCK); no SQLite local, a própria trava
+    de escrita do arquivo. Como os ids são confirmados em ordem, quem lê por
+    marca d'água (id_leitura > marca) não pula leituras confirmadas depois.
+    """
+    if hasattr(conn, 'iniciar_escrita'):
+        conn.iniciar_escrita()
+        yield
+        return
+    
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (TRAVA_IDS_LEITURAS, int(timeout_s)))
+    if cursor.fetchone()[0] != 1:
+        raise TimeoutError(f"trava {TRAVA_IDS_LEITURAS} não obtida em {timeout_s}s")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (TRAVA_IDS_LEITURAS,))
+        cursor.fetchone()
+
+def inserir_leituras_lote(conn, df, id_inicial=None, tamanho_lote=5000, recebido_em_ms=None):
+    """
+    Insere leituras em lote (executemany) a partir de um DataFrame no
+    formato do firmware com colunas 'Dispositivo' e 'Trabalhador'
+    
+    `recebido_em_ms` (epoch ms, único ou por leitura; padrão: agora) estima
+    a época de boot das sessões novas (db/sessoes.py)
+    
+    Ids alocados sob trava_ids_leituras (produtores concorrentes). Retorna o
+    próximo id_leitura livre
+    """
+    
+    cursor = conn.cursor()
+    
+    with trava_ids_leituras(conn):
+        if id_inicial is None:
+            cursor.execute("SELECT COALESCE(MAX(id_leitura), 0) FROM leituras_sensores")
+            id_inicial = cursor.fetchone()[0] + 1
         
-        # Criar alerta para quedas graves
-        if gravidade in ['grave', 'moderada']:
-            nivel = 'critica' if gravidade == 'grave' else 'alta'
-            cursor.execute("""
-                INSERT INTO alertas 
-                (id_alerta, id_evento, tipo_alerta, nivel_prioridade, mensagem, enviado)
-                VALUES (%s, %s, 'queda', %s, %s, FALSE)
-            """, (id_evento, id_evento, nivel, 
-                  f'ALERTA: Queda detectada com magnitude {evento["magnitude"]:.2f}g'))
+        registros = _registros_leituras(cursor, df, id_inicial, recebido_em_ms)
+        for i in range(0, len(registros), tamanho_lote):
+            cursor.executemany("""
+                INSERT INTO leituras_sensores 
+                (id_leitura, id_trabalhador, id_dispositivo, id_sessao, timestamp_ms, 
+                aceleracao_x, aceleracao_y, aceleracao_z, magnitude, 
+                status_movimento, queda_detectada)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, registros[i:i + tamanho_lote])
         
-        id_evento += 1
+        conn.commit()
     
-    conn.commit()
-    print(f"✅ Carregados {id_leitura-1} leituras e {len(eventos_queda)} eventos de queda")
+    atualizar_rollups(conn)
+    return id_inicial + len(registros)
+
+def _registros_leituras(cursor, df, id_inicial, recebido_em_ms):
+    """Tuplas do INSERT em leituras_sensores, com a sessão de boot de cada leitura"""
+    ids = range(id_inicial, id_inicial + len(df))
+    sessoes = atribuir_sessoes(cursor, df['Dispositivo'], df['Timestamp(ms)'], recebido_em_ms)
+    return list(zip(
+        ids,
+        df['Trabalhador'].astype(int).tolist(),
+        df['Dispositivo'].astype(int).tolist(),
+        sessoes.tolist(),
+        df['Timestamp(ms)'].astype('int64').tolist(),
+        df['Ax(g)'].astype(float).tolist(),
+        df['Ay(g)'].astype(float).tolist(),
+        df['Az(g)'].astype(float).tolist(),
+        df['Magnitude(g)'].astype(float).tolist(),
+        df['Status'].tolist(),
+        df['Queda'].astype(int).tolist()
+    ))
 
 def consultas_analise(conn):
     """Executa consultas para análise"""
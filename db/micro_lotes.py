@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+PIPELINE CONTÍNUO EM MICRO-LOTES (MODO DAEMON)
+
+A cada ciclo (período configurável):
+
+1. Ingere os CSVs novos da pasta de entrada (formato do firmware, colunas
+   opcionais 'Dispositivo' e 'Trabalhador') em leituras_sensores
+2. Pontua com o modelo atual as leituras acima da marca d'água do daemon -
+   inclusive as gravadas por outros produtores
+3. Agrupa as amostras sinalizadas (firmware ou modelo) em incidentes e grava
+   eventos/alertas, avançando a marca d'água na mesma transação
+4. Atualiza os rollups
+
+Contrapressão: um ciclo processa no máximo `limite` leituras. Se o ciclo
+passa do período, o próximo começa imediatamente (ciclos perdidos não se
+acumulam) e o limite cai pela metade; com folga, volta a crescer até o
+máximo. O que não coube fica para os ciclos seguintes (arquivos na pasta,
+leituras acima da marca d'água).
+
+O retreino roda em thread própria, em intervalo mais longo; o modelo novo é
+carregado no início do ciclo seguinte ao término do treino.
+
+SIGINT/SIGTERM terminam o ciclo em andamento, gravam os incidentes ainda
+abertos e aguardam o retreino em curso antes de sair.
+
+Executar: python pipeline.py --daemon [--periodo 5] [--intervalo-retreino 3600]
+"""
+
+import copy
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Permite importar os módulos do projeto ao executar como script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.barramento_eventos import BarramentoEventos
+from db.incidentes import AgrupadorIncidentes
+from db.load_data import inserir_leituras_lote, registrar_incidentes
+from db.rollups import atualizar_rollups
+from ml.train_model import criar_features_lote, pontuar_lote
+
+MARCA_DAEMON = 'daemon_incidentes'
+PASTA_ENTRADA = 'data/entrada'
+CAMINHO_MODELO = 'ml/fall_detection_model.pkl'
+CAMINHO_SCALER = 'ml/scaler.pkl'
+
+COLUNAS_LEITURA = ['id_leitura', 'id_dispositivo', 'id_trabalhador', 'timestamp_ms',
+                   'aceleracao_x', 'aceleracao_y', 'aceleracao_z', 'magnitude', 'queda_detectada']
+
+# Leituras anteriores mantidas por dispositivo para as janelas (rolling 5) das features
+CONTEXTO_FEATURES = 4
+LIMITE_MINIMO_CICLO = 1000
+
+
+class DaemonMicroLotes:
+    def __init__(self, conectar, pasta_entrada=PASTA_ENTRADA, periodo_s=5.0, max_leituras_ciclo=50_000,
+                 limiar=0.5, intervalo_incidente_ms=1000, intervalo_retreino_s=3600, retreinar=None,
+                 barramento=None):
+        """
+        Args:
+            conectar (callable): fábrica de conexões com o banco
+            pasta_entrada (str): pasta monitorada; processados vão para <pasta>/processados
+            periodo_s (float): duração alvo de um ciclo
+            max_leituras_ciclo (int): teto do limite adaptativo por ciclo
+            limiar (float): probabilidade do modelo a partir da qual a amostra é queda
+            intervalo_retreino_s (float): intervalo entre retreinos (0 = nunca)
+            retreinar (callable): executa o treino e salva o modelo (ex.: treinar_modelo_ml)
+        """
+        self.conectar = conectar
+        self.pasta_entrada = Path(pasta_entrada)
+        self.pasta_processados = self.pasta_entrada / 'processados'
+        self.periodo_s = periodo_s
+        self.max_leituras_ciclo = max_leituras_ciclo
+        self.limite = max_leituras_ciclo
+        self.limiar = limiar
+        self.intervalo_retreino_s = intervalo_retreino_s
+        self.retreinar = retreinar
+        self.barramento = barramento or BarramentoEventos()
+
+        self.agrupador = AgrupadorIncidentes(intervalo_incidente_ms)
+        self.contexto = None
+        self.modelo = self.scaler = None
+        self.versao_modelo = None
+        self.thread_retreino = None
+        self.ultimo_retreino = time.monotonic()
+        self.parar = threading.Event()
+        self.estatisticas = {'ciclos': 0, 'atrasados': 0, 'erros': 0, 'arquivos': 0, 'ingeridas': 0,
+                             'pontuadas': 0, 'eventos': 0, 'alertas': 0, 'retreinos': 0}
+
+    # ====== MODELO ======
+
+    def _carregar_modelo(self):
+        """(Re)carrega o modelo se o arquivo mudou e nenhum retreino está gravando"""
+        if self.thread_retreino is not None and self.thread_retreino.is_alive():
+            return
+        try:
+            versao = os.path.getmtime(CAMINHO_MODELO)
+        except OSError:
+            if self.versao_modelo is None and self.estatisticas['ciclos'] == 0:
+                print("   ⚠️ Modelo não encontrado: só a sinalização do firmware será usada")
+            return
+        if versao == self.versao_modelo:
+            return
+
+        import joblib
+
+        self.modelo = joblib.load(CAMINHO_MODELO)
+        self.scaler = joblib.load(CAMINHO_SCALER)
+        if self.versao_modelo is not None:
+            print("   🤖 Modelo retreinado carregado")
+        self.versao_modelo = versao
+
+    def _talvez_retreinar(self):
+        if not self.retreinar or not self.intervalo_retreino_s:
+            return
+        if self.thread_retreino is not None and self.thread_retreino.is_alive():
+            return
+        if time.monotonic() - self.ultimo_retreino < self.intervalo_retreino_s:
+            return
+
+        self.ultimo_retreino = time.monotonic()
+        self.estatisticas['retreinos'] += 1
+        self.thread_retreino = threading.Thread(target=self.retreinar, name='retreino', daemon=True)
+        self.thread_retreino.start()
+
+    # ====== CICLO ======
+
+    def ingerir_arquivos(self, conn):
+        """
+        Insere os CSVs da pasta de entrada (mais antigos primeiro) até o
+        limite do ciclo; cada arquivo vai para processados/ após o commit
+        (um arquivo interrompido no meio é reprocessado: pelo menos uma vez)
+
+        Returns:
+            int: leituras ingeridas
+        """
+        if not self.pasta_entrada.is_dir():
+            return 0
+
+        arquivos = sorted(self.pasta_entrada.glob('*.csv'), key=lambda a: a.stat().st_mtime)
+        ingeridas = 0
+        for arquivo in arquivos:
+            if ingeridas >= self.limite:
+                break
+            df = pd.read_csv(arquivo)
+            if 'Dispositivo' not in df.columns:
+                df['Dispositivo'] = 1
+            if 'Trabalhador' not in df.columns:
+                df['Trabalhador'] = 1
+            if 'Status' not in df.columns:
+                df['Status'] = 'NORMAL'
+
+            # Recepção de cada leitura (CSV de fallback do gateway); sem ela, a última
+            # linha foi gravada quando o arquivo foi salvo: estimativa da época de boot
+            if 'Recebido(ms)' in df.columns:
+                recebido_em_ms = df['Recebido(ms)'].to_numpy()
+            else:
+                recebido_em_ms = int(arquivo.stat().st_mtime * 1000)
+            inserir_leituras_lote(conn, df, recebido_em_ms=recebido_em_ms)
+            self.pasta_processados.mkdir(parents=True, exist_ok=True)
+            os.replace(arquivo, self.pasta_processados / arquivo.name)
+            ingeridas += len(df)
+            self.estatisticas['arquivos'] += 1
+
+        return ingeridas
+
+    def _marca_dagua(self, cursor):
+        """Marca d'água do daemon; na primeira execução começa nas leituras atuais"""
+        cursor.execute("SELECT ultimo_id FROM rollup_controle WHERE nome = %s", (MARCA_DAEMON,))
+        row = cursor.fetchone()
+        if row is not None:
+            return int(row[0])
+        cursor.execute("SELECT COALESCE(MAX(id_leitura), 0) FROM leituras_sensores")
+        inicial = int(cursor.fetchone()[0])
+        cursor.execute("INSERT INTO rollup_controle (nome, ultimo_id) VALUES (%s, %s)", (MARCA_DAEMON, inicial))
+        return inicial
+
+    def _sinalizar(self, df):
+        """Probabilidade do modelo e sinalização final de cada leitura nova"""
+        df['_contexto'] = False
+        if self.contexto is not None:
+            df = pd.concat([self.contexto.assign(_contexto=True), df], ignore_index=True)
+        df = criar_features_lote(df, coluna_grupo='id_dispositivo')
+        self.contexto = df.groupby('id_dispositivo').tail(CONTEXTO_FEATURES)[COLUNAS_LEITURA]
+        df = df[~df['_contexto']].reset_index(drop=True)
+
+        if self.modelo is not None:
+            df['probabilidade'] = pontuar_lote(self.modelo, self.scaler, df)
+        else:
+            df['probabilidade'] = 0.0
+        df['sinalizada'] = (df['queda_detectada'].fillna(0).astype(int) == 1) | (df['probabilidade'] >= self.limiar)
+        return df
+
+    def processar_pendentes(self, conn, finalizar=False):
+        """
+        Pontua as leituras acima da marca d'água e grava os incidentes encerrados
+
+        Returns:
+            tuple: (leituras pontuadas, eventos, alertas, backlog restante)
+        """
+        cursor = conn.cursor()
+        marca = self._marca_dagua(cursor)
+        df = pd.read_sql_query(f"""
+            SELECT {', '.join(COLUNAS_LEITURA)}
+            FROM leituras_sensores
+            WHERE id_leitura > %s
+            ORDER BY id_leitura
+            LIMIT %s
+        """, conn, params=(marca, int(self.limite)))
+
+        # Estado em memória restaurado se o ciclo falhar antes do commit
+        # (as mesmas leituras serão relidas no próximo ciclo)
+        abertos, contexto = copy.deepcopy(self.agrupador.abertos), self.contexto
+        try:
+            return self._registrar_lote(conn, cursor, df, marca, finalizar)
+        except Exception:
+            conn.rollback()
+            self.agrupador.abertos, self.contexto = abertos, contexto
+            raise
+
+    def _registrar_lote(self, conn, cursor, df, marca, finalizar):
+        encerrados = []
+        nova_marca = marca
+        if not df.empty:
+            df = self._sinalizar(df)
+            for linha in df.itertuples(index=False):
+                if linha.sinalizada:
+                    encerrados += self.agrupador.adicionar(int(linha.id_dispositivo), int(linha.id_trabalhador),
+                                                           int(linha.timestamp_ms), float(linha.magnitude),
+                                                           int(linha.id_leitura))
+                else:
+                    encerrados += self.agrupador.avancar(int(linha.id_dispositivo), int(linha.timestamp_ms))
+            nova_marca = int(df['id_leitura'].max())
+
+        if finalizar:
+            encerrados += self.agrupador.finalizar()
+        elif len(df) < self.limite:
+            # Lote completo até o fim: dispositivo sem amostras no ciclo encerra o incidente
+            ativos = set(df['id_dispositivo'].astype(int)) if not df.empty else set()
+            encerrados += self.agrupador.encerrar(set(self.agrupador.abertos) - ativos)
+
+        cursor.execute("SELECT COALESCE(MAX(id_evento), 0) FROM eventos_queda")
+        publicacoes = registrar_incidentes(cursor, encerrados, id_evento=int(cursor.fetchone()[0]) + 1)
+
+        # Compare-and-swap: outro daemon na mesma marca d'água faz este desistir
+        cursor.execute("""
+            UPDATE rollup_controle SET ultimo_id = %s
+            WHERE nome = %s AND ultimo_id = %s
+        """, (nova_marca, MARCA_DAEMON, marca))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            raise RuntimeError("marca d'água do daemon alterada por outro processo")
+        conn.commit()
+
+        if publicacoes:
+            self.barramento.publicar_lote(publicacoes)
+
+        cursor.execute("SELECT COALESCE(MAX(id_leitura), 0) FROM leituras_sensores")
+        backlog = int(cursor.fetchone()[0]) - nova_marca
+        alertas = sum(1 for p in publicacoes if p['tipo'] == 'alerta')
+        return len(df), len(encerrados), alertas, backlog
+
+    def ciclo(self, finalizar=False):
+        """Um micro-lote: ingestão, pontuação, eventos/alertas e rollups"""
+        conn = self.conectar()
+        try:
+            ingeridas = 0 if finalizar else self.ingerir_arquivos(conn)
+            pontuadas, eventos, alertas, backlog = self.processar_pendentes(conn, finalizar)
+            atualizar_rollups(conn)
+        finally:
+            conn.close()
+
+        for chave, valor in (('ingeridas', ingeridas), ('pontuadas', pontuadas),
+                             ('eventos', eventos), ('alertas', alertas)):
+            self.estatisticas[chave] += valor
+        return {'ingeridas': ingeridas, 'pontuadas': pontuadas, 'eventos': eventos,
+                'alertas': alertas, 'backlog': backlog}
+
+    def _ajustar_limite(self, duracao):
+        """Contrapressão: reduz o lote em ciclos atrasados, aumenta com folga"""
+        if duracao > self.periodo_s:
+            self.estatisticas['atrasados'] += 1
+            self.limite = max(LIMITE_MINIMO_CICLO, self.limite // 2)
+            print(f"   ⚠️ Ciclo de {duracao:.2f}s passou do período ({self.periodo_s:.2f}s): "
+                  f"lote reduzido para {self.limite:,} leituras")
+        elif duracao < self.periodo_s / 2 and self.limite < self.max_leituras_ciclo:
+            self.limite = min(self.max_leituras_ciclo, int(self.limite * 1.5))
+
+    def _instalar_sinais(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sinal, lambda *_: self.parar.set())
+
+    def executar(self, max_ciclos=None):
+        """Laço de micro-lotes até SIGINT/SIGTERM (ou max_ciclos)"""
+        self._instalar_sinais()
+        
+        # Marca d'água criada antes da primeira ingestão (senão as leituras
+        # ingeridas no primeiro ciclo ficariam abaixo dela)
+        conn = self.conectar()
+        try:
+            self._marca_dagua(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        
+        print(f"🔁 Daemon iniciado: período {self.periodo_s:.1f}s, até {self.max_leituras_ciclo:,} "
+              f"leituras/ciclo, pasta {self.pasta_entrada}/")
+
+        while not self.parar.is_set():
+            inicio = time.monotonic()
+            try:
+                self._carregar_modelo()
+                self._talvez_retreinar()
+                resumo = self.ciclo()
+                self.estatisticas['ciclos'] += 1
+                if resumo['ingeridas'] or resumo['pontuadas'] or resumo['eventos']:
+                    print(f"   ciclo {self.estatisticas['ciclos']}: +{resumo['ingeridas']} ingeridas, "
+                          f"{resumo['pontuadas']} pontuadas, {resumo['eventos']} eventos, "
+                          f"{resumo['alertas']} alertas, backlog {resumo['backlog']:,} "
+                          f"({time.monotonic() - inicio:.2f}s)")
+            except Exception as e:
+                self.estatisticas['erros'] += 1
+                print(f"   ❌ Erro no ciclo: {e}")
+
+            self._ajustar_limite(time.monotonic() - inicio)
+            if max_ciclos is not None and self.estatisticas['ciclos'] >= max_ciclos:
+                break
+            self.parar.wait(max(0.0, self.periodo_s - (time.monotonic() - inicio)))
+
+        self.encerrar()
+        return self.estatisticas
+
+    def encerrar(self):
+        """Grava os incidentes abertos e espera o retreino em curso"""
+        print("\n🛑 Encerrando daemon...")
+        try:
+            resumo = self.ciclo(finalizar=True)
+            if resumo['eventos']:
+                print(f"   ✓ {resumo['eventos']} incidentes abertos gravados")
+        except Exception as e:
+            print(f"   ❌ Erro ao gravar incidentes abertos: {e}")
+
+        if self.thread_retreino is not None and self.thread_retreino.is_alive():
+            print("   ⏳ Aguardando o retreino em andamento...")
+            self.thread_retreino.join()
+
+        e = self.estatisticas
+        print(f"   ✓ {e['ciclos']} ciclos ({e['atrasados']} atrasados, {e['erros']} com erro), "
+              f"{e['arquivos']} arquivos, {e['ingeridas']:,} leituras ingeridas, {e['pontuadas']:,} pontuadas, "
+              f"{e['eventos']} eventos, {e['alertas']} alertas, {e['retreinos']} retreinos")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+ROLLUPS DE LEITURAS (PRÉ-AGREGAÇÃO)
+
+Mantém as tabelas de rollup atualizadas de forma incremental: a cada
+chamada só são lidas as leituras com id_leitura acima da marca d'água de
+cada rollup em rollup_controle.
+
+- rollup_leituras_minuto: por minuto e status (KPIs do dashboard)
+- rollup_trabalhador_hora + ultima_leitura_trabalhador: por trabalhador e
+  hora, e último contato de cada trabalhador (página da frota)
+
+O dashboard consulta os rollups em vez de varrer leituras_sensores, então o
+custo depende do número de minutos/trabalhadores, não do volume de leituras.
+
+Executar: python db/rollups.py [--reconstruir]
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ROLLUP_LEITURAS = 'leituras_minuto'
+ROLLUP_TRABALHADORES = 'trabalhador_hora'
+
+
+def _marca_dagua(cursor, nome):
+    cursor.execute("SELECT ultimo_id FROM rollup_controle WHERE nome = %s", (nome,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute("INSERT INTO rollup_controle (nome, ultimo_id) VALUES (%s, 0)", (nome,))
+        return 0
+    return int(row[0])
+
+
+def agregar_por_minuto(df):
+    """Leituras -> agregados por (minuto, status_movimento)"""
+    df = df.copy()
+    df['minuto'] = (pd.to_datetime(df['data_registro']).fillna(pd.Timestamp.now())
+                    .dt.floor('min').dt.strftime('%Y-%m-%d %H:%M:%S'))
+    df['magnitude'] = df['magnitude'].astype(float)
+    df['queda_detectada'] = df['queda_detectada'].fillna(0).astype(int)
+    return df.groupby(['minuto', 'status_movimento'], as_index=False).agg(
+        total_leituras=('magnitude', 'size'),
+        amostras_queda=('queda_detectada', 'sum'),
+        soma_magnitude=('magnitude', 'sum'),
+        magnitude_maxima=('magnitude', 'max')
+    )
+
+
+def _aplicar_agregados(cursor, agregados):
+    """Soma os agregados às linhas existentes do rollup (ou insere as novas)"""
+    for linha in agregados.itertuples(index=False):
+        total, quedas = int(linha.total_leituras), int(linha.amostras_queda)
+        soma, maxima = float(linha.soma_magnitude), float(linha.magnitude_maxima)
+        cursor.execute("""
+            UPDATE rollup_leituras_minuto
+            SET total_leituras = total_leituras + %s,
+                amostras_queda = amostras_queda + %s,
+                soma_magnitude = soma_magnitude + %s,
+                magnitude_maxima = CASE WHEN magnitude_maxima < %s THEN %s ELSE magnitude_maxima END
+            WHERE minuto = %s AND status_movimento = %s
+        """, (total, quedas, soma, maxima, maxima, linha.minuto, linha.status_movimento))
+        if cursor.rowcount == 0:
+            cursor.execute("""
+                INSERT INTO rollup_leituras_minuto
+                (minuto, status_movimento, total_leituras, amostras_queda, soma_magnitude, magnitude_maxima)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (linha.minuto, linha.status_movimento, total, quedas, soma, maxima))
+
+
+def agregar_por_trabalhador(df):
+    """Leituras -> agregados por (id_trabalhador, hora)"""
+    df = df[df['id_trabalhador'].notna()].copy()
+    df['data_registro'] = pd.to_datetime(df['data_registro']).fillna(pd.Timestamp.now())
+    df['hora'] = df['data_registro'].dt.floor('h').dt.strftime('%Y-%m-%d %H:%M:%S')
+    df['magnitude'] = df['magnitude'].astype(float)
+    df['queda_detectada'] = df['queda_detectada'].fillna(0).astype(int)
+    agregados = df.groupby(['id_trabalhador', 'hora'], as_index=False).agg(
+        total_leituras=('magnitude', 'size'),
+        amostras_queda=('queda_detectada', 'sum'),
+        soma_magnitude=('magnitude', 'sum'),
+        magnitude_maxima=('magnitude', 'max'),
+        ultima_leitura=('data_registro', 'max')
+    )
+    agregados['ultima_leitura'] = agregados['ultima_leitura'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return agregados
+
+
+def _aplicar_agregados_trabalhador(cursor, agregados):
+    """Soma os agregados por trabalhador/hora e atualiza o último contato"""
+    for linha in agregados.itertuples(index=False):
+        id_trabalhador = int(linha.id_trabalhador)
+        total, quedas = int(linha.total_leituras), int(linha.amostras_queda)
+        soma, maxima = float(linha.soma_magnitude), float(linha.magnitude_maxima)
+        cursor.execute("""
+            UPDATE rollup_trabalhador_hora
+            SET total_leituras = total_leituras + %s,
+                amostras_queda = amostras_queda + %s,
+                soma_magnitude = soma_magnitude + %s,
+                magnitude_maxima = CASE WHEN magnitude_maxima < %s THEN %s ELSE magnitude_maxima END
+            WHERE id_trabalhador = %s AND hora = %s
+        """, (total, quedas, soma, maxima, maxima, id_trabalhador, linha.hora))
+        if cursor.rowcount == 0:
+            cursor.execute("""
+                INSERT INTO rollup_trabalhador_hora
+                (id_trabalhador, hora, total_leituras, amostras_queda, soma_magnitude, magnitude_maxima)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (id_trabalhador, linha.hora, total, quedas, soma, maxima))
+
+    ultimas = agregados.groupby('id_trabalhador')['ultima_leitura'].max()
+    for id_trabalhador, ultima in ultimas.items():
+        cursor.execute("""
+            UPDATE ultima_leitura_trabalhador
+            SET ultima_leitura = %s
+            WHERE id_trabalhador = %s AND ultima_leitura < %s
+        """, (ultima, int(id_trabalhador), ultima))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM ultima_leitura_trabalhador WHERE id_trabalhador = %s",
+                           (int(id_trabalhador),))
+            if cursor.fetchone() is None:
+                cursor.execute("""
+                    INSERT INTO ultima_leitura_trabalhador (id_trabalhador, ultima_leitura)
+                    VALUES (%s, %s)
+                """, (int(id_trabalhador), ultima))
+
+
+# Rollups mantidos: nome -> (colunas lidas, agregação, aplicação, tabelas)
+ROLLUPS = {
+    ROLLUP_LEITURAS: (
+        'data_registro, status_movimento, magnitude, queda_detectada',
+        agregar_por_minuto, _aplicar_agregados,
+        ['rollup_leituras_minuto']
+    ),
+    ROLLUP_TRABALHADORES: (
+        'id_trabalhador, data_registro, magnitude, queda_detectada',
+        agregar_por_trabalhador, _aplicar_agregados_trabalhador,
+        ['rollup_trabalhador_hora', 'ultima_leitura_trabalhador']
+    ),
+}
+
+
+def _atualizar_rollup(conn, nome, tamanho_lote):
+    colunas, agregar, aplicar, _ = ROLLUPS[nome]
+    cursor = conn.cursor()
+    processadas = 0
+
+    while True:
+        ultimo_id = _marca_dagua(cursor, nome)
+        df = pd.read_sql_query(f"""
+            SELECT id_leitura, {colunas}
+            FROM leituras_sensores
+            WHERE id_leitura > %s
+            ORDER BY id_leitura
+            LIMIT %s
+        """, conn, params=(ultimo_id, int(tamanho_lote)))
+
+        if df.empty:
+            conn.commit()
+            break
+
+        cursor.execute("""
+            UPDATE rollup_controle SET ultimo_id = %s
+            WHERE nome = %s AND ultimo_id = %s
+        """, (int(df['id_leitura'].max()), nome, ultimo_id))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            break
+
+        aplicar(cursor, agregar(df))
+        conn.commit()
+        processadas += len(df)
+
+        if len(df) < tamanho_lote:
+            break
+
+    return processadas
+
+
+def atualizar_rollups(conn, tamanho_lote=100_000):
+    """
+    Incorpora aos rollups as leituras novas desde a última atualização
+
+    Seguro com vários processos (ingestão, dashboard): a marca d'água é
+    avançada com compare-and-swap na mesma transação dos agregados - se
+    outro processo avançou antes, este desiste sem contar duas vezes.
+
+    Returns:
+        dict: Leituras incorporadas por rollup
+    """
+    return {nome: _atualizar_rollup(conn, nome, tamanho_lote) for nome in ROLLUPS}
+
+
+def reconstruir_rollups(conn):
+    """Apaga e recalcula os rollups a partir de todas as leituras"""
+    cursor = conn.cursor()
+    for nome, (_, _, _, tabelas) in ROLLUPS.items():
+        for tabela in tabelas:
+            cursor.execute(f"DELETE FROM {tabela}")
+        cursor.execute("DELETE FROM rollup_controle WHERE nome = %s", (nome,))
+    conn.commit()
+    return atualizar_rollups(conn)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from db.load_data import conectar_banco_mysql
+
+    conn = conectar_banco_mysql()
+    if '--reconstruir' in sys.argv:
+        print("🔄 Reconstruindo rollups...")
+        totais = reconstruir_rollups(conn)
+    else:
+        totais = atualizar_rollups(conn)
+    conn.close()
+    for nome, total in totais.items():
+        print(f"✅ {nome}: {total} leituras incorporadas")
@@ -20,11 +20,23 @@ CREATE TABLE dispositivos (
     data_instalacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Sessões de boot: época (epoch ms) em que o millis() de cada dispositivo valia 0 (ver db/sessoes.py)
+CREATE TABLE sessoes_boot (
+    id_sessao INTEGER PRIMARY KEY,
+    id_dispositivo INTEGER NOT NULL,
+    epoch_boot_ms BIGINT NOT NULL,
+    timestamp_inicio_ms BIGINT NOT NULL,
+    timestamp_fim_ms BIGINT NOT NULL,
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_dispositivo) REFERENCES dispositivos(id_dispositivo)
+);
+
 -- Tabela de Leituras dos Sensores
 CREATE TABLE leituras_sensores (
     id_leitura INTEGER PRIMARY KEY,
     id_trabalhador INTEGER,
     id_dispositivo INTEGER,
+    id_sessao INTEGER,
     timestamp_ms BIGINT NOT NULL,
     aceleracao_x DECIMAL(10,3),
     aceleracao_y DECIMAL(10,3),
@@ -34,7 +46,8 @@ CREATE TABLE leituras_sensores (
     queda_detectada BOOLEAN DEFAULT FALSE,
     data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (id_trabalhador) REFERENCES trabalhadores(id_trabalhador),
-    FOREIGN KEY (id_dispositivo) REFERENCES dispositivos(id_dispositivo)
+    FOREIGN KEY (id_dispositivo) REFERENCES dispositivos(id_dispositivo),
+    FOREIGN KEY (id_sessao) REFERENCES sessoes_boot(id_sessao)
 );
 
 -- Tabela de Eventos de Queda
@@ -43,6 +56,8 @@ CREATE TABLE eventos_queda (
     id_leitura INTEGER,
     id_trabalhador INTEGER,
     timestamp_queda BIGINT NOT NULL,
+    timestamp_fim_queda BIGINT,
+    amostras_queda INTEGER DEFAULT 1,
     magnitude_impacto DECIMAL(10,3),
     localizacao VARCHAR(100),
     gravidade VARCHAR(20) CHECK (gravidade IN ('leve', 'moderada', 'grave')),
@@ -65,12 +80,94 @@ CREATE TABLE alertas (
     FOREIGN KEY (id_evento) REFERENCES eventos_queda(id_evento)
 );
 
--- Índices para otimização de consultas
-CREATE INDEX idx_leituras_timestamp ON leituras_sensores(timestamp_ms);
+-- Rollup de leituras por minuto e status (KPIs do dashboard, ver db/rollups.py)
+CREATE TABLE rollup_leituras_minuto (
+    minuto TIMESTAMP NOT NULL,
+    status_movimento VARCHAR(20) NOT NULL,
+    total_leituras INTEGER NOT NULL,
+    amostras_queda INTEGER NOT NULL,
+    soma_magnitude DOUBLE PRECISION NOT NULL,
+    magnitude_maxima DECIMAL(10,3),
+    PRIMARY KEY (minuto, status_movimento)
+);
+
+-- Rollup por trabalhador e hora (página da frota)
+CREATE TABLE rollup_trabalhador_hora (
+    id_trabalhador INTEGER NOT NULL,
+    hora TIMESTAMP NOT NULL,
+    total_leituras INTEGER NOT NULL,
+    amostras_queda INTEGER NOT NULL,
+    soma_magnitude DOUBLE PRECISION NOT NULL,
+    magnitude_maxima DECIMAL(10,3),
+    PRIMARY KEY (id_trabalhador, hora),
+    FOREIGN KEY (id_trabalhador) REFERENCES trabalhadores(id_trabalhador)
+);
+
+-- Último contato de cada trabalhador (uma linha por trabalhador)
+CREATE TABLE ultima_leitura_trabalhador (
+    id_trabalhador INTEGER PRIMARY KEY,
+    ultima_leitura TIMESTAMP NOT NULL,
+    FOREIGN KEY (id_trabalhador) REFERENCES trabalhadores(id_trabalhador)
+);
+
+-- Marca d'água (último id_leitura incorporado) de cada rollup
+CREATE TABLE rollup_controle (
+    nome VARCHAR(50) PRIMARY KEY,
+    ultimo_id BIGINT NOT NULL
+);
+
+-- Índices para otimização de consultas (planos conferidos por benchmarks/planos_consultas.py;
+-- os índices parciais, só no SQLite, estão em db/indices_parciais_sqlite.sql)
+
+-- Série de magnitude do dashboard (ORDER BY timestamp_ms DESC LIMIT): cobrindo, sem ler a tabela
+CREATE INDEX idx_leituras_timestamp_serie ON leituras_sensores(timestamp_ms, magnitude, queda_detectada);
+-- Últimas leituras de um trabalhador (ORDER BY id_leitura DESC: a chave primária completa o índice)
 CREATE INDEX idx_leituras_trabalhador ON leituras_sensores(id_trabalhador);
+-- vw_leituras_criticas (queda_detectada OR magnitude > 2.0): união dos dois índices
 CREATE INDEX idx_leituras_queda ON leituras_sensores(queda_detectada);
-CREATE INDEX idx_eventos_timestamp ON eventos_queda(timestamp_queda);
-CREATE INDEX idx_alertas_prioridade ON alertas(nivel_prioridade);
+CREATE INDEX idx_leituras_magnitude ON leituras_sensores(magnitude);
+-- Histórico de eventos sem filtros (ORDER BY timestamp_queda DESC, id_evento DESC + keyset)
+CREATE INDEX idx_eventos_timestamp_id ON eventos_queda(timestamp_queda, id_evento);
+-- Relatório de alertas (nivel_prioridade IN (...) ORDER BY data_alerta)
+CREATE INDEX idx_alertas_prioridade_data ON alertas(nivel_prioridade, data_alerta);
+
+-- Histórico de eventos no dashboard: filtros + paginação por keyset
+CREATE INDEX idx_eventos_gravidade_status_ts ON eventos_queda(gravidade, status_atendimento, timestamp_queda, id_evento);
+CREATE INDEX idx_eventos_gravidade_ts ON eventos_queda(gravidade, timestamp_queda, id_evento);
+CREATE INDEX idx_eventos_status_ts ON eventos_queda(status_atendimento, timestamp_queda, id_evento);
+CREATE INDEX idx_eventos_gravidade_tempo ON eventos_queda(gravidade, tempo_resposta_segundos);
+
+-- KPIs do dashboard por janela de tempo
+CREATE INDEX idx_eventos_data ON eventos_queda(data_evento);
+-- Pendentes por prioridade (KPI de críticos, vw_alertas_pendentes ORDER BY data_alerta;
+-- a fila do despachante ordena os pendentes, poucos, pela prioridade em CASE)
+CREATE INDEX idx_alertas_pendentes ON alertas(enviado, nivel_prioridade, data_alerta);
+
+-- Página da frota: janela por hora (cobrindo) e detalhe por trabalhador
+CREATE INDEX idx_rollup_trabalhador_janela ON rollup_trabalhador_hora(hora, id_trabalhador, total_leituras, amostras_queda, magnitude_maxima);
+CREATE INDEX idx_eventos_data_trabalhador ON eventos_queda(data_evento, id_trabalhador);
+CREATE INDEX idx_eventos_trabalhador_ts ON eventos_queda(id_trabalhador, timestamp_queda);
+CREATE INDEX idx_trabalhadores_setor ON trabalhadores(setor, id_trabalhador);
+
+-- Linha do tempo da frota: leituras de cada dispositivo em ordem (sessão, millis) com keyset
+CREATE INDEX idx_leituras_dispositivo_sessao_ts ON leituras_sensores(id_dispositivo, id_sessao, timestamp_ms, id_leitura);
+CREATE INDEX idx_sessoes_dispositivo ON sessoes_boot(id_dispositivo, id_sessao);
+
+-- Bancos criados antes do agrupamento de incidentes (db/incidentes.py):
+-- ALTER TABLE eventos_queda ADD COLUMN timestamp_fim_queda BIGINT;
+-- ALTER TABLE eventos_queda ADD COLUMN amostras_queda INTEGER DEFAULT 1;
+
+-- Bancos criados antes das sessões de boot: crie sessoes_boot e os índices acima e
+-- ALTER TABLE leituras_sensores ADD COLUMN id_sessao INTEGER;
+-- depois alinhe as leituras existentes com: python db/sessoes.py
+
+-- Bancos criados antes do conjunto de índices compostos/cobrindo:
+-- DROP INDEX idx_leituras_timestamp ON leituras_sensores;
+-- DROP INDEX idx_eventos_timestamp ON eventos_queda;
+-- DROP INDEX idx_alertas_prioridade ON alertas;
+-- DROP INDEX idx_alertas_pendentes ON alertas;
+-- e crie idx_leituras_timestamp_serie, idx_leituras_magnitude, idx_eventos_timestamp_id,
+-- idx_alertas_prioridade_data e idx_alertas_pendentes como acima
 
 -- =====================================================
 -- SCRIPT DE CARGA DE DADOS DE EXEMPLO
@@ -88,6 +185,8 @@ INSERT INTO dispositivos (id_dispositivo, serial_number, modelo, status) VALUES
 (2, 'ESP32-WRB-002', 'ESP32-WROOM', 'ativo'),
 (3, 'ESP32-WRB-003', 'ESP32-WROOM', 'manutencao');
 
+INSERT INTO rollup_controle (nome, ultimo_id) VALUES ('leituras_minuto', 0), ('trabalhador_hora', 0);
+
 -- Consultas úteis para análise
 -- 1. Total de quedas por trabalhador
 CREATE VIEW vw_quedas_por_trabalhador AS
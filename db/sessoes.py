@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+SESSÕES DE BOOT DOS DISPOSITIVOS (ALINHAMENTO DE RELÓGIO)
+
+timestamp_ms é o millis() do ESP32 desde o boot, então leituras de
+dispositivos diferentes (ou de antes e depois de um reinício) não são
+comparáveis. Cada trecho contínuo de leituras de um dispositivo pertence a
+uma sessão de boot (sessoes_boot) com a época do boot:
+
+    epoch_ms = epoch_boot_ms + timestamp_ms   (epoch Unix em ms)
+
+- Sessão nova: primeiro contato do dispositivo ou millis() mais de
+  TOLERANCIA_REORDENACAO_MS abaixo do anterior (reinício); recuos menores
+  são leituras fora de ordem (ex.: datagramas UDP trocados), não reinícios
+- A época é estimada na ingestão supondo que a última leitura do trecho
+  chegou em `recebido_em_ms` (erro = atraso de entrega). Uma sessão que
+  continua mantém a época original; um trecho encerrado por reinício no
+  mesmo lote termina no início do trecho seguinte (reinício instantâneo)
+- A deriva do cristal do ESP32 não é corrigida
+
+Executar: python db/sessoes.py   (alinha as leituras gravadas antes das sessões)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Recuo máximo do millis() tratado como reordenação na entrega (UDP, reenvios);
+# um reinício com menos tempo de atividade que isso não é detectado
+TOLERANCIA_REORDENACAO_MS = 5000
+
+
+def _ultimas_sessoes(cursor, dispositivos):
+    """
+    id_dispositivo -> (id_sessao, timestamp_fim_ms) da sessão mais recente no
+    tempo real (não a de maior id: backfill e CSV antigo criam sessões
+    antigas com ids novos)
+    """
+    if not dispositivos:
+        return {}
+    placeholders = ', '.join(['%s'] * len(dispositivos))
+    cursor.execute(f"""
+        SELECT s.id_dispositivo, s.id_sessao, s.timestamp_fim_ms
+        FROM sessoes_boot s
+        JOIN (
+            SELECT id_dispositivo, MAX(epoch_boot_ms + timestamp_inicio_ms) AS inicio
+            FROM sessoes_boot
+            WHERE id_dispositivo IN ({placeholders})
+            GROUP BY id_dispositivo
+        ) ultima ON ultima.id_dispositivo = s.id_dispositivo
+                AND ultima.inicio = s.epoch_boot_ms + s.timestamp_inicio_ms
+        ORDER BY s.id_sessao
+    """, [int(d) for d in dispositivos])
+    # Empate no início: vale a de maior id (a última da ordenação)
+    return {int(d): (int(id_sessao), int(fim)) for d, id_sessao, fim in cursor.fetchall()}
+
+
+def _trechos(timestamps):
+    """Limites (início, fim) dos trechos sem reinício (millis() não recua além da tolerância)"""
+    quebras = (np.flatnonzero(np.diff(timestamps) < -TOLERANCIA_REORDENACAO_MS) + 1).tolist()
+    limites = [0] + quebras + [len(timestamps)]
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def atribuir_sessoes(cursor, dispositivos, timestamps, recebido_em_ms=None):
+    """
+    Sessão de boot de cada leitura; cria/estende as sessões (sem commit)
+
+    Args:
+        dispositivos, timestamps: id_dispositivo e millis() de cada leitura,
+            na ordem de chegada de cada dispositivo
+        recebido_em_ms: instante de recepção (epoch ms), único ou por leitura;
+            padrão: agora
+
+    Returns:
+        ndarray: id_sessao de cada leitura
+    """
+    dispositivos = np.asarray(dispositivos, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if recebido_em_ms is None:
+        recebido_em_ms = int(time.time() * 1000)
+    recebido = np.broadcast_to(np.asarray(recebido_em_ms, dtype=np.int64), timestamps.shape)
+
+    sessoes = np.empty(len(timestamps), dtype=np.int64)
+    grupos = pd.Series(np.arange(len(dispositivos))).groupby(dispositivos, sort=False).indices
+    ultimas = _ultimas_sessoes(cursor, [int(d) for d in grupos])
+
+    cursor.execute("SELECT COALESCE(MAX(id_sessao), 0) FROM sessoes_boot")
+    proximo_id = int(cursor.fetchone()[0]) + 1
+    novas = []
+    estendidas = []
+
+    for dispositivo, posicoes in grupos.items():
+        dispositivo = int(dispositivo)
+        ts = timestamps[posicoes]
+        trechos = _trechos(ts)
+        ultima = ultimas.get(dispositivo)
+        continua = ultima is not None and ts[0] >= ultima[1] - TOLERANCIA_REORDENACAO_MS
+        # Com leituras fora de ordem o trecho começa no menor e termina no maior millis()
+        minimos = [int(ts[inicio:fim].min()) for inicio, fim in trechos]
+        maximos = [int(ts[inicio:fim].max()) for inicio, fim in trechos]
+
+        # Épocas de trás para frente: cada trecho termina quando o seguinte começa
+        epocas = [0] * len(trechos)
+        for k in range(len(trechos) - 1, -1, -1):
+            fim = trechos[k][1]
+            if k == len(trechos) - 1:
+                epocas[k] = int(recebido[posicoes[fim - 1]]) - int(ts[fim - 1])
+            else:
+                epocas[k] = epocas[k + 1] + minimos[k + 1] - maximos[k]
+
+        for k, (inicio, fim) in enumerate(trechos):
+            if k == 0 and continua:
+                id_sessao = ultima[0]
+                estendidas.append((max(maximos[k], ultima[1]), id_sessao))
+            else:
+                id_sessao = proximo_id
+                proximo_id += 1
+                novas.append((id_sessao, dispositivo, epocas[k], minimos[k], maximos[k]))
+            sessoes[posicoes[inicio:fim]] = id_sessao
+
+    if novas:
+        cursor.executemany("""
+            INSERT INTO sessoes_boot (id_sessao, id_dispositivo, epoch_boot_ms, timestamp_inicio_ms, timestamp_fim_ms)
+            VALUES (%s, %s, %s, %s, %s)
+        """, novas)
+    if estendidas:
+        cursor.executemany("""
+            UPDATE sessoes_boot SET timestamp_fim_ms = %s WHERE id_sessao = %s
+        """, estendidas)
+
+    return sessoes
+
+
+def alinhar_leituras_sem_sessao(conn, tamanho_lote=100_000):
+    """
+    Atribui sessões às leituras gravadas antes de sessoes_boot existir,
+    usando data_registro como instante de recepção
+
+    Returns:
+        int: leituras alinhadas
+    """
+    cursor = conn.cursor()
+    alinhadas = 0
+    ultimo_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id_leitura, id_dispositivo, timestamp_ms, data_registro
+            FROM leituras_sensores
+            WHERE id_sessao IS NULL AND id_dispositivo IS NOT NULL AND id_leitura > %s
+            ORDER BY id_leitura
+            LIMIT %s
+        """, (ultimo_id, int(tamanho_lote)))
+        df = pd.DataFrame(cursor.fetchall(),
+                          columns=['id_leitura', 'id_dispositivo', 'timestamp_ms', 'data_registro'])
+        if df.empty:
+            break
+
+        recebido = pd.to_datetime(df['data_registro']).fillna(pd.Timestamp.now())
+        recebido_ms = recebido.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        sessoes = atribuir_sessoes(cursor, df['id_dispositivo'], df['timestamp_ms'], recebido_ms)
+        cursor.executemany("UPDATE leituras_sensores SET id_sessao = %s WHERE id_leitura = %s",
+                           list(zip(sessoes.tolist(), df['id_leitura'].astype(int).tolist())))
+        conn.commit()
+
+        alinhadas += len(df)
+        ultimo_id = int(df['id_leitura'].iloc[-1])
+    return alinhadas
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from db.load_data import conectar_banco_mysql
+
+    conn = conectar_banco_mysql()
+    try:
+        print(f"🕒 Leituras alinhadas a sessões de boot: {alinhar_leituras_sem_sessao(conn):,}")
+    finally:
+        conn.close()
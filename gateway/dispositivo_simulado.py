@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+DISPOSITIVOS SIMULADOS - TESTE DE CARGA DO GATEWAY
+
+Abre uma conexão por dispositivo simulado (ESP32-SIM-00001..N, os seriais
+cadastrados por garantir_frota / `gateway/servidor.py --frota N`) e envia
+leituras no formato do firmware: repouso, movimento e, de vez em quando,
+uma queda (queda livre seguida de impacto).
+
+- TCP (texto ou quadros binários) ou UDP (um socket compartilhado; cada
+  datagrama leva o serial)
+- `--taxa` amostras/s por dispositivo, enviadas em blocos de
+  `--amostras-por-envio`; `--sem-pausa` envia o mais rápido possível
+  (mede a vazão máxima do gateway)
+- As aberturas de conexão são espalhadas ao longo de `--rampa` segundos
+
+Milhares de conexões exigem descritores suficientes (ex.: ulimit -n 65536)
+nos dois processos.
+
+Executar: python gateway/dispositivo_simulado.py --dispositivos 1000 --segundos 30 [--formato binario]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import sys
+import time
+from pathlib import Path
+
+# Permite importar os módulos do projeto ao executar como script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gateway.protocolo import datagrama, formatar_linha, formatar_quadro, saudacao
+
+
+class SinalSimulado:
+    """Gera as leituras de um dispositivo, com o millis() desde o boot"""
+
+    def __init__(self, taxa_hz, quedas_por_hora, semente):
+        self.rng = random.Random(semente)
+        self.intervalo_ms = 1000 / taxa_hz
+        self.timestamp_ms = self.rng.uniform(2000, 5000)  # boot do ESP32
+        self.prob_queda = quedas_por_hora / 3600 / taxa_hz
+        self.em_movimento = False
+        self.sequencia = []
+
+    def _sequencia_queda(self):
+        queda_livre = [(0.1, 0.1, self.rng.uniform(0.15, 0.4), 0, 'QUEDA_LIVRE') for _ in range(4)]
+        impacto = self.rng.uniform(2.5, 4.0)
+        return queda_livre + [(impacto * 0.6, impacto * 0.3, impacto * 0.74, 1, 'QUEDA_DETECTADA')] \
+            + [(0.0, 0.9, 0.3, 0, 'NORMAL') for _ in range(10)]
+
+    def proxima(self):
+        if not self.sequencia and self.rng.random() < self.prob_queda:
+            self.sequencia = self._sequencia_queda()
+
+        if self.sequencia:
+            ax, ay, az, queda, status = self.sequencia.pop(0)
+        else:
+            if self.rng.random() < 0.01:
+                self.em_movimento = not self.em_movimento
+            ruido = 0.25 if self.em_movimento else 0.02
+            ax, ay = self.rng.gauss(0, ruido), self.rng.gauss(0, ruido)
+            az = 1.0 + self.rng.gauss(0, ruido)
+            queda, status = 0, 'MOVIMENTO' if self.em_movimento else 'NORMAL'
+
+        self.timestamp_ms += self.intervalo_ms
+        magnitude = math.sqrt(ax * ax + ay * ay + az * az)
+        return (int(self.timestamp_ms), round(ax, 3), round(ay, 3), round(az, 3), round(magnitude, 3), queda, status)
+
+    def bloco(self, n):
+        return [self.proxima() for _ in range(n)]
+
+
+class ClienteCarga:
+    def __init__(self, host='127.0.0.1', porta_tcp=9000, porta_udp=9001, dispositivos=100, segundos=30.0,
+                 taxa_hz=20, amostras_por_envio=10, protocolo='tcp', formato='TEXTO', sem_pausa=False,
+                 rampa_s=5.0, quedas_por_hora=2.0, semente=42):
+        self.host = host
+        self.porta_tcp = porta_tcp
+        self.porta_udp = porta_udp
+        self.dispositivos = dispositivos
+        self.segundos = segundos
+        self.taxa_hz = taxa_hz
+        self.amostras_por_envio = amostras_por_envio
+        self.protocolo = protocolo
+        self.formato = formato
+        self.sem_pausa = sem_pausa
+        self.rampa_s = rampa_s
+        self.quedas_por_hora = quedas_por_hora
+        self.semente = semente
+
+        self.estatisticas = {
+            'conectados': 0,
+            'falhas_conexao': 0,
+            'recusados': 0,
+            'desconectados': 0,
+            'leituras_enviadas': 0,
+            'quedas_enviadas': 0,
+            'espera_envio_s': 0.0
+        }
+        self.erros = {}
+
+    def _serial(self, i):
+        return f'ESP32-SIM-{i:05d}'
+
+    def _sinal(self, i):
+        return SinalSimulado(self.taxa_hz, self.quedas_por_hora, self.semente * 100_003 + i)
+
+    def _contar(self, bloco):
+        self.estatisticas['leituras_enviadas'] += len(bloco)
+        self.estatisticas['quedas_enviadas'] += sum(leitura[5] for leitura in bloco)
+
+    async def _aguardar_proximo(self, proximo_envio):
+        """Mantém o ritmo da taxa (ou só cede o loop com --sem-pausa)"""
+        if self.sem_pausa:
+            await asyncio.sleep(0)
+            return proximo_envio
+        proximo_envio += self.amostras_por_envio / self.taxa_hz
+        await asyncio.sleep(max(0.0, proximo_envio - time.monotonic()))
+        return proximo_envio
+
+    def _registrar_erro(self, e):
+        self.erros[type(e).__name__] = self.erros.get(type(e).__name__, 0) + 1
+
+    async def _dispositivo_tcp(self, i, fim):
+        await asyncio.sleep(self.rampa_s * (i - 1) / self.dispositivos)
+        sinal = self._sinal(i)
+        formatar = formatar_quadro if self.formato == 'BINARIO' else formatar_linha
+        juntar = b''.join if self.formato == 'BINARIO' else (lambda partes: ''.join(partes).encode('utf-8'))
+
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.porta_tcp)
+        except OSError as e:
+            self.estatisticas['falhas_conexao'] += 1
+            self._registrar_erro(e)
+            return
+
+        try:
+            writer.write(saudacao(self._serial(i), self.formato))
+            resposta = await reader.readline()
+            if not resposta.startswith(b'OK'):
+                self.estatisticas['recusados'] += 1
+                motivo = resposta.decode('utf-8', errors='replace').strip() or 'sem resposta'
+                self.erros[motivo] = self.erros.get(motivo, 0) + 1
+                return
+            self.estatisticas['conectados'] += 1
+
+            proximo_envio = time.monotonic()
+            while time.monotonic() < fim:
+                bloco = sinal.bloco(self.amostras_por_envio)
+                writer.write(juntar([formatar(leitura) for leitura in bloco]))
+                inicio = time.perf_counter()
+                await writer.drain()  # bloqueia quando o gateway aplica contrapressão
+                self.estatisticas['espera_envio_s'] += time.perf_counter() - inicio
+                self._contar(bloco)
+                proximo_envio = await self._aguardar_proximo(proximo_envio)
+        except ConnectionError as e:
+            self.estatisticas['desconectados'] += 1
+            self._registrar_erro(e)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispositivo_udp(self, i, fim, transporte):
+        await asyncio.sleep(self.rampa_s * (i - 1) / self.dispositivos)
+        sinal = self._sinal(i)
+        serial = self._serial(i)
+        self.estatisticas['conectados'] += 1
+
+        proximo_envio = time.monotonic()
+        while time.monotonic() < fim:
+            bloco = sinal.bloco(self.amostras_por_envio)
+            transporte.sendto(datagrama(serial, bloco, self.formato))
+            self._contar(bloco)
+            proximo_envio = await self._aguardar_proximo(proximo_envio)
+
+    async def executar(self):
+        inicio = time.monotonic()
+        fim = inicio + self.rampa_s + self.segundos
+        transporte = None
+
+        if self.protocolo == 'udp':
+            loop = asyncio.get_running_loop()
+            transporte, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=(self.host, self.porta_udp), family=socket.AF_INET)
+            tarefas = [self._dispositivo_udp(i, fim, transporte) for i in range(1, self.dispositivos + 1)]
+        else:
+            tarefas = [self._dispositivo_tcp(i, fim) for i in range(1, self.dispositivos + 1)]
+
+        try:
+            await asyncio.gather(*tarefas)
+        finally:
+            if transporte:
+                transporte.close()
+
+        duracao = time.monotonic() - inicio
+        resumo = dict(self.estatisticas)
+        resumo.update({
+            'protocolo': self.protocolo,
+            'formato': self.formato,
+            'dispositivos': self.dispositivos,
+            'duracao_s': round(duracao, 2),
+            'leituras_por_s': round(resumo['leituras_enviadas'] / duracao, 1),
+            'leituras_por_s_alvo': None if self.sem_pausa else self.dispositivos * self.taxa_hz,
+            'espera_envio_s': round(resumo['espera_envio_s'], 3),
+            'erros': self.erros
+        })
+        return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dispositivos simulados para teste de carga do gateway')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta-tcp', type=int, default=9000)
+    parser.add_argument('--porta-udp', type=int, default=9001)
+    parser.add_argument('--dispositivos', type=int, default=100, help='Conexões simultâneas')
+    parser.add_argument('--segundos', type=float, default=30.0, help='Duração do envio após a rampa')
+    parser.add_argument('--taxa', type=int, default=20, help='Amostras/s por dispositivo')
+    parser.add_argument('--amostras-por-envio', type=int, default=10)
+    parser.add_argument('--protocolo', choices=['tcp', 'udp'], default='tcp')
+    parser.add_argument('--formato', choices=['texto', 'binario'], default='texto')
+    parser.add_argument('--sem-pausa', action='store_true', help='Enviar o mais rápido possível')
+    parser.add_argument('--rampa', type=float, default=5.0, help='Segundos para abrir todas as conexões')
+    parser.add_argument('--quedas-por-hora', type=float, default=2.0)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    cliente = ClienteCarga(
+        host=args.host, porta_tcp=args.porta_tcp, porta_udp=args.porta_udp,
+        dispositivos=args.dispositivos, segundos=args.segundos, taxa_hz=args.taxa,
+        amostras_por_envio=args.amostras_por_envio, protocolo=args.protocolo,
+        formato=args.formato.upper(), sem_pausa=args.sem_pausa, rampa_s=args.rampa,
+        quedas_por_hora=args.quedas_por_hora, semente=args.semente
+    )
+    print(f"📱 {args.dispositivos} dispositivos simulados -> {args.host} "
+          f"({args.protocolo.upper()}, {args.formato}, {args.taxa} Hz)")
+    resumo = asyncio.run(cliente.executar())
+
+    print("\n" + "=" * 50)
+    print("RESUMO DA CARGA")
+    print("=" * 50)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+PROTOCOLO DISPOSITIVO -> GATEWAY
+
+Formatos aceitos pelo gateway (gateway/servidor.py) e gerados pelo cliente
+simulado (gateway/dispositivo_simulado.py). Não depende de pandas nem do
+banco, para o cliente de carga continuar leve.
+
+TCP - a conexão começa com uma linha de saudação identificando o dispositivo:
+
+    SERIAL <serial_number> [TEXTO|BINARIO]\\n
+
+O gateway responde "OK\\n" (ou "ERRO <motivo>\\n" e fecha). Depois disso:
+
+- TEXTO: linhas no formato do monitor serial do firmware
+  (Timestamp(ms),Ax(g),Ay(g),Az(g),Magnitude(g),Queda,Status); cabeçalho e
+  mensagens do console (banner, alerta de emergência) são ignorados
+- BINARIO: quadros de tamanho fixo (QUADRO: uint32 millis, 4 x float32,
+  uint8 queda, uint8 código do status), little-endian
+
+UDP - cada datagrama carrega o serial e um bloco de leituras:
+
+- texto: "<serial>\\n" seguido das linhas do firmware
+- binário: MAGIA_BINARIO, uint8 com o tamanho do serial, o serial e os quadros
+
+Uma leitura é a tupla (timestamp_ms, ax, ay, az, magnitude, queda, status).
+"""
+
+import struct
+
+STATUS = ['NORMAL', 'MOVIMENTO', 'QUEDA_LIVRE', 'QUEDA_DETECTADA']
+CODIGO_STATUS = {status: codigo for codigo, status in enumerate(STATUS)}
+
+QUADRO = struct.Struct('<IffffBB')
+MAGIA_BINARIO = b'SBF1'
+FORMATOS = ('TEXTO', 'BINARIO')
+
+
+class ErroProtocolo(ValueError):
+    pass
+
+
+# ====== LEITURAS ======
+
+def interpretar_linha(linha):
+    """
+    Linha do firmware -> leitura, ou None para linhas que não são dados
+    (cabeçalho, banner, mensagens de alerta)
+
+    Raises:
+        ErroProtocolo: linha com 7 campos mas valores inválidos
+    """
+    campos = linha.strip().split(',')
+    if len(campos) != 7 or not campos[0].isdigit():
+        return None
+    try:
+        leitura = (int(campos[0]), float(campos[1]), float(campos[2]), float(campos[3]),
+                   float(campos[4]), int(campos[5]), campos[6])
+    except ValueError as e:
+        raise ErroProtocolo(f"leitura inválida: {linha.strip()!r}") from e
+    if leitura[6] not in CODIGO_STATUS or leitura[5] not in (0, 1):
+        raise ErroProtocolo(f"leitura inválida: {linha.strip()!r}")
+    return leitura
+
+
+def interpretar_linhas(bloco):
+    """
+    Bloco de linhas completas (bytes) -> (leituras, quantidade de inválidas)
+    """
+    leituras = []
+    invalidas = 0
+    for linha in bloco.decode('utf-8', errors='replace').splitlines():
+        try:
+            leitura = interpretar_linha(linha)
+        except ErroProtocolo:
+            invalidas += 1
+            continue
+        if leitura is not None:
+            leituras.append(leitura)
+    return leituras, invalidas
+
+
+def interpretar_quadros(dados):
+    """
+    Quadros binários (tamanho múltiplo de QUADRO.size) -> (leituras, inválidas)
+    """
+    leituras = []
+    invalidas = 0
+    for timestamp_ms, ax, ay, az, magnitude, queda, codigo in QUADRO.iter_unpack(dados):
+        if codigo >= len(STATUS) or queda > 1:
+            invalidas += 1
+            continue
+        leituras.append((timestamp_ms, round(ax, 3), round(ay, 3), round(az, 3),
+                         round(magnitude, 3), queda, STATUS[codigo]))
+    return leituras, invalidas
+
+
+def formatar_linha(leitura):
+    timestamp_ms, ax, ay, az, magnitude, queda, status = leitura
+    return f"{timestamp_ms},{ax:.3f},{ay:.3f},{az:.3f},{magnitude:.3f},{queda},{status}\n"
+
+
+def formatar_quadro(leitura):
+    timestamp_ms, ax, ay, az, magnitude, queda, status = leitura
+    return QUADRO.pack(timestamp_ms, ax, ay, az, magnitude, queda, CODIGO_STATUS[status])
+
+
+# ====== TCP ======
+
+def saudacao(serial, formato='TEXTO'):
+    return f"SERIAL {serial} {formato}\n".encode('utf-8')
+
+
+def interpretar_saudacao(linha):
+    """
+    Returns:
+        tuple: (serial, formato)
+
+    Raises:
+        ErroProtocolo: saudação fora do formato
+    """
+    partes = linha.decode('utf-8', errors='replace').split()
+    if len(partes) not in (2, 3) or partes[0] != 'SERIAL':
+        raise ErroProtocolo("saudação esperada: SERIAL <serial> [TEXTO|BINARIO]")
+    formato = partes[2].upper() if len(partes) == 3 else 'TEXTO'
+    if formato not in FORMATOS:
+        raise ErroProtocolo(f"formato desconhecido: {formato}")
+    return partes[1], formato
+
+
+# ====== UDP ======
+
+def datagrama(serial, leituras, formato='TEXTO'):
+    if formato == 'BINARIO':
+        serial_bytes = serial.encode('utf-8')
+        return (MAGIA_BINARIO + bytes([len(serial_bytes)]) + serial_bytes
+                + b''.join(formatar_quadro(leitura) for leitura in leituras))
+    return (serial + '\n' + ''.join(formatar_linha(leitura) for leitura in leituras)).encode('utf-8')
+
+
+def interpretar_datagrama(dados):
+    """
+    Returns:
+        tuple: (serial, leituras, quantidade de inválidas)
+
+    Raises:
+        ErroProtocolo: datagrama sem serial ou com quadros truncados
+    """
+    if dados.startswith(MAGIA_BINARIO):
+        inicio = len(MAGIA_BINARIO) + 1
+        if len(dados) < inicio:
+            raise ErroProtocolo("datagrama binário truncado")
+        fim_serial = inicio + dados[len(MAGIA_BINARIO)]
+        corpo = dados[fim_serial:]
+        if fim_serial > len(dados) or len(corpo) % QUADRO.size:
+            raise ErroProtocolo("datagrama binário truncado")
+        leituras, invalidas = interpretar_quadros(corpo)
+        return dados[inicio:fim_serial].decode('utf-8', errors='replace'), leituras, invalidas
+
+    serial, _, corpo = dados.partition(b'\n')
+    if not serial.strip():
+        raise ErroProtocolo("datagrama sem serial")
+    leituras, invalidas = interpretar_linhas(corpo)
+    return serial.decode('utf-8', errors='replace').strip(), leituras, invalidas
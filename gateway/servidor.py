@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+GATEWAY DE DISPOSITIVOS - SENTINELA SAFETY
+
+Recebe as leituras de muitos wearables ao mesmo tempo (TCP e UDP, asyncio)
+e grava em lote em leituras_sensores. Protocolo em gateway/protocolo.py.
+
+- Cada conexão TCP identifica o dispositivo pelo serial_number (tabela
+  dispositivos); o trabalhador é o de mesmo id (convenção de garantir_frota)
+- A interpretação é feita por bloco lido (até TAMANHO_LEITURA bytes), sem
+  operações bloqueantes no loop; o banco roda em thread (asyncio.to_thread)
+- Contrapressão por conexão: os blocos interpretados vão para uma fila
+  limitada; com a fila cheia, a conexão deixa de ser lida até o escritor
+  liberar espaço, e o controle de fluxo do TCP freia o dispositivo. UDP não
+  tem como frear o emissor: com a fila cheia o datagrama é descartado e
+  contado
+- Uma tarefa escritora junta os blocos até `tamanho_lote` leituras (ou
+  `intervalo_escrita` segundos) e grava com inserir_leituras_lote; o instante
+  de recepção de cada bloco alinha o millis() do dispositivo (db/sessoes.py)
+- Lote que falha no banco é regravado com backoff (reconectando); enquanto
+  isso a fila enche e a contrapressão freia os dispositivos. Esgotadas as
+  tentativas, o lote vai para um CSV na pasta de entrada do daemon
+  (data/entrada), que o ingere depois - não é descartado
+
+Quedas e alertas não são tratados aqui: o modo daemon do pipeline pontua as
+leituras novas de qualquer produtor (db/micro_lotes.py).
+
+Executar: python gateway/servidor.py [--porta-tcp 9000] [--porta-udp 9001] [--sqlite bench.db]
+Carga:    python gateway/dispositivo_simulado.py --dispositivos 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Permite importar os módulos do projeto ao executar como script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.load_data import garantir_frota, inserir_leituras_lote
+from gateway.protocolo import (
+    QUADRO, ErroProtocolo, interpretar_datagrama, interpretar_linhas, interpretar_quadros, interpretar_saudacao
+)
+
+TAMANHO_LEITURA = 64 * 1024
+TAMANHO_MAXIMO_LINHA = 1024
+INTERVALO_RECARGA_DISPOSITIVOS = 5.0
+ESPERA_MAXIMA_REGRAVACAO = 10.0
+
+COLUNAS_FIRMWARE = ['Dispositivo', 'Trabalhador', 'Timestamp(ms)', 'Ax(g)', 'Ay(g)', 'Az(g)',
+                    'Magnitude(g)', 'Queda', 'Status']
+COLUNA_RECEBIDO = 'Recebido(ms)'
+
+
+class _ProtocoloUdp(asyncio.DatagramProtocol):
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def datagram_received(self, dados, endereco):
+        self.gateway.receber_datagrama(dados)
+
+
+class GatewayDispositivos:
+    def __init__(self, conectar, host='0.0.0.0', porta_tcp=9000, porta_udp=9001, tamanho_lote=5000,
+                 intervalo_escrita=0.5, max_blocos_fila=200, timeout_ocioso=60.0, intervalo_status=10.0,
+                 max_tentativas_gravacao=5, backoff_gravacao=0.5, pasta_pendentes='data/entrada'):
+        """
+        Args:
+            conectar: função que abre uma conexão com o banco
+            porta_tcp / porta_udp (int): portas de escuta (None desativa)
+            tamanho_lote (int): leituras por inserção em lote
+            intervalo_escrita (float): espera máxima (s) para gravar um lote parcial
+            max_blocos_fila (int): blocos aguardando gravação antes de frear as conexões
+            timeout_ocioso (float): fecha conexões TCP sem dados por este tempo (s)
+            intervalo_status (float): linha de status no console (s; 0 desativa)
+            max_tentativas_gravacao (int): tentativas por lote antes de ir para arquivo
+            backoff_gravacao (float): espera inicial entre tentativas (dobra a cada falha)
+            pasta_pendentes (str): lotes não gravados viram CSV aqui (pasta de entrada do daemon)
+        """
+        self.conectar = conectar
+        self.host = host
+        self.porta_tcp = porta_tcp
+        self.porta_udp = porta_udp
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_escrita = intervalo_escrita
+        self.max_blocos_fila = max_blocos_fila
+        self.timeout_ocioso = timeout_ocioso
+        self.intervalo_status = intervalo_status
+        self.max_tentativas_gravacao = max_tentativas_gravacao
+        self.backoff_gravacao = backoff_gravacao
+        self.pasta_pendentes = Path(pasta_pendentes)
+
+        self.conn = None
+        self.fila = None
+        self.dispositivos = {}      # serial -> (id_dispositivo, id_trabalhador)
+        self.recarregado_em = 0.0
+        self.conexoes = {}          # writer -> tarefa que atende a conexão
+        self.parar = None
+        self.fim_recepcao = None
+        self.estatisticas = {
+            'conexoes_total': 0,
+            'conexoes_recusadas': 0,
+            'leituras_recebidas': 0,
+            'leituras_gravadas': 0,
+            'leituras_invalidas': 0,
+            'leituras_descartadas_udp': 0,
+            'leituras_em_arquivo': 0,
+            'leituras_perdidas_banco': 0,
+            'regravacoes': 0,
+            'datagramas_invalidos': 0,
+            'lotes_gravados': 0,
+            'espera_contrapressao_s': 0.0,
+            'tempo_banco_s': 0.0
+        }
+
+    # --- dispositivos (conexão bloqueante usada por uma thread de cada vez) ---
+
+    def _buscar_dispositivos(self):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT d.serial_number, d.id_dispositivo, t.id_trabalhador
+            FROM dispositivos d
+            JOIN trabalhadores t ON t.id_trabalhador = d.id_dispositivo
+            WHERE d.status = 'ativo'
+        """)
+        dispositivos = {serial: (int(id_dispositivo), int(id_trabalhador))
+                        for serial, id_dispositivo, id_trabalhador in cursor.fetchall()}
+        self.conn.commit()
+        return dispositivos
+
+    async def recarregar_dispositivos(self):
+        async with self.lock_banco:
+            self.dispositivos = await asyncio.to_thread(self._buscar_dispositivos)
+        self.recarregado_em = time.monotonic()
+
+    async def resolver(self, serial):
+        """(id_dispositivo, id_trabalhador) do serial; recarrega o cadastro se não conhecer"""
+        if serial not in self.dispositivos and \
+                time.monotonic() - self.recarregado_em > INTERVALO_RECARGA_DISPOSITIVOS:
+            await self.recarregar_dispositivos()
+        return self.dispositivos.get(serial)
+
+    # --- recepção ---
+
+    async def _enfileirar(self, ids, leituras):
+        """Aguarda espaço na fila: enquanto isso a conexão não é lida (contrapressão)"""
+        self.estatisticas['leituras_recebidas'] += len(leituras)
+        bloco = (ids, int(time.time() * 1000), leituras)
+        if self.fila.full():
+            inicio = time.perf_counter()
+            await self.fila.put(bloco)
+            self.estatisticas['espera_contrapressao_s'] += time.perf_counter() - inicio
+        else:
+            self.fila.put_nowait(bloco)
+
+    async def _atender_tcp(self, reader, writer):
+        self.conexoes[writer] = asyncio.current_task()
+        try:
+            try:
+                serial, formato = interpretar_saudacao(
+                    await asyncio.wait_for(reader.readline(), self.timeout_ocioso))
+                ids = await self.resolver(serial)
+                if ids is None:
+                    raise ErroProtocolo(f"serial desconhecido ou inativo: {serial}")
+            except (ErroProtocolo, asyncio.TimeoutError) as e:
+                self.estatisticas['conexoes_recusadas'] += 1
+                writer.write(f"ERRO {str(e) or 'saudação não recebida'}\n".encode('utf-8'))
+                await writer.drain()
+                return
+
+            writer.write(b"OK\n")
+            await writer.drain()
+            self.estatisticas['conexoes_total'] += 1
+
+            resto = b''
+            while True:
+                dados = await asyncio.wait_for(reader.read(TAMANHO_LEITURA), self.timeout_ocioso)
+                if not dados:
+                    break
+                dados = resto + dados
+                if formato == 'BINARIO':
+                    corte = len(dados) - len(dados) % QUADRO.size
+                    leituras, invalidas = interpretar_quadros(dados[:corte])
+                else:
+                    corte = dados.rfind(b'\n') + 1
+                    leituras, invalidas = interpretar_linhas(dados[:corte])
+                resto = dados[corte:]
+                if len(resto) > TAMANHO_MAXIMO_LINHA and formato == 'TEXTO':
+                    invalidas += 1
+                    resto = b''
+                self.estatisticas['leituras_invalidas'] += invalidas
+                if leituras:
+                    await self._enfileirar(ids, leituras)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            self.conexoes.pop(writer, None)
+            writer.close()
+
+    def receber_datagrama(self, dados):
+        try:
+            serial, leituras, invalidas = interpretar_datagrama(dados)
+        except ErroProtocolo:
+            self.estatisticas['datagramas_invalidos'] += 1
+            return
+        self.estatisticas['leituras_invalidas'] += invalidas
+
+        ids = self.dispositivos.get(serial)
+        if ids is None:
+            # Sem await aqui: agenda a recarga do cadastro e descarta este datagrama
+            self.estatisticas['datagramas_invalidos'] += 1
+            if time.monotonic() - self.recarregado_em > INTERVALO_RECARGA_DISPOSITIVOS:
+                self.recarregado_em = time.monotonic()
+                asyncio.get_running_loop().create_task(self.recarregar_dispositivos())
+            return
+
+        if not leituras:
+            return
+        self.estatisticas['leituras_recebidas'] += len(leituras)
+        try:
+            self.fila.put_nowait((ids, int(time.time() * 1000), leituras))
+        except asyncio.QueueFull:
+            self.estatisticas['leituras_descartadas_udp'] += len(leituras)
+
+    # --- gravação ---
+
+    def _inserir(self, registros):
+        inicio = time.perf_counter()
+        try:
+            df = pd.DataFrame(registros, columns=[COLUNA_RECEBIDO] + COLUNAS_FIRMWARE)
+            inserir_leituras_lote(self.conn, df, tamanho_lote=self.tamanho_lote,
+                                  recebido_em_ms=df[COLUNA_RECEBIDO].to_numpy())
+        except Exception:
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass  # conexão caída: _gravar reconecta antes de tentar de novo
+            raise
+        finally:
+            self.estatisticas['tempo_banco_s'] += time.perf_counter() - inicio
+
+    def _reconectar(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = self.conectar()
+
+    def _salvar_pendentes(self, registros):
+        """
+        Grava o lote como CSV do firmware na pasta de entrada do daemon, com
+        o instante de recepção de cada leitura (época de boot das sessões)
+        """
+        self.pasta_pendentes.mkdir(parents=True, exist_ok=True)
+        caminho = self.pasta_pendentes / f"gateway_{time.time_ns()}.csv"
+        df = pd.DataFrame(registros, columns=[COLUNA_RECEBIDO] + COLUNAS_FIRMWARE)
+        # Fora do *.csv até estar completo: o daemon não lê arquivo pela metade
+        df.to_csv(f"{caminho}.tmp", index=False)
+        os.replace(f"{caminho}.tmp", caminho)
+        return caminho
+
+    async def _gravar(self, registros):
+        """Grava o lote, com novas tentativas; esgotadas, salva em arquivo"""
+        for tentativa in range(1, self.max_tentativas_gravacao + 1):
+            try:
+                async with self.lock_banco:
+                    await asyncio.to_thread(self._inserir, registros)
+                self.estatisticas['leituras_gravadas'] += len(registros)
+                self.estatisticas['lotes_gravados'] += 1
+                return
+            except Exception as e:
+                print(f"⚠️ Falha ao gravar {len(registros)} leituras "
+                      f"(tentativa {tentativa}/{self.max_tentativas_gravacao}): {e}")
+            if tentativa == self.max_tentativas_gravacao:
+                break
+            self.estatisticas['regravacoes'] += 1
+            await asyncio.sleep(min(self.backoff_gravacao * 2 ** (tentativa - 1), ESPERA_MAXIMA_REGRAVACAO))
+            try:
+                async with self.lock_banco:
+                    await asyncio.to_thread(self._reconectar)
+            except Exception as e:
+                print(f"⚠️ Reconexão ao banco falhou: {e}")
+
+        try:
+            caminho = await asyncio.to_thread(self._salvar_pendentes, registros)
+        except OSError as e:
+            self.estatisticas['leituras_perdidas_banco'] += len(registros)
+            print(f"❌ {len(registros)} leituras perdidas: banco e arquivo falharam ({e})")
+            return
+        self.estatisticas['leituras_em_arquivo'] += len(registros)
+        print(f"💾 {len(registros)} leituras salvas em {caminho} (ingeridas pelo pipeline --daemon)")
+
+    def _acumular(self, registros, bloco):
+        (id_dispositivo, id_trabalhador), recebido_em_ms, leituras = bloco
+        registros.extend((recebido_em_ms, id_dispositivo, id_trabalhador) + leitura for leitura in leituras)
+        self.fila.task_done()
+
+    async def _escritor(self):
+        """
+        Junta blocos da fila em lotes de até tamanho_lote leituras; termina
+        quando a recepção acabou e a fila esvaziou
+        """
+        while not (self.fim_recepcao.is_set() and self.fila.empty()):
+            registros = []
+            limite = time.monotonic() + self.intervalo_escrita
+            while len(registros) < self.tamanho_lote:
+                try:
+                    bloco = self.fila.get_nowait()
+                except asyncio.QueueEmpty:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    try:
+                        bloco = await asyncio.wait_for(self.fila.get(), restante)
+                    except asyncio.TimeoutError:
+                        break
+                self._acumular(registros, bloco)
+            if registros:
+                await self._gravar(registros)
+
+    # --- execução ---
+
+    async def _status(self):
+        anterior = 0
+        while True:
+            await asyncio.sleep(self.intervalo_status)
+            gravadas = self.estatisticas['leituras_gravadas']
+            print(f"📡 {len(self.conexoes)} conexões | fila {self.fila.qsize()}/{self.max_blocos_fila} | "
+                  f"{(gravadas - anterior) / self.intervalo_status:,.0f} leituras/s gravadas | "
+                  f"total {gravadas:,}")
+            anterior = gravadas
+
+    async def executar(self, duracao=None):
+        """
+        Atende até SIGINT/SIGTERM (ou `duracao` segundos); ao parar, fecha as
+        conexões e grava o que ainda estiver na fila
+        """
+        self.fila = asyncio.Queue(maxsize=self.max_blocos_fila)
+        self.lock_banco = asyncio.Lock()
+        self.parar = asyncio.Event()
+        self.fim_recepcao = asyncio.Event()
+        self.conn = await asyncio.to_thread(self.conectar)
+        await self.recarregar_dispositivos()
+
+        loop = asyncio.get_running_loop()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sinal, self.parar.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        servidor = None
+        transporte_udp = None
+        escritor = asyncio.create_task(self._escritor())
+        status = asyncio.create_task(self._status()) if self.intervalo_status else None
+
+        try:
+            if self.porta_tcp is not None:
+                servidor = await asyncio.start_server(self._atender_tcp, self.host, self.porta_tcp,
+                                                      limit=TAMANHO_LEITURA, backlog=1024)
+            if self.porta_udp is not None:
+                transporte_udp, _ = await loop.create_datagram_endpoint(
+                    lambda: _ProtocoloUdp(self), local_addr=(self.host, self.porta_udp))
+            print(f"📡 Gateway ouvindo em {self.host} (TCP {self.porta_tcp}, UDP {self.porta_udp}) - "
+                  f"{len(self.dispositivos)} dispositivos cadastrados")
+
+            try:
+                await asyncio.wait_for(self.parar.wait(), duracao)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            if servidor:
+                servidor.close()
+            if transporte_udp:
+                transporte_udp.close()
+            # As conexões enfileiram o último bloco lido; o escritor grava tudo antes de sair
+            for writer in list(self.conexoes):
+                writer.close()
+            if self.conexoes:
+                await asyncio.wait(list(self.conexoes.values()), timeout=self.timeout_ocioso)
+            self.fim_recepcao.set()
+            await escritor
+            if status:
+                status.cancel()
+            self.conn.close()
+
+        return self.resumo()
+
+    def resumo(self):
+        resumo = dict(self.estatisticas)
+        resumo['espera_contrapressao_s'] = round(resumo['espera_contrapressao_s'], 3)
+        resumo['tempo_banco_s'] = round(resumo['tempo_banco_s'], 3)
+        if resumo['tempo_banco_s']:
+            resumo['leituras_por_s_banco'] = round(resumo['leituras_gravadas'] / resumo['tempo_banco_s'], 1)
+        return resumo
+
+
+async def _principal(args):
+    from db.load_data import conectar_banco_mysql, conectar_banco_sqlite
+
+    conectar = (lambda: conectar_banco_sqlite(args.sqlite)) if args.sqlite else conectar_banco_mysql
+    if args.frota:
+        conn = conectar()
+        garantir_frota(conn, args.frota)
+        conn.close()
+        print(f"👷 Frota simulada cadastrada: {args.frota} dispositivos (ESP32-SIM-xxxxx)")
+
+    gateway = GatewayDispositivos(
+        conectar,
+        host=args.host,
+        porta_tcp=args.porta_tcp,
+        porta_udp=args.porta_udp,
+        tamanho_lote=args.tamanho_lote,
+        max_blocos_fila=args.max_blocos_fila,
+        timeout_ocioso=args.timeout_ocioso,
+        pasta_pendentes=args.pasta_pendentes
+    )
+    resumo = await gateway.executar(duracao=args.duracao)
+
+    print("\n" + "=" * 50)
+    print("RESUMO DO GATEWAY")
+    print("=" * 50)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Gateway TCP/UDP de dispositivos wearables')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--porta-tcp', type=int, default=9000)
+    parser.add_argument('--porta-udp', type=int, default=9001)
+    parser.add_argument('--tamanho-lote', type=int, default=5000, help='Leituras por inserção em lote')
+    parser.add_argument('--max-blocos-fila', type=int, default=200,
+                        help='Blocos aguardando gravação antes de frear as conexões')
+    parser.add_argument('--timeout-ocioso', type=float, default=60.0,
+                        help='Fecha conexões sem dados por este tempo (s)')
+    parser.add_argument('--pasta-pendentes', default='data/entrada',
+                        help='Lotes que o banco recusou após as tentativas viram CSV aqui (entrada do daemon)')
+    parser.add_argument('--duracao', type=float, default=None, help='Encerrar após N segundos')
+    parser.add_argument('--frota', type=int, default=0,
+                        help='Cadastrar N dispositivos simulados (para o cliente de carga)')
+    parser.add_argument('--sqlite', default=None,
+                        help='Gravar em um banco SQLite local em vez do MySQL (testes de carga)')
+    asyncio.run(_principal(parser.parse_args()))
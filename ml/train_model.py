@@ -7,24 +7,69 @@ Sprint 3/4 - Challenge Reply
 import sqlite3
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
-from sklearn.preprocessing import StandardScaler
-import joblib
+import pickle
+import time
+
+# matplotlib, seaborn, scikit-learn e joblib são importados dentro dos
+# métodos que os usam: pontuar lotes (dashboard) não carrega a pilha de
+# treino/gráficos
+
+FEATURE_COLS = ['aceleracao_x', 'aceleracao_y', 'aceleracao_z',
+                'magnitude', 'accel_diff', 'accel_std',
+                'accel_max', 'accel_min', 'angle_xy', 'angle_xz']
+
+def criar_features_lote(df, coluna_grupo=None):
+    """
+    Cria as features do modelo para um lote de leituras (vetorizado)
+    
+    Args:
+        df (DataFrame): colunas aceleracao_x/y/z e magnitude, em ordem temporal
+        coluna_grupo (str): calcula diff/janelas separadamente por grupo
+            (ex.: 'id_dispositivo' em lotes com vários dispositivos)
+    """
+    magnitude = df['magnitude'].astype(float)
+    
+    if coluna_grupo:
+        grupos = magnitude.groupby(df[coluna_grupo])
+        df['accel_diff'] = grupos.diff().fillna(0)
+        df['accel_std'] = grupos.transform(lambda s: s.rolling(window=5, min_periods=1).std()).fillna(0)
+        df['accel_max'] = grupos.transform(lambda s: s.rolling(window=5, min_periods=1).max()).fillna(0)
+        df['accel_min'] = grupos.transform(lambda s: s.rolling(window=5, min_periods=1).min()).fillna(0)
+    else:
+        df['accel_diff'] = magnitude.diff().fillna(0)
+        df['accel_std'] = magnitude.rolling(window=5, min_periods=1).std().fillna(0)
+        df['accel_max'] = magnitude.rolling(window=5, min_periods=1).max().fillna(0)
+        df['accel_min'] = magnitude.rolling(window=5, min_periods=1).min().fillna(0)
+    
+    # Features angulares
+    df['angle_xy'] = np.arctan2(df['aceleracao_y'], df['aceleracao_x'])
+    df['angle_xz'] = np.arctan2(df['aceleracao_z'], df['aceleracao_x'])
+    
+    return df
+
+def pontuar_lote(modelo, scaler, df, feature_cols=FEATURE_COLS):
+    """Probabilidade de queda de cada linha (uma única chamada ao modelo)"""
+    X = scaler.transform(df[list(feature_cols)].astype(float))
+    return modelo.predict_proba(X)[:, 1]
+
 
 class FallDetectionML:
-    def __init__(self):
+    def __init__(self, conectar=None):
+        """
+        Args:
+            conectar (callable): fábrica de conexões (padrão: conectar_banco_mysql)
+        """
+        self.conectar = conectar
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
+        self.feature_cols = list(FEATURE_COLS)
+        self.dados_divididos = None
         
     def carregar_dados(self):
         """Carrega dados do banco SQLite"""
         
         from db.load_data import conectar_banco_mysql
-        conn = conectar_banco_mysql()
+        conn = (self.conectar or conectar_banco_mysql)()
         
         query = """
         SELECT 
@@ -45,18 +90,7 @@ class FallDetectionML:
     
     def criar_features(self, df):
         """Cria features adicionais para o modelo"""
-        
-        # Features derivadas
-        df['accel_diff'] = df['magnitude'].diff().fillna(0)
-        df['accel_std'] = df['magnitude'].rolling(window=5, min_periods=1).std().fillna(0)
-        df['accel_max'] = df['magnitude'].rolling(window=5, min_periods=1).max().fillna(0)
-        df['accel_min'] = df['magnitude'].rolling(window=5, min_periods=1).min().fillna(0)
-        
-        # Features angulares
-        df['angle_xy'] = np.arctan2(df['aceleracao_y'], df['aceleracao_x'])
-        df['angle_xz'] = np.arctan2(df['aceleracao_z'], df['aceleracao_x'])
-        
-        return df
+        return criar_features_lote(df)
     
     def treinar_modelo(self):
         """Treina o modelo Random Forest"""
@@ -66,19 +100,26 @@ class FallDetectionML:
         df = self.criar_features(df)
         
         # Preparar features e target
-        feature_cols = ['aceleracao_x', 'aceleracao_y', 'aceleracao_z', 
-                       'magnitude', 'accel_diff', 'accel_std', 
-                       'accel_max', 'accel_min', 'angle_xy', 'angle_xz']
+        feature_cols = list(FEATURE_COLS)
         
         X = df[feature_cols]
         y = df['queda_detectada']
         
+        import joblib
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import classification_report, accuracy_score
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        
         # Split treino/teste
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.3, random_state=42, stratify=y
         )
+        self.dados_divididos = (X_train, X_test, y_train, y_test)
+        self.feature_cols = feature_cols
         
         # Normalizar features
+        self.scaler = StandardScaler()
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
         
@@ -117,6 +158,10 @@ class FallDetectionML:
     def visualizar_resultados(self, X_test, y_test, y_pred, feature_cols):
         """Gera visualizações dos resultados"""
         
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        from sklearn.metrics import confusion_matrix, accuracy_score
+        
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         
         # 1. Matriz de Confusão
@@ -190,18 +235,233 @@ Total de Amostras Teste: {len(y_test)}
         print("\n📊 Gráficos salvos em: ml/model_results.png")
         plt.show()
     
+    def _medir_latencia_ms(self, modelo, X, amostras=50):
+        """Mede a latência mediana de predição de uma única leitura (ms)"""
+        
+        amostras = min(amostras, len(X))
+        tempos = []
+        for i in range(amostras):
+            linha = X[i:i + 1]
+            inicio = time.perf_counter()
+            modelo.predict_proba(linha)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        
+        return float(np.median(tempos))
+    
+    def compactar_modelo(self, latencia_alvo_ms=None, tamanho_max_kb=None,
+                         recall_minimo=0.9,
+                         caminho='ml/fall_detection_model_compacto.pkl'):
+        """
+        Compacta o modelo podando features pouco importantes e reduzindo
+        número/profundidade das árvores dentro de um orçamento de latência
+        por amostra e/ou de tamanho do modelo.
+        
+        A seleção usa uma validação separada do treino; o conjunto de teste
+        só mede o modelo escolhido, retreinado com o treino completo.
+        
+        Salva o menor modelo que atende o recall mínimo da classe QUEDA e o
+        orçamento também depois de retreinado (conferido no teste) e retorna
+        a curva de trade-off (acurácia/recall vs latência) da validação.
+        """
+        
+        import joblib
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import accuracy_score, recall_score
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        
+        if self.model is None or self.dados_divididos is None:
+            self.treinar_modelo()
+        
+        X_train, X_test, y_train, y_test = self.dados_divididos
+        X_ajuste, X_val, y_ajuste, y_val = train_test_split(
+            X_train, y_train, test_size=0.25, random_state=42, stratify=y_train
+        )
+        
+        # Features ordenadas por importância no modelo completo
+        importancias = self.model.feature_importances_
+        ordem = [self.feature_cols[i] for i in np.argsort(importancias)[::-1]]
+        
+        total = len(ordem)
+        qtds_features = sorted({total, max(total * 2 // 3, 1), max(total // 2, 1), min(3, total)},
+                               reverse=True)
+        qtds_arvores = [100, 50, 25, 10]
+        profundidades = [10, 6, 4]
+        
+        print("\n🗜️ Compactando modelo...")
+        print(f"   Recall mínimo (Queda): {recall_minimo:.0%}")
+        if latencia_alvo_ms is not None:
+            print(f"   Latência alvo: {latencia_alvo_ms:.2f} ms/amostra")
+        if tamanho_max_kb is not None:
+            print(f"   Tamanho máximo: {tamanho_max_kb:.0f} KB")
+        
+        def atende_orcamento(recall, latencia, tamanho_kb):
+            atende = recall >= recall_minimo
+            if latencia_alvo_ms is not None:
+                atende = atende and latencia <= latencia_alvo_ms
+            if tamanho_max_kb is not None:
+                atende = atende and tamanho_kb <= tamanho_max_kb
+            return atende
+        
+        resultados = []
+        
+        for n_features in qtds_features:
+            features = ordem[:n_features]
+            scaler = StandardScaler()
+            X_tr = scaler.fit_transform(X_ajuste[features])
+            X_va = scaler.transform(X_val[features])
+            
+            for n_arvores in qtds_arvores:
+                for profundidade in profundidades:
+                    modelo = RandomForestClassifier(
+                        n_estimators=n_arvores,
+                        max_depth=profundidade,
+                        min_samples_split=5,
+                        random_state=42,
+                        class_weight='balanced'
+                    )
+                    modelo.fit(X_tr, y_ajuste)
+                    y_pred = modelo.predict(X_va)
+                    
+                    tp = int(((y_pred == 1) & (y_val.values == 1)).sum())
+                    fn = int(((y_pred == 0) & (y_val.values == 1)).sum())
+                    recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+                    
+                    latencia = self._medir_latencia_ms(modelo, X_va)
+                    tamanho_kb = len(pickle.dumps(modelo, protocol=pickle.HIGHEST_PROTOCOL)) / 1024
+                    
+                    resultados.append({
+                        'n_features': n_features,
+                        'n_arvores': n_arvores,
+                        'profundidade': profundidade,
+                        'acuracia': accuracy_score(y_val, y_pred),
+                        'recall_queda': recall,
+                        'latencia_ms': latencia,
+                        'tamanho_kb': tamanho_kb,
+                        'atende_orcamento': atende_orcamento(recall, latencia, tamanho_kb)
+                    })
+        
+        curva = pd.DataFrame(resultados).sort_values('latencia_ms').reset_index(drop=True)
+        curva.to_csv('ml/compactacao_tradeoff.csv', index=False)
+        
+        print("\n📈 Trade-off acurácia/recall vs latência (validação):")
+        print(curva.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        
+        self._plotar_tradeoff(curva, latencia_alvo_ms, recall_minimo)
+        
+        aprovados = curva[curva['atende_orcamento']]
+        if aprovados.empty:
+            print("\n⚠️ Nenhuma configuração atende o orçamento com o recall mínimo.")
+            return curva, None
+        
+        # Retreina com o treino completo e confere o orçamento no teste: o modelo
+        # final pode sair maior/mais lento ou com recall menor que na validação
+        for _, candidato in aprovados.sort_values(['tamanho_kb', 'latencia_ms']).iterrows():
+            chave = (int(candidato['n_features']), int(candidato['n_arvores']), int(candidato['profundidade']))
+            features = ordem[:chave[0]]
+            
+            scaler = StandardScaler()
+            X_tr = scaler.fit_transform(X_train[features])
+            X_te = scaler.transform(X_test[features])
+            modelo = RandomForestClassifier(
+                n_estimators=chave[1],
+                max_depth=chave[2],
+                min_samples_split=5,
+                random_state=42,
+                class_weight='balanced'
+            )
+            modelo.fit(X_tr, y_train)
+            y_pred = modelo.predict(X_te)
+            
+            metricas = {
+                'n_features': chave[0],
+                'n_arvores': chave[1],
+                'profundidade': chave[2],
+                'acuracia': accuracy_score(y_test, y_pred),
+                'recall_queda': recall_score(y_test, y_pred, zero_division=0),
+                'latencia_ms': self._medir_latencia_ms(modelo, X_te),
+                'tamanho_kb': len(pickle.dumps(modelo, protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+                'recall_validacao': float(candidato['recall_queda'])
+            }
+            if atende_orcamento(metricas['recall_queda'], metricas['latencia_ms'], metricas['tamanho_kb']):
+                break
+            
+            print(f"\n⚠️ {chave[1]} árvores, profundidade {chave[2]}, {chave[0]} features não atende "
+                  f"o orçamento após retreino (recall {metricas['recall_queda']:.2%}, "
+                  f"{metricas['latencia_ms']:.3f} ms, {metricas['tamanho_kb']:.1f} KB); tentando o próximo")
+        else:
+            print("\n⚠️ Nenhuma configuração aprovada na validação atende o orçamento no modelo final;"
+                  " modelo compacto não salvo.")
+            return curva, None
+        
+        joblib.dump({
+            'modelo': modelo,
+            'scaler': scaler,
+            'features': features,
+            'metricas': metricas
+        }, caminho)
+        
+        print(f"\n💾 Modelo compacto salvo em: {caminho}")
+        print(f"   Features ({len(features)}): {', '.join(features)}")
+        print(f"   Árvores: {chave[1]} | Profundidade: {chave[2]}")
+        print(f"   Teste - Recall: {metricas['recall_queda']:.2%} | Acurácia: {metricas['acuracia']:.2%}")
+        print(f"   Latência: {metricas['latencia_ms']:.3f} ms | Tamanho: {metricas['tamanho_kb']:.1f} KB")
+        
+        return curva, metricas
+    
+    def _plotar_tradeoff(self, curva, latencia_alvo_ms, recall_minimo):
+        """Gera gráfico da curva de trade-off da compactação"""
+        
+        import matplotlib.pyplot as plt
+        
+        fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+        
+        escala = axes[0].scatter(curva['latencia_ms'], curva['acuracia'],
+                                 c=curva['n_features'], cmap='viridis', s=40)
+        axes[0].set_title('Acurácia vs Latência', fontsize=14, fontweight='bold')
+        axes[0].set_xlabel('Latência por amostra (ms)')
+        axes[0].set_ylabel('Acurácia')
+        fig.colorbar(escala, ax=axes[0], label='Nº de features')
+        
+        axes[1].scatter(curva['latencia_ms'], curva['recall_queda'],
+                        c=curva['atende_orcamento'].map({True: '#2ecc71', False: '#e74c3c'}), s=40)
+        axes[1].axhline(y=recall_minimo, color='red', linestyle='--', label='Recall mínimo')
+        if latencia_alvo_ms is not None:
+            axes[1].axvline(x=latencia_alvo_ms, color='orange', linestyle='--', label='Latência alvo')
+        axes[1].set_title('Recall (Queda) vs Latência', fontsize=14, fontweight='bold')
+        axes[1].set_xlabel('Latência por amostra (ms)')
+        axes[1].set_ylabel('Recall')
+        axes[1].legend()
+        
+        plt.tight_layout()
+        plt.savefig('ml/compactacao_tradeoff.png', dpi=150, bbox_inches='tight')
+        print("\n📊 Curva de trade-off salva em: ml/compactacao_tradeoff.png")
+        plt.close(fig)
+    
+    def carregar_modelo_compacto(self, caminho='ml/fall_detection_model_compacto.pkl'):
+        """Carrega o modelo compacto (modelo, scaler e features ativas)"""
+        
+        import joblib
+        
+        pacote = joblib.load(caminho)
+        self.model = pacote['modelo']
+        self.scaler = pacote['scaler']
+        self.feature_cols = pacote['features']
+        return pacote
+    
     def prever_nova_leitura(self, accel_x, accel_y, accel_z):
         """Faz predição para uma nova leitura"""
         
         magnitude = np.sqrt(accel_x**2 + accel_y**2 + accel_z**2)
         
         # Criar features (simplificado para uma única leitura)
-        features = np.array([[
+        valores = dict(zip(FEATURE_COLS, [
             accel_x, accel_y, accel_z, magnitude,
             0, 0, magnitude, magnitude,  # Features simplificadas
             np.arctan2(accel_y, accel_x),
             np.arctan2(accel_z, accel_x)
-        ]])
+        ]))
+        features = np.array([[valores[col] for col in self.feature_cols]])
         
         features_scaled = self.scaler.transform(features)
         pred = self.model.predict(features_scaled)[0]
@@ -214,6 +474,19 @@ Total de Amostras Teste: {len(y_test)}
         }
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Treinamento do modelo de detecção de quedas')
+    parser.add_argument('--compactar', action='store_true',
+                       help='Compactar modelo dentro de um orçamento de latência/tamanho')
+    parser.add_argument('--latencia-alvo-ms', type=float, default=None,
+                       help='Latência máxima por amostra (ms)')
+    parser.add_argument('--tamanho-max-kb', type=float, default=None,
+                       help='Tamanho máximo do modelo serializado (KB)')
+    parser.add_argument('--recall-minimo', type=float, default=0.9,
+                       help='Recall mínimo da classe Queda (0-1)')
+    args = parser.parse_args()
+    
     print("🚀 Iniciando treinamento do modelo ML...")
     
     # Criar e treinar modelo
@@ -223,6 +496,12 @@ if __name__ == "__main__":
     # Visualizar resultados
     ml.visualizar_resultados(X_test, y_test, y_pred, features)
     
+    # Compactação do modelo
+    if args.compactar:
+        ml.compactar_modelo(latencia_alvo_ms=args.latencia_alvo_ms,
+                            tamanho_max_kb=args.tamanho_max_kb,
+                            recall_minimo=args.recall_minimo)
+    
     # Teste de predição
     print("\n🧪 Teste de Predição:")
     resultado = ml.prever_nova_leitura(2.0, 0.3, 0.3)
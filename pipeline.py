@@ -10,15 +10,144 @@ Este script executa todo o fluxo integrado:
 4. Gera relatórios e alertas
 """
 
+import cProfile
+import hashlib
+import importlib.util
+import json
 import os
+import pstats
 import sys
 import subprocess
+import time
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ESTADO_RELATORIO_ALERTAS = 'logs/relatorio_alertas_estado.json'
+ESTADO_PIPELINE = 'logs/pipeline_estado.json'
+LOG_PASSO = 'logs/pipeline_{passo}.log'
+HISTORICO_EXECUCOES = 'logs/pipeline_execucoes.jsonl'
+METRICAS_PROMETHEUS = 'logs/pipeline_metricas.prom'
+PASTA_PERFIS = 'logs/perfis'
+
+# Política de retreino do passo 'ml': leituras novas só invalidam o modelo
+# quando crescem a base do último treino nesta fração ou quando o modelo
+# passa desta idade (--forcar / --only ml retreinam sempre)
+CRESCIMENTO_RETREINO = 0.2
+IDADE_MAXIMA_MODELO_S = 7 * 24 * 3600
+
+# Métricas por passo exportadas no formato texto do Prometheus: chave -> (nome, descrição)
+METRICAS_PASSO = {
+    'duracao_s': ('sentinela_pipeline_passo_duracao_segundos', 'Tempo de parede do passo'),
+    'cpu_s': ('sentinela_pipeline_passo_cpu_segundos', 'Tempo de CPU da thread do passo'),
+    'linhas': ('sentinela_pipeline_passo_linhas', 'Linhas processadas pelo passo'),
+    'linhas_por_s': ('sentinela_pipeline_passo_linhas_por_segundo', 'Vazão do passo'),
+    'consultas_banco': ('sentinela_pipeline_passo_consultas_banco', 'Consultas executadas no banco'),
+    'tempo_banco_s': ('sentinela_pipeline_passo_banco_segundos', 'Tempo gasto em consultas ao banco'),
+    'rss_pico_bytes': ('sentinela_pipeline_passo_rss_pico_bytes', 'Pico de memória residente do processo ao fim do passo'),
+    'sucesso': ('sentinela_pipeline_passo_sucesso', '1 se o passo executou com sucesso, 0 se falhou'),
+}
+
+CONSULTA_RELATORIO_ALERTAS = """
+    SELECT a.id_alerta, a.tipo_alerta, a.nivel_prioridade, a.mensagem, a.data_alerta,
+           a.enviado, e.magnitude_impacto, t.nome, t.setor
+    FROM alertas a
+    JOIN eventos_queda e ON a.id_evento = e.id_evento
+    JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
+    WHERE a.nivel_prioridade IN ('critica', 'alta') {filtro}
+    ORDER BY {ordem}
+"""
+
+CONSULTA_TOTAL_ALERTAS = """
+    SELECT COUNT(*) FROM alertas WHERE nivel_prioridade IN ('critica', 'alta')
+"""
+
+class SaidaPorPasso:
+    """
+    Substitui sys.stdout durante o pipeline: o que uma thread de passo
+    imprime vai para o log do passo e, linha a linha, para o console com o
+    prefixo [passo] - passos em paralelo não embaralham a saída
+    """
+    
+    def __init__(self, original):
+        self.original = original
+        self.local = threading.local()
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def capturar(self, passo, caminho_log):
+        Path(caminho_log).parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho_log, 'w', encoding='utf-8') as log:
+            self.local.passo, self.local.log, self.local.pendente = passo, log, ''
+            try:
+                yield
+            finally:
+                if self.local.pendente:
+                    self.write('\n')
+                self.local.passo = None
+    
+    def write(self, texto):
+        passo = getattr(self.local, 'passo', None)
+        if passo is None:
+            with self.lock:
+                return self.original.write(texto)
+        
+        self.local.log.write(texto)
+        linhas = (self.local.pendente + texto).split('\n')
+        self.local.pendente = linhas.pop()
+        with self.lock:
+            for linha in linhas:
+                self.original.write(f"[{passo}] {linha}\n" if linha.strip() else "\n")
+        return len(texto)
+    
+    def flush(self):
+        self.original.flush()
+    
+    def __getattr__(self, nome):
+        return getattr(self.original, nome)
+
+def _rss_pico_bytes():
+    """Pico de memória residente do processo até agora (None sem o módulo resource)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024  # Linux informa em KB
+
 class PipelineIntegrado:
-    def __init__(self):
+    def __init__(self, perfilar=False):
         self.base_path = Path.cwd()
         self.passos_concluidos = []
+        self.perfilar = perfilar
+        self.metricas = {}
+        self.leituras_treinadas = None  # marca de leituras do treino desta execução
+        self._local = threading.local()
+    
+    def conectar(self):
+        """
+        Conexão com o banco; dentro de um passo, instrumentada para contar
+        as consultas do passo
+        """
+        sys.path.insert(0, str(self.base_path))
+        from db.load_data import conectar_banco_mysql
+        from db.instrumentacao import ConexaoInstrumentada
+        
+        conn = conectar_banco_mysql()
+        passo = getattr(self._local, 'passo', None)
+        return ConexaoInstrumentada(conn, passo['contador']) if passo else conn
+    
+    def registrar_linhas(self, linhas):
+        """Soma linhas processadas ao passo em execução (métrica de vazão)"""
+        passo = getattr(self._local, 'passo', None)
+        if passo is not None:
+            passo['linhas'] += int(linhas)
         
     def criar_estrutura_pastas(self):
         """Cria estrutura de pastas necessária"""
@@ -61,18 +190,18 @@ class PipelineIntegrado:
         print("   ✓ Banco de dados criado: sentinela.db")
         self.passos_concluidos.append("Banco de dados criado")
     
-    def carregar_dados(self):
+    def carregar_dados(self, csv_path='data/sample_data.csv'):
         """Carrega dados do CSV para o banco"""
         print("\n📊 Carregando dados no banco...")
         
         try:
             # Importar e executar loader
             sys.path.insert(0, str(self.base_path))
-            from db.load_data import carregar_dados_csv, conectar_banco_mysql, criar_banco_sqlite, consultas_analise
+            from db.load_data import carregar_dados_csv, criar_banco_sqlite, consultas_analise
             
-            conn = conectar_banco_mysql()
+            conn = self.conectar()
             #conn = criar_banco_sqlite('sentinela.db')
-            carregar_dados_csv(conn, 'data/sample_data.csv')
+            self.registrar_linhas(carregar_dados_csv(conn, csv_path))
             consultas_analise(conn)
             conn.close()
             
@@ -90,10 +219,16 @@ class PipelineIntegrado:
         print("\n🤖 Treinando modelo de Machine Learning...")
         
         try:
+            if threading.current_thread() is not threading.main_thread():
+                # Em thread do pool: gráficos só em arquivo (backends de janela exigem a thread principal)
+                import matplotlib
+                matplotlib.use('Agg')
+            
             from ml.train_model import FallDetectionML
             
-            ml = FallDetectionML()
+            ml = FallDetectionML(conectar=self.conectar)
             X_test, y_test, y_pred, features = ml.treinar_modelo()
+            self.registrar_linhas(sum(len(parte) for parte in ml.dados_divididos[:2]))
             ml.visualizar_resultados(X_test, y_test, y_pred, features)
             
             print("   ✓ Modelo treinado e salvo")
@@ -105,82 +240,198 @@ class PipelineIntegrado:
         
         return True
     
-    def gerar_relatorio_alertas(self):
-        """Gera relatório de alertas"""
-        print("\n📄 Gerando relatório de alertas...")
+    def _formatar_alerta(self, alerta):
+        """Bloco de texto de um alerta no relatório"""
+        return (
+            f"ALERTA #{alerta['id_alerta']}\n"
+            f"  Tipo: {alerta['tipo_alerta']}\n"
+            f"  Prioridade: {alerta['nivel_prioridade'].upper()}\n"
+            f"  Trabalhador: {alerta['nome']} ({alerta['setor']})\n"
+            f"  Magnitude: {float(alerta['magnitude_impacto']):.2f}g\n"
+            f"  Mensagem: {alerta['mensagem']}\n"
+            f"  Data/Hora: {alerta['data_alerta']}\n"
+            f"  Status: {'Enviado' if alerta['enviado'] else 'PENDENTE'}\n"
+            + "-" * 70 + "\n\n"
+        )
+    
+    def _escrever_alertas(self, cursor, f, tamanho_lote=1000):
+        """Lê o cursor em lotes (fetchmany) e escreve cada lote de uma vez"""
+        colunas = [c[0] for c in cursor.description]
+        total = 0
+        maior_id = None
         
-        import sqlite3
-        import pandas as pd
-        from datetime import datetime
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            alertas = [dict(zip(colunas, linha)) for linha in linhas]
+            f.write(''.join(self._formatar_alerta(alerta) for alerta in alertas))
+            total += len(alertas)
+            maior_id = max([maior_id or 0] + [alerta['id_alerta'] for alerta in alertas])
         
-        from db.load_data import conectar_banco_mysql
-        conn = conectar_banco_mysql()
+        return total, maior_id
+    
+    def _ler_estado_relatorio(self):
+        try:
+            with open(ESTADO_RELATORIO_ALERTAS, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'ultimo_id_alerta': 0}
+    
+    def _salvar_estado_relatorio(self, estado):
+        # Escrita atômica: um relatório interrompido não corrompe a marca d'água
+        temporario = f"{ESTADO_RELATORIO_ALERTAS}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, ESTADO_RELATORIO_ALERTAS)
+    
+    def gerar_relatorio_alertas(self, incremental=False, diario=False):
+        """
+        Gera relatório de alertas
         
-        # Buscar alertas críticos
-        df_alertas = pd.read_sql_query("""
-            SELECT a.*, e.magnitude_impacto, t.nome, t.setor
-            FROM alertas a
-            JOIN eventos_queda e ON a.id_evento = e.id_evento
-            JOIN trabalhadores t ON e.id_trabalhador = t.id_trabalhador
-            WHERE a.nivel_prioridade IN ('critica', 'alta')
-            ORDER BY a.data_alerta DESC
-        """, conn)
+        Args:
+            incremental (bool): Apenas alertas com id_alerta acima do último
+                já relatado (guardado em logs/relatorio_alertas_estado.json)
+            diario (bool): Acrescenta ao relatório do dia
+                (logs/relatorio_alertas_AAAAMMDD.txt) - implica incremental
+        """
+        print("\n📄 Gerando relatório de alertas...")
         
-        conn.close()
+        from datetime import datetime
+        
+        if diario or incremental:
+            return self._gerar_relatorio_alertas_incremental(diario)
         
-        # Gerar relatório
+        conn = self.conectar()
         relatorio_path = f"logs/relatorio_alertas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         
-        with open(relatorio_path, 'w', encoding='utf-8') as f:
-            f.write("="*70 + "\n")
-            f.write("RELATÓRIO DE ALERTAS - SISTEMA WEARABLE DE SEGURANÇA\n")
-            f.write("="*70 + "\n\n")
-            f.write(f"Data de Geração: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CONSULTA_TOTAL_ALERTAS)
+            total = cursor.fetchone()[0]
             
-            f.write(f"TOTAL DE ALERTAS CRÍTICOS/ALTOS: {len(df_alertas)}\n\n")
+            # Buscar alertas críticos (streaming do cursor, sem DataFrame)
+            cursor.execute(CONSULTA_RELATORIO_ALERTAS.format(filtro='', ordem='a.data_alerta DESC'))
             
-            if len(df_alertas) > 0:
-                f.write("DETALHAMENTO DOS ALERTAS:\n")
-                f.write("-" * 70 + "\n\n")
+            with open(relatorio_path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+                f.write("="*70 + "\n")
+                f.write("RELATÓRIO DE ALERTAS - SISTEMA WEARABLE DE SEGURANÇA\n")
+                f.write("="*70 + "\n\n")
+                f.write(f"Data de Geração: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
+                
+                f.write(f"TOTAL DE ALERTAS CRÍTICOS/ALTOS: {total}\n\n")
                 
-                for idx, alerta in df_alertas.iterrows():
-                    f.write(f"ALERTA #{alerta['id_alerta']}\n")
-                    f.write(f"  Tipo: {alerta['tipo_alerta']}\n")
-                    f.write(f"  Prioridade: {alerta['nivel_prioridade'].upper()}\n")
-                    f.write(f"  Trabalhador: {alerta['nome']} ({alerta['setor']})\n")
-                    f.write(f"  Magnitude: {alerta['magnitude_impacto']:.2f}g\n")
-                    f.write(f"  Mensagem: {alerta['mensagem']}\n")
-                    f.write(f"  Data/Hora: {alerta['data_alerta']}\n")
-                    f.write(f"  Status: {'Enviado' if alerta['enviado'] else 'PENDENTE'}\n")
+                if total > 0:
+                    f.write("DETALHAMENTO DOS ALERTAS:\n")
                     f.write("-" * 70 + "\n\n")
-            else:
-                f.write("✅ Nenhum alerta crítico ou alto no momento.\n")
-            
-            f.write("\n" + "="*70 + "\n")
-            f.write("FIM DO RELATÓRIO\n")
-            f.write("="*70 + "\n")
+                escritos, _ = self._escrever_alertas(cursor, f)
+                self.registrar_linhas(escritos)
+                if total == 0:
+                    f.write("✅ Nenhum alerta crítico ou alto no momento.\n")
+                
+                f.write("\n" + "="*70 + "\n")
+                f.write("FIM DO RELATÓRIO\n")
+                f.write("="*70 + "\n")
+        finally:
+            conn.close()
         
         print(f"   ✓ Relatório salvo: {relatorio_path}")
         self.passos_concluidos.append("Relatório de alertas gerado")
         
         return relatorio_path
     
+    def _gerar_relatorio_alertas_incremental(self, diario):
+        """Relata apenas os alertas novos desde a última execução"""
+        from datetime import datetime
+        
+        estado = self._ler_estado_relatorio()
+        ultimo_id = estado.get('ultimo_id_alerta', 0)
+        agora = datetime.now()
+        
+        if diario:
+            relatorio_path = f"logs/relatorio_alertas_{agora.strftime('%Y%m%d')}.txt"
+        else:
+            relatorio_path = f"logs/relatorio_alertas_incremental_{agora.strftime('%Y%m%d_%H%M%S')}.txt"
+        novo_arquivo = not os.path.exists(relatorio_path)
+        
+        conn = self.conectar()
+        try:
+            # Cursor sem buffer: as linhas vêm do servidor conforme o fetchmany
+            cursor = conn.cursor()
+            cursor.execute(CONSULTA_RELATORIO_ALERTAS.format(filtro='AND a.id_alerta > %s', ordem='a.id_alerta'),
+                           (int(ultimo_id),))
+            
+            with open(relatorio_path, 'a', encoding='utf-8', buffering=1024 * 1024) as f:
+                if novo_arquivo:
+                    f.write("="*70 + "\n")
+                    f.write("RELATÓRIO DE ALERTAS - SISTEMA WEARABLE DE SEGURANÇA\n")
+                    f.write(("RELATÓRIO DIÁRIO " + agora.strftime('%d/%m/%Y') if diario
+                             else "RELATÓRIO INCREMENTAL") + "\n")
+                    f.write("="*70 + "\n\n")
+                
+                f.write(f"--- Atualização {agora.strftime('%d/%m/%Y %H:%M:%S')} "
+                        f"(alertas com id > {ultimo_id}) ---\n\n")
+                total, maior_id = self._escrever_alertas(cursor, f)
+                self.registrar_linhas(total)
+                if total == 0:
+                    f.write("✅ Nenhum alerta crítico ou alto novo.\n\n")
+                f.write(f"--- {total} alertas novos ---\n\n")
+        finally:
+            conn.close()
+        
+        if maior_id is not None:
+            self._salvar_estado_relatorio({
+                'ultimo_id_alerta': int(maior_id),
+                'atualizado_em': agora.isoformat(timespec='seconds'),
+                'ultimo_relatorio': relatorio_path
+            })
+        
+        print(f"   ✓ {total} alertas novos (id > {ultimo_id})")
+        print(f"   ✓ Relatório salvo: {relatorio_path}")
+        self.passos_concluidos.append(f"Relatório de alertas incremental gerado ({total} novos)")
+        
+        return relatorio_path
+    
+    def gerar_relatorios_lote(self, processos=None):
+        """Gera relatórios por trabalhador e por setor em paralelo"""
+        print("\n🗂️ Gerando relatórios por trabalhador e por setor...")
+        
+        sys.path.insert(0, str(self.base_path))
+        from analysis.batch_reports import generate_batch_reports
+        
+        conn = self.conectar()
+        try:
+            manifest = generate_batch_reports(conn, processes=processos)
+        finally:
+            conn.close()
+        self.registrar_linhas(manifest['linhas_consulta'])
+        
+        tempos = manifest['tempos']
+        print(f"   ✓ {len(manifest['arquivos'])} relatórios em {manifest['pasta']}/")
+        print(f"   ✓ Consulta: {tempos['consulta_s']:.2f}s | "
+              f"Renderização ({manifest['processos']} processos): {tempos['renderizacao_s']:.2f}s")
+        print(f"   ✓ Manifest: {manifest['pasta']}/manifest.json")
+        self.passos_concluidos.append("Relatórios por trabalhador/setor gerados")
+        
+        return manifest
+    
     def verificar_dependencias(self):
         """Verifica se todas as dependências estão instaladas"""
         print("🔍 Verificando dependências...")
         
-        dependencias = [
-            'pandas', 'numpy', 'matplotlib', 'seaborn',
-            'sklearn', 'joblib', 'streamlit', 'plotly'
-        ]
+        # módulo -> pacote no pip (find_spec só localiza, não importa o módulo)
+        dependencias = {
+            'pandas': 'pandas', 'numpy': 'numpy', 'matplotlib': 'matplotlib',
+            'seaborn': 'seaborn', 'sklearn': 'scikit-learn', 'joblib': 'joblib',
+            'streamlit': 'streamlit', 'plotly': 'plotly'
+        }
         
         faltando = []
-        for dep in dependencias:
-            try:
-                __import__(dep)
+        for dep, pacote in dependencias.items():
+            if importlib.util.find_spec(dep) is not None:
                 print(f"   ✓ {dep}")
-            except ImportError:
-                faltando.append(dep)
+            else:
+                faltando.append(pacote)
                 print(f"   ❌ {dep}")
         
         if faltando:
@@ -202,50 +453,498 @@ class PipelineIntegrado:
         except KeyboardInterrupt:
             print("\n👋 Dashboard encerrado")
     
-    def executar_pipeline_completo(self):
-        """Executa pipeline completo"""
+    # ====== DAG DE PASSOS COM IMPRESSÕES DIGITAIS ======
+    
+    def _hash_arquivo(self, caminho):
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloco)
+        return h.hexdigest()
+    
+    def _marcas_banco(self):
+        """Marcas d'água do banco (mudam quando há dados novos)"""
+        from db.load_data import conectar_banco_mysql
+        
+        conn = conectar_banco_mysql()
+        try:
+            cursor = conn.cursor()
+            marcas = {}
+            for nome, sql in (
+                ('leituras', "SELECT COALESCE(MAX(id_leitura), 0) FROM leituras_sensores"),
+                ('eventos', "SELECT COALESCE(MAX(id_evento), 0) FROM eventos_queda"),
+                ('alertas', "SELECT COALESCE(MAX(id_alerta), 0), "
+                            "COALESCE(SUM(CASE WHEN enviado THEN 1 ELSE 0 END), 0) FROM alertas"),
+            ):
+                cursor.execute(sql)
+                marcas[nome] = [int(v) for v in cursor.fetchone()]
+            return marcas
+        finally:
+            conn.close()
+    
+    def _leituras_treino(self):
+        """
+        Marca de leituras da impressão do passo 'ml' (MAX(id_leitura), que
+        acompanha a contagem de linhas): fica na base do último treino até a
+        política de retreino mandar treinar de novo
+        """
+        if self.leituras_treinadas is not None:
+            return self.leituras_treinadas  # acabou de treinar: esta é a nova base
+        leituras = self._marcas_banco()['leituras'][0]
+        anterior = self._ler_estado_pipeline().get('ml', {})
+        base = anterior.get('entradas', {}).get('leituras')
+        if base is None or leituras <= base:
+            return leituras  # primeiro treino, sem dados novos ou banco recriado
+        
+        concluido_em = anterior.get('concluido_em')
+        idade_s = (datetime.now() - datetime.fromisoformat(concluido_em)).total_seconds() \
+            if concluido_em else float('inf')
+        if leituras >= base * (1 + CRESCIMENTO_RETREINO) or idade_s >= IDADE_MAXIMA_MODELO_S:
+            return leituras
+        return base
+    
+    def _treinar_passo_ml(self):
+        """Passo 'ml': treina e guarda a marca de leituras que o modelo cobre"""
+        leituras = self._marcas_banco()['leituras'][0]
+        if not self.treinar_modelo_ml():
+            return False
+        self.leituras_treinadas = leituras
+        return True
+    
+    def _versoes_dependencias(self):
+        """Versões instaladas (via metadados, sem importar os pacotes)"""
+        from importlib import metadata
+        
+        versoes = {'python': sys.version.split()[0]}
+        for pacote in ('pandas', 'numpy', 'matplotlib', 'seaborn', 'scikit-learn',
+                       'joblib', 'streamlit', 'plotly', 'mysql-connector-python'):
+            try:
+                versoes[pacote] = metadata.version(pacote)
+            except metadata.PackageNotFoundError:
+                versoes[pacote] = None
+        return versoes
+    
+    def definir_passos(self, csv_path='data/sample_data.csv', relatorio_incremental=False,
+                       relatorio_diario=False, relatorios_lote=False, processos=None):
+        """
+        DAG do pipeline: passo -> dependências, entradas (impressão digital),
+        saídas esperadas e função executada
+        
+        Um passo é pulado quando a impressão das suas entradas é igual à da
+        última execução bem-sucedida e as saídas ainda existem.
+        """
+        passos = {
+            'dependencias': {
+                'depende_de': [],
+                'entradas': self._versoes_dependencias,
+                'saidas': [],
+                'executar': self.verificar_dependencias
+            },
+            'pastas': {
+                'depende_de': [],
+                'entradas': None,  # sempre executa (barato)
+                'saidas': [],
+                'executar': self.criar_estrutura_pastas
+            },
+            'carga': {
+                'depende_de': ['dependencias', 'pastas'],
+                'entradas': lambda: {'csv': csv_path, 'sha256': self._hash_arquivo(csv_path)},
+                'saidas': [],
+                'executar': lambda: self.carregar_dados(csv_path)
+            },
+            'ml': {
+                'depende_de': ['carga'],
+                'entradas': lambda: {'leituras': self._leituras_treino(),
+                                     'codigo': self._hash_arquivo('ml/train_model.py')},
+                'saidas': ['ml/fall_detection_model.pkl', 'ml/scaler.pkl'],
+                'executar': self._treinar_passo_ml,
+                'opcional': True,  # falha no treino não aborta o pipeline
+                'prioridade': 2    # relatórios não esperam pelo treino
+            },
+            'relatorio': {
+                'depende_de': ['carga'],
+                'entradas': lambda: {**self._marcas_banco(), 'incremental': relatorio_incremental,
+                                     'diario': relatorio_diario},
+                'saidas': [],
+                'executar': lambda: self.gerar_relatorio_alertas(incremental=relatorio_incremental,
+                                                                 diario=relatorio_diario),
+                'prioridade': 0
+            },
+        }
+        if relatorios_lote:
+            passos['relatorios_lote'] = {
+                'depende_de': ['carga'],
+                'entradas': self._marcas_banco,
+                'saidas': [],
+                'executar': lambda: self.gerar_relatorios_lote(processos=processos),
+                'prioridade': 1
+            }
+        return passos
+    
+    def _ordem_topologica(self, passos):
+        ordem, visitados = [], set()
+        
+        def visitar(nome, caminho=()):
+            if nome in caminho:
+                raise ValueError(f"Ciclo no pipeline: {' -> '.join(caminho + (nome,))}")
+            if nome in visitados:
+                return
+            for dependencia in passos[nome]['depende_de']:
+                visitar(dependencia, caminho + (nome,))
+            visitados.add(nome)
+            ordem.append(nome)
+        
+        for nome in passos:
+            visitar(nome)
+        return ordem
+    
+    def _descendentes(self, passos, raiz):
+        resultado = {raiz}
+        alterou = True
+        while alterou:
+            alterou = False
+            for nome, passo in passos.items():
+                if nome not in resultado and resultado & set(passo['depende_de']):
+                    resultado.add(nome)
+                    alterou = True
+        return resultado
+    
+    def _ler_estado_pipeline(self):
+        try:
+            with open(ESTADO_PIPELINE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def _salvar_estado_pipeline(self, estado):
+        Path(ESTADO_PIPELINE).parent.mkdir(parents=True, exist_ok=True)
+        temporario = f"{ESTADO_PIPELINE}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, ESTADO_PIPELINE)
+    
+    def _impressao(self, passo, estado, entradas=None):
+        """Hash das entradas do passo (calculadas se não informadas) + impressões das dependências"""
+        if passo['entradas'] is None:
+            return None
+        conteudo = {
+            'entradas': passo['entradas']() if entradas is None else entradas,
+            'dependencias': {d: estado.get(d, {}).get('impressao') for d in passo['depende_de']}
+        }
+        return hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def _executar_passo(self, nome, passo, saida):
+        """
+        Executa um passo (em thread do pool) com a saída no log do passo
+        
+        Returns:
+            tuple: (resultado, exceção ou None, métricas do passo)
+        """
+        from db.instrumentacao import ContadorConsultas
+        
+        with saida.capturar(nome, LOG_PASSO.format(passo=nome)):
+            self._local.passo = {'linhas': 0, 'contador': ContadorConsultas()}
+            perfil = cProfile.Profile() if self.perfilar else None
+            rss_inicio = _rss_pico_bytes()
+            cpu_inicio = time.thread_time()
+            inicio = time.perf_counter()
+            
+            try:
+                if perfil:
+                    perfil.enable()
+                resultado, erro = passo['executar'](), None
+            except Exception as e:
+                resultado, erro = False, e
+                print(f"   ❌ Erro: {e!r}")
+                traceback.print_exc(file=sys.stdout)
+            finally:
+                if perfil:
+                    perfil.disable()
+            
+            duracao = time.perf_counter() - inicio
+            contador, linhas = self._local.passo['contador'], self._local.passo['linhas']
+            self._local.passo = None
+            rss_pico = _rss_pico_bytes()
+            
+            metricas = {
+                'duracao_s': round(duracao, 3),
+                'cpu_s': round(time.thread_time() - cpu_inicio, 3),
+                'linhas': linhas,
+                'linhas_por_s': round(linhas / duracao, 1) if duracao > 0 else None,
+                'consultas_banco': contador.consultas,
+                'tempo_banco_s': round(contador.tempo_s, 3),
+                'rss_pico_bytes': rss_pico,
+                'rss_crescimento_bytes': rss_pico - rss_inicio if rss_pico is not None else None,
+                'sucesso': int(resultado is not False)
+            }
+            
+            if perfil:
+                Path(PASTA_PERFIS).mkdir(parents=True, exist_ok=True)
+                caminho = f"{PASTA_PERFIS}/{nome}.prof"
+                perfil.dump_stats(caminho)
+                with open(f"{PASTA_PERFIS}/{nome}.txt", 'w', encoding='utf-8') as f:
+                    pstats.Stats(perfil, stream=f).sort_stats('cumulative').print_stats(40)
+                metricas['perfil'] = caminho
+                print(f"   🔬 Perfil: {caminho} (resumo em {PASTA_PERFIS}/{nome}.txt)")
+            
+            return resultado, erro, metricas
+    
+    def executar_dag(self, passos, selecionados=None, forcados=(), pular=(), max_paralelos=None):
+        """
+        Executa os passos do DAG, em paralelo quando independentes
+        
+        Um passo entra no pool assim que todas as dependências terminam; entre
+        os prontos, os de menor 'prioridade' são enviados primeiro (relatório
+        antes do treino). A saída de cada passo vai para logs/pipeline_<passo>.log
+        e para o console com o prefixo [passo].
+        
+        Args:
+            selecionados (set): passos a considerar (None = todos)
+            forcados (iterable): passos executados mesmo sem mudanças
+            pular (iterable): passos ignorados (ex.: 'ml' com --skip-ml)
+            max_paralelos (int): passos simultâneos (padrão: todos os prontos)
+        
+        Returns:
+            dict: passo -> 'executado' | 'pulado' | 'ignorado' | 'falhou' | 'bloqueado'
+        """
+        estado = self._ler_estado_pipeline()
+        situacao = {}
+        self.resultados = {}
+        self.erros = {}
+        self.metricas = {}
+        
+        ordem = self._ordem_topologica(passos)
+        pendentes = sorted(ordem, key=lambda n: (passos[n].get('prioridade', 0), ordem.index(n)))
+        em_execucao = {}
+        impressoes = {}
+        
+        saida = SaidaPorPasso(sys.stdout)
+        sys.stdout = saida
+        try:
+            with ThreadPoolExecutor(max_workers=max_paralelos or len(passos)) as pool:
+                while pendentes or em_execucao:
+                    for nome in list(pendentes):
+                        passo = passos[nome]
+                        if any(d not in situacao for d in passo['depende_de']):
+                            continue
+                        pendentes.remove(nome)
+                        
+                        if nome in pular or (selecionados is not None and nome not in selecionados):
+                            situacao[nome] = 'ignorado'
+                            continue
+                        if any(situacao[d] in ('falhou', 'bloqueado') for d in passo['depende_de']):
+                            situacao[nome] = 'bloqueado'
+                            print(f"\n⏭️ [{nome}] bloqueado: dependência falhou")
+                            continue
+                        
+                        impressao = self._impressao(passo, estado)
+                        anterior = estado.get(nome, {})
+                        saidas_ok = all(os.path.exists(arquivo) for arquivo in passo['saidas'])
+                        
+                        if (nome not in forcados and impressao is not None and saidas_ok
+                                and anterior.get('impressao') == impressao):
+                            situacao[nome] = 'pulado'
+                            self.resultados[nome] = anterior.get('resultado')
+                            print(f"\n⏩ [{nome}] sem mudanças desde {anterior.get('concluido_em')} - pulado")
+                            continue
+                        
+                        impressoes[nome] = impressao
+                        em_execucao[pool.submit(self._executar_passo, nome, passo, saida)] = nome
+                    
+                    if not em_execucao:
+                        continue
+                    
+                    prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+                    for futuro in prontos:
+                        nome = em_execucao.pop(futuro)
+                        passo = passos[nome]
+                        resultado, erro, metricas = futuro.result()
+                        duracao = metricas['duracao_s']
+                        self.metricas[nome] = metricas
+                        
+                        if resultado is False:
+                            situacao[nome] = 'falhou'
+                            self.erros[nome] = erro
+                            print(f"\n❌ [{nome}] falhou em {duracao:.1f}s "
+                                  f"(log: {LOG_PASSO.format(passo=nome)})")
+                            continue
+                        
+                        situacao[nome] = 'executado'
+                        self.resultados[nome] = resultado if isinstance(resultado, str) else None
+                        print(f"\n✓ [{nome}] concluído em {duracao:.1f}s")
+                        if impressoes[nome] is not None:
+                            # Impressão recalculada após o passo (ex.: a carga muda as marcas do banco);
+                            # as entradas ficam no estado (base da política de retreino)
+                            entradas = passo['entradas']()
+                            estado[nome] = {
+                                'impressao': self._impressao(passo, estado, entradas),
+                                'entradas': entradas,
+                                'concluido_em': datetime.now().isoformat(timespec='seconds'),
+                                'duracao_s': duracao,
+                                'resultado': self.resultados[nome]
+                            }
+                            self._salvar_estado_pipeline(estado)
+        finally:
+            sys.stdout = saida.original
+        
+        return {nome: situacao[nome] for nome in ordem}
+    
+    def executar_daemon(self, periodo_s=5.0, intervalo_retreino_s=3600, pasta_entrada='data/entrada',
+                        max_leituras_ciclo=50_000, limiar=0.5):
+        """
+        Modo contínuo: micro-lotes de ingestão, pontuação, eventos/alertas e
+        rollups a cada período, com retreino em intervalo próprio (db/micro_lotes.py)
+        """
+        print("="*70)
+        print("🔁 PIPELINE CONTÍNUO - MICRO-LOTES")
+        print("="*70)
+        
+        self.criar_estrutura_pastas()
+        Path(pasta_entrada).mkdir(parents=True, exist_ok=True)
+        
+        sys.path.insert(0, str(self.base_path))
+        from db.micro_lotes import DaemonMicroLotes
+        
+        daemon = DaemonMicroLotes(
+            conectar=self.conectar,
+            pasta_entrada=pasta_entrada,
+            periodo_s=periodo_s,
+            max_leituras_ciclo=max_leituras_ciclo,
+            limiar=limiar,
+            intervalo_retreino_s=intervalo_retreino_s,
+            retreinar=self.treinar_modelo_ml
+        )
+        estatisticas = daemon.executar()
+        return estatisticas['erros'] == 0
+    
+    def _registrar_execucao(self, situacao, inicio, duracao_s, sucesso):
+        """
+        Grava o registro da execução: uma linha JSON no histórico
+        (logs/pipeline_execucoes.jsonl) e o arquivo de métricas no formato
+        texto do Prometheus (logs/pipeline_metricas.prom, para o coletor
+        textfile do node_exporter)
+        """
+        registro = {
+            'inicio': inicio.isoformat(timespec='seconds'),
+            'duracao_s': round(duracao_s, 3),
+            'sucesso': sucesso,
+            'perfilado': self.perfilar,
+            'passos': {nome: {'situacao': s, **self.metricas.get(nome, {})} for nome, s in situacao.items()}
+        }
+        
+        Path(HISTORICO_EXECUCOES).parent.mkdir(parents=True, exist_ok=True)
+        with open(HISTORICO_EXECUCOES, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        
+        linhas = [
+            '# HELP sentinela_pipeline_ultima_execucao_timestamp_segundos Início da última execução',
+            '# TYPE sentinela_pipeline_ultima_execucao_timestamp_segundos gauge',
+            f'sentinela_pipeline_ultima_execucao_timestamp_segundos {inicio.timestamp():.0f}',
+            '# HELP sentinela_pipeline_duracao_segundos Tempo de parede da última execução',
+            '# TYPE sentinela_pipeline_duracao_segundos gauge',
+            f'sentinela_pipeline_duracao_segundos {duracao_s:.3f}',
+            '# HELP sentinela_pipeline_sucesso 1 se a última execução terminou com sucesso',
+            '# TYPE sentinela_pipeline_sucesso gauge',
+            f'sentinela_pipeline_sucesso {int(sucesso)}',
+        ]
+        for chave, (metrica, descricao) in METRICAS_PASSO.items():
+            valores = [(nome, m[chave]) for nome, m in self.metricas.items() if m.get(chave) is not None]
+            if not valores:
+                continue
+            linhas += [f'# HELP {metrica} {descricao}', f'# TYPE {metrica} gauge']
+            linhas += [f'{metrica}{{passo="{nome}"}} {valor}' for nome, valor in valores]
+        
+        temporario = f"{METRICAS_PROMETHEUS}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(linhas) + '\n')
+        os.replace(temporario, METRICAS_PROMETHEUS)
+        
+        return registro
+    
+    def _imprimir_metricas(self):
+        if not self.metricas:
+            return
+        print("\nMÉTRICAS POR PASSO:")
+        print(f"   {'passo':<16}{'tempo':>9}{'CPU':>9}{'linhas':>10}{'linhas/s':>11}{'consultas':>11}{'RSS pico':>11}")
+        for nome, m in self.metricas.items():
+            rss = f"{m['rss_pico_bytes'] / 1024 ** 2:.0f} MB" if m['rss_pico_bytes'] is not None else '-'
+            vazao = f"{m['linhas_por_s']:,.0f}" if m['linhas_por_s'] is not None else '-'
+            print(f"   {nome:<16}{m['duracao_s']:>8.2f}s{m['cpu_s']:>8.2f}s{m['linhas']:>10,}"
+                  f"{vazao:>11}{m['consultas_banco']:>11}{rss:>11}")
+        print(f"   Histórico: {HISTORICO_EXECUCOES} | Prometheus: {METRICAS_PROMETHEUS}")
+    
+    def executar_pipeline_completo(self, relatorio_incremental=False, relatorio_diario=False,
+                                   pular_ml=False, a_partir_de=None, somente=None, forcar=False,
+                                   relatorios_lote=False, processos=None, paralelos=None):
+        """
+        Executa o pipeline como DAG, pulando passos sem mudanças
+        
+        Args:
+            pular_ml (bool): não treinar o modelo (usa o existente)
+            a_partir_de (str): executa este passo (forçado) e os que dependem dele
+            somente (list): executa apenas estes passos (forçados, sem dependências)
+            forcar (bool): ignora as impressões digitais e executa tudo
+            paralelos (int): passos independentes executados ao mesmo tempo
+                (com perfilamento, sempre 1: um perfil por passo, sem interferência)
+        """
         print("="*70)
         print("🏭 PIPELINE INTEGRADO - SISTEMA WEARABLE DE SEGURANÇA")
         print("="*70)
         print()
         
-        # 1. Verificar dependências
-        if not self.verificar_dependencias():
-            print("\n❌ Pipeline abortado: dependências faltando")
-            return False
+        passos = self.definir_passos(relatorio_incremental=relatorio_incremental,
+                                     relatorio_diario=relatorio_diario,
+                                     relatorios_lote=relatorios_lote, processos=processos)
         
-        # 2. Criar estrutura
-        self.criar_estrutura_pastas()
+        invalidos = [p for p in (somente or []) + ([a_partir_de] if a_partir_de else []) if p not in passos]
+        if invalidos:
+            print(f"❌ Passos inexistentes: {invalidos} (disponíveis: {', '.join(passos)})")
+            return False
         
-        # 3. Criar banco
-        #self.executar_sql_schema()
+        selecionados, forcados = None, set(passos) if forcar else set()
+        if somente:
+            selecionados = set(somente)
+            forcados |= selecionados
+        elif a_partir_de:
+            selecionados = self._descendentes(passos, a_partir_de)
+            forcados.add(a_partir_de)
         
-        # 4. Carregar dados
-        if not self.carregar_dados():
-            print("\n❌ Pipeline abortado: erro ao carregar dados")
-            return False
+        inicio, relogio = datetime.now(), time.perf_counter()
+        situacao = self.executar_dag(passos, selecionados, forcados, pular=['ml'] if pular_ml else [],
+                                     max_paralelos=1 if self.perfilar else paralelos)
         
-        # 5. Treinar ML
-        if not self.treinar_modelo_ml():
-            print("\n❌ Pipeline abortado: erro no treinamento ML")
+        falhas = [nome for nome, s in situacao.items()
+                  if s in ('falhou', 'bloqueado') and not passos[nome].get('opcional')]
+        self._registrar_execucao(situacao, inicio, time.perf_counter() - relogio, sucesso=not falhas)
+        self._imprimir_metricas()
+        if falhas:
+            print(f"\n❌ Pipeline abortado: {', '.join(f'{n} ({situacao[n]})' for n in falhas)}")
+            for nome in falhas:
+                if self.erros.get(nome) is not None:
+                    print(f"   {nome}: {self.erros[nome]!r} (log: {LOG_PASSO.format(passo=nome)})")
             return False
         
-        # 6. Gerar relatório
-        relatorio = self.gerar_relatorio_alertas()
-        
-        # 7. Resumo
+        # Resumo
         print("\n" + "="*70)
         print("✅ PIPELINE EXECUTADO COM SUCESSO!")
         print("="*70)
-        print("\nPASSOS CONCLUÍDOS:")
-        for i, passo in enumerate(self.passos_concluidos, 1):
-            print(f"   {i}. {passo}")
+        print("\nPASSOS:")
+        icones = {'executado': '✓', 'pulado': '⏩', 'ignorado': '–', 'falhou': '⚠️', 'bloqueado': '⚠️'}
+        for nome, s in situacao.items():
+            print(f"   {icones[s]} {nome}: {s}")
         
+        if self.passos_concluidos:
+            print("\nPASSOS CONCLUÍDOS:")
+            for i, passo in enumerate(self.passos_concluidos, 1):
+                print(f"   {i}. {passo}")
+        
+        relatorio = self.resultados.get('relatorio')
         print("\nARQUIVOS GERADOS:")
         print("   📁 sentinela.db - Banco de dados")
         print("   🤖 ml/fall_detection_model.pkl - Modelo treinado")
         print("   📊 ml/model_results.png - Gráficos de análise")
-        print(f"   📄 {relatorio} - Relatório de alertas")
+        if relatorio:
+            print(f"   📄 {relatorio} - Relatório de alertas")
         
         print("\n" + "="*70)
         print("🎯 PRÓXIMOS PASSOS:")
@@ -266,12 +965,58 @@ def main():
                        help='Iniciar dashboard após pipeline')
     parser.add_argument('--skip-ml', action='store_true',
                        help='Pular treinamento ML (usar modelo existente)')
+    parser.add_argument('--relatorios-lote', action='store_true',
+                       help='Gerar relatórios por trabalhador e por setor')
+    parser.add_argument('--processos', type=int, default=None,
+                       help='Processos para os relatórios em lote (padrão: nº de CPUs)')
+    parser.add_argument('--relatorio-incremental', action='store_true',
+                       help='Relatório de alertas apenas com os alertas novos desde a última execução')
+    parser.add_argument('--relatorio-diario', action='store_true',
+                       help='Acrescentar os alertas novos ao relatório do dia (implica incremental)')
+    parser.add_argument('--from', dest='a_partir_de', default=None, metavar='PASSO',
+                       help='Executar a partir deste passo (ele e os que dependem dele)')
+    parser.add_argument('--only', dest='somente', default=None, metavar='PASSOS',
+                       help='Executar apenas estes passos (separados por vírgula)')
+    parser.add_argument('--forcar', action='store_true',
+                       help='Executar todos os passos mesmo sem mudanças')
+    parser.add_argument('--paralelos', type=int, default=None,
+                       help='Passos independentes em paralelo (padrão: todos; 1 = sequencial)')
+    parser.add_argument('--perfil', action='store_true',
+                       help='Capturar cProfile de cada passo em logs/perfis/ (executa os passos em sequência)')
+    parser.add_argument('--daemon', action='store_true',
+                       help='Modo contínuo em micro-lotes (encerrar com Ctrl+C/SIGTERM)')
+    parser.add_argument('--periodo', type=float, default=5.0,
+                       help='Período de cada ciclo do daemon (s)')
+    parser.add_argument('--intervalo-retreino', type=float, default=3600,
+                       help='Intervalo entre retreinos do modelo no daemon (s, 0 = não retreinar)')
+    parser.add_argument('--pasta-entrada', default='data/entrada',
+                       help='Pasta de CSVs ingeridos pelo daemon')
+    parser.add_argument('--max-leituras-ciclo', type=int, default=50_000,
+                       help='Máximo de leituras por ciclo do daemon')
+    parser.add_argument('--limiar', type=float, default=0.5,
+                       help='Probabilidade do modelo a partir da qual a leitura é queda')
     
     args = parser.parse_args()
     
-    pipeline = PipelineIntegrado()
+    pipeline = PipelineIntegrado(perfilar=args.perfil)
+    
+    if args.daemon:
+        ok = pipeline.executar_daemon(periodo_s=args.periodo,
+                                      intervalo_retreino_s=args.intervalo_retreino,
+                                      pasta_entrada=args.pasta_entrada,
+                                      max_leituras_ciclo=args.max_leituras_ciclo,
+                                      limiar=args.limiar)
+        sys.exit(0 if ok else 1)
     
-    if pipeline.executar_pipeline_completo():
+    if pipeline.executar_pipeline_completo(relatorio_incremental=args.relatorio_incremental,
+                                           relatorio_diario=args.relatorio_diario,
+                                           pular_ml=args.skip_ml,
+                                           a_partir_de=args.a_partir_de,
+                                           somente=args.somente.split(',') if args.somente else None,
+                                           forcar=args.forcar,
+                                           relatorios_lote=args.relatorios_lote,
+                                           processos=args.processos,
+                                           paralelos=args.paralelos):
         if args.dashboard:
             pipeline.iniciar_dashboard()
     else: